@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8
+"""asv benchmarks of the 4-D xarray interface
+
+Typical grid shapes of :func:`msise_4d()` and the overhead of
+looking up the indices from the `spaceweather` package.
+"""
+import numpy as np
+import pandas as pd
+
+try:
+	from nrlmsise00.dataset import msise_4d
+	from nrlmsise00.dataset.core import _ap_a_inputs, _gm_inputs
+except ImportError:
+	msise_4d = None
+
+# (time, alt, lat, lon) grids
+GRIDS = {
+	# a single high-resolution altitude profile
+	"profile": (
+		pd.date_range("2009-06-21 08:00", periods=1),
+		np.arange(0., 1001., 1.), 60., -70.,
+	),
+	# a global 2.5° map at 400 km
+	"global_map": (
+		pd.date_range("2009-06-21 08:00", periods=1),
+		400., np.arange(-90., 90.1, 2.5), np.arange(-180., 180., 2.5),
+	),
+	# hourly values over a year at one location
+	"time_series": (
+		pd.date_range("2009-01-01", periods=365 * 24, freq="h"),
+		400., 60., -70.,
+	),
+	# profiles on a coarse global grid for a day
+	"4d": (
+		pd.date_range("2009-06-21", periods=24, freq="h"),
+		np.arange(100., 1001., 25.),
+		np.arange(-90., 90.1, 10.), np.arange(-180., 180., 15.),
+	),
+}
+
+
+class Grid4D(object):
+	"""`msise_4d()` with explicit indices"""
+	params = sorted(GRIDS)
+	param_names = ["grid"]
+	timeout = 120
+
+	def setup(self, grid):
+		if msise_4d is None:
+			raise NotImplementedError("nrlmsise00.dataset not available")
+		self.args = GRIDS[grid]
+
+	def time_msise_4d(self, grid):
+		msise_4d(*self.args, f107a=150., f107=150., ap=4.)
+
+	def peakmem_msise_4d(self, grid):
+		msise_4d(*self.args, f107a=150., f107=150., ap=4.)
+
+
+class SpaceWeather(object):
+	"""Index look-up for `n` times"""
+	params = [1, 100, 10000]
+	param_names = ["n"]
+
+	def setup(self, n):
+		if msise_4d is None:
+			raise NotImplementedError("nrlmsise00.dataset not available")
+		self.dts = (
+			np.datetime64("2009-01-01")
+			+ np.linspace(0, 365 * 86400, n).astype("timedelta64[s]")
+		)
+		self.flags = [0] + [1] * 23
+		self.flags[9] = -1
+		# load the tables once
+		_gm_inputs(self.dts, None, None, None)
+
+	def time_daily_indices(self, n):
+		_gm_inputs(self.dts, None, None, None)
+
+	def time_ap_a_3h(self, n):
+		_ap_a_inputs(self.dts, None, self.flags, None)
+
+	def time_msise_4d_lookup(self, n):
+		msise_4d(pd.DatetimeIndex(self.dts), 400., 60., -70., outputs=["rho"])
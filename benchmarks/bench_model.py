@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8
+"""asv benchmarks of the model functions
+
+Latency of the single-point C functions, throughput of the batched
+functions depending on the number of points, and their peak memory.
+"""
+import datetime as dt
+
+import numpy as np
+
+from nrlmsise00 import (
+	gtd7_flat, gtd7d_flat, gtd7_profile, msise_flat, msise_model,
+	scale_height,
+)
+from nrlmsise00._nrlmsise00 import gtd7, gtd7d
+
+TIME = dt.datetime(2009, 6, 21, 8, 3, 20)
+STD_INPUT_C = (2009, 172, 29000., 400., 60., -70., 16., 150., 150., 4.)
+
+
+class Scalar(object):
+	"""Single point evaluation"""
+	params = ["gtd7", "gtd7d"]
+	param_names = ["method"]
+
+	def setup(self, method):
+		self.func = {"gtd7": gtd7, "gtd7d": gtd7d}[method]
+
+	def time_c(self, method):
+		self.func(*STD_INPUT_C)
+
+	def time_msise_model(self, method):
+		msise_model(TIME, 400., 60., -70., 150., 150., 4., method=method)
+
+
+class Flat(object):
+	"""Batched evaluation of `n` points"""
+	params = ([1, 100, 10000, 100000], ["gtd7_flat", "gtd7d_flat", "msise_flat"])
+	param_names = ["n", "function"]
+	timeout = 120
+
+	def setup(self, n, function):
+		self.alt = np.linspace(0., 1000., n)
+		self.lat = np.linspace(-90., 90., n)
+		self.time = (
+			np.datetime64("2009-06-21T00:00")
+			+ np.linspace(0, 86399, n).astype("timedelta64[s]")
+		)
+
+	def _run(self, n, function):
+		if function == "msise_flat":
+			return msise_flat(self.time, self.alt, self.lat, -70., 150., 150., 4.)
+		func = gtd7d_flat if function == "gtd7d_flat" else gtd7_flat
+		return func(2009, 172, 29000., self.alt, self.lat, -70., 16., 150., 150., 4.)
+
+	def time_flat(self, n, function):
+		self._run(n, function)
+
+	def peakmem_flat(self, n, function):
+		self._run(n, function)
+
+
+class Profile(object):
+	"""Altitude profiles at `n` locations"""
+	params = [1, 100, 1000]
+	param_names = ["n"]
+	timeout = 120
+
+	def setup(self, n):
+		self.alt = np.arange(0., 1001., 5.)
+		self.lat = np.linspace(-90., 90., n)
+
+	def time_gtd7_profile(self, n):
+		gtd7_profile(2009, 172, 29000., self.lat, -70., 16., 150., 150., 4., self.alt)
+
+	def peakmem_gtd7_profile(self, n):
+		gtd7_profile(2009, 172, 29000., self.lat, -70., 16., 150., 150., 4., self.alt)
+
+
+class ScaleHeight(object):
+	"""Scale heights of `n` points"""
+	params = [1, 10000, 1000000]
+	param_names = ["n"]
+
+	def setup(self, n):
+		self.alt = np.linspace(0., 1000., n)
+		self.lat = np.linspace(-90., 90., n)
+
+	def time_scale_height(self, n):
+		scale_height(self.alt, self.lat, 0.016, 1000.)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8
+"""Process pool benchmark for `msise_flat()`
+
+Compares the single-process `numpy.vectorize` evaluation of
+`msise_model()` to `msise_flat()` using threads and processes.
+
+Usage: python bench_processes.py [n_points [max_jobs]]
+"""
+from __future__ import print_function
+
+from multiprocessing import cpu_count
+import sys
+import timeit
+
+import numpy as np
+
+from nrlmsise00 import msise_flat, msise_model
+
+
+def main(n_points=10**6, max_jobs=None):
+	max_jobs = max_jobs or cpu_count()
+	times = (
+		np.datetime64("2009-06-21T00:00")
+		+ np.linspace(0, 86400, n_points).astype("timedelta64[s]")
+	)
+	alts = np.linspace(0., 1000., n_points)
+	lats = np.linspace(-90., 90., n_points)
+	args = (times, alts, lats, -70., 150., 150., 4.)
+
+	# the reference is slow, evaluated for a subset of the points
+	n_vec = min(n_points, 10**4)
+	vec = np.vectorize(msise_model, otypes=[list, list])
+	t_vec = min(timeit.repeat(
+		lambda: vec(times[:n_vec].astype(object), *[
+			a[:n_vec] if np.ndim(a) else a for a in args[1:]
+		]),
+		number=1, repeat=3,
+	)) * n_points / n_vec
+
+	print("{0:>20s} {1:>10s} {2:>12s} {3:>8s}".format(
+		"method", "time [s]", "points/s", "speedup"))
+	print("{0:>20s} {1:10.3f} {2:12.4g} {3:8.2f}".format(
+		"np.vectorize", t_vec, n_points / t_vec, 1.))
+
+	n_jobs = 1
+	while n_jobs <= max_jobs:
+		for name, kwargs in [
+			("n_threads={0}", {"n_threads": n_jobs}),
+			("n_jobs={0}", {"n_jobs": n_jobs}),
+		]:
+			t = min(timeit.repeat(
+				lambda: msise_flat(*args, **kwargs), number=1, repeat=3,
+			))
+			print("{0:>20s} {1:10.3f} {2:12.4g} {3:8.2f}".format(
+				name.format(n_jobs), t, n_points / t, t_vec / t))
+		n_jobs *= 2
+
+
+if __name__ == "__main__":
+	main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8
+"""Thread scaling benchmark for the batched model evaluation
+
+Usage: python bench_threads.py [n_points [max_threads]]
+"""
+from __future__ import print_function
+
+from multiprocessing import cpu_count
+import sys
+import timeit
+
+import numpy as np
+
+from nrlmsise00 import gtd7_flat
+
+
+def main(n_points=10**6, max_threads=None):
+	max_threads = max_threads or cpu_count()
+	alts = np.linspace(0., 1000., n_points)
+	lats = np.linspace(-90., 90., n_points)
+
+	def _run(n_threads):
+		gtd7_flat(
+			2009, 172, 29000., alts, lats, -70., 16., 150., 150., 4.,
+			n_threads=n_threads,
+		)
+
+	t1 = None
+	print("{0:>8s} {1:>10s} {2:>12s} {3:>8s}".format(
+		"threads", "time [s]", "points/s", "speedup"))
+	n_threads = 1
+	while n_threads <= max_threads:
+		t = min(timeit.repeat(lambda: _run(n_threads), number=1, repeat=3))
+		t1 = t1 or t
+		print("{0:8d} {1:10.3f} {2:12.4g} {3:8.2f}".format(
+			n_threads, t, n_points / t, t1 / t))
+		n_threads *= 2
+
+
+if __name__ == "__main__":
+	main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8
+"""Load test for the model server `nrlmsise00.server`
+
+Starts a server on a free localhost port (or uses the one running
+on `port`) and lets `n_clients` concurrent clients send `n_requests`
+single-point requests each over keep-alive connections.
+Reports the throughput, the request latencies, and the number of
+batches for several values of the server's `max_delay`.
+
+Usage: python load_server.py [n_clients [n_requests [port]]]
+"""
+import asyncio
+import json
+import sys
+import time
+
+import numpy as np
+
+from nrlmsise00.server import MsisServer
+
+
+async def _client(host, port, n_requests, seed, latencies):
+	rng = np.random.RandomState(seed)
+	reader, writer = await asyncio.open_connection(host, port)
+	try:
+		for _ in range(n_requests):
+			body = json.dumps(dict(
+				year=2009, doy=172, sec=rng.uniform(0., 86400.),
+				alt=rng.uniform(100., 800.), g_lat=rng.uniform(-90., 90.),
+				g_long=rng.uniform(-180., 180.),
+				f107A=150., f107=150., ap=4.,
+			)).encode("utf-8")
+			t0 = time.perf_counter()
+			writer.write((
+				"POST /gtd7 HTTP/1.1\r\n"
+				"Host: {0}\r\n"
+				"Content-Type: application/json\r\n"
+				"Content-Length: {1}\r\n\r\n"
+			).format(host, len(body)).encode("latin-1") + body)
+			await writer.drain()
+			status = await reader.readline()
+			length = 0
+			while True:
+				h = await reader.readline()
+				if not h.strip():
+					break
+				k, _, v = h.decode("latin-1").partition(":")
+				if k.strip().lower() == "content-length":
+					length = int(v)
+			await reader.readexactly(length)
+			latencies.append(time.perf_counter() - t0)
+			if b" 200 " not in status:
+				raise RuntimeError(status.decode("latin-1").strip())
+	finally:
+		writer.close()
+
+
+async def _stats(host, port):
+	reader, writer = await asyncio.open_connection(host, port)
+	writer.write(b"GET /stats HTTP/1.0\r\n\r\n")
+	data = await reader.read()
+	writer.close()
+	return json.loads(data.split(b"\r\n\r\n", 1)[1].decode("utf-8"))
+
+
+async def _run(host, port, n_clients, n_requests):
+	latencies = []
+	before = (await _stats(host, port))["gtd7"]
+	t0 = time.perf_counter()
+	await asyncio.gather(*[
+		_client(host, port, n_requests, seed, latencies)
+		for seed in range(n_clients)
+	])
+	t = time.perf_counter() - t0
+	after = (await _stats(host, port))["gtd7"]
+	return t, np.array(latencies), after["batches"] - before["batches"]
+
+
+async def _main(n_clients, n_requests, port):
+	host = "127.0.0.1"
+	if port:
+		configs = [(None, port)]
+	else:
+		configs = []
+		for max_delay in [0., 0.0005, 0.002, 0.005]:
+			server = MsisServer(max_delay=max_delay)
+			srv = await server.start(host=host, port=0)
+			configs.append((server, srv.sockets[0].getsockname()[1]))
+
+	n = n_clients * n_requests
+	print("{0:>10s} {1:>10s} {2:>10s} {3:>8s} {4:>10s} {5:>10s}".format(
+		"max_delay", "time [s]", "requests/s", "batches", "p50 [ms]", "p99 [ms]"))
+	for server, port in configs:
+		t, lat, batches = await _run(host, port, n_clients, n_requests)
+		print("{0:>10s} {1:10.3f} {2:10.1f} {3:8d} {4:10.2f} {5:10.2f}".format(
+			"-" if server is None else "{0:g}".format(server.batchers["gtd7"].max_delay),
+			t, n / t, batches,
+			1e3 * np.percentile(lat, 50), 1e3 * np.percentile(lat, 99),
+		))
+		if server is not None:
+			await server.close()
+
+
+def main(n_clients=64, n_requests=200, port=0):
+	asyncio.run(_main(n_clients, n_requests, port))
+
+
+if __name__ == "__main__":
+	main(*[int(a) for a in sys.argv[1:]])
@@ -14,7 +14,7 @@ extnrlmsise00 = Extension(
 		name="nrlmsise00._nrlmsise00",
 		sources=[
 			"src/nrlmsise00/nrlmsise00module.c",
-			"src/c_nrlmsise-00/nrlmsise-00.c",
+			"src/nrlmsise00/nrlmsise-00_ext.c",
 			"src/c_nrlmsise-00/nrlmsise-00_data.c"
 		],
 		include_dirs=["src/c_nrlmsise-00"])
@@ -22,6 +22,10 @@ extnrlmsise00 = Extension(
 extras_require = {
 		"tests": ["pytest"],
 		"dataset": ["spaceweather", "xarray"],
+		"dask": ["dask[array]", "spaceweather", "xarray"],
+		"zarr": ["spaceweather", "xarray", "zarr"],
+		"netcdf": ["netCDF4", "spaceweather", "xarray"],
+		"batch": ["pandas", "pyarrow"],
 		"docs": ["sphinx!=3.2.0"],
 }
 extras_require["all"] = sorted(
@@ -99,5 +103,7 @@ if __name__ == "__main__":
 		extras_require=extras_require,
 		ext_modules=[extnrlmsise00],
 		scripts=[],
-		entry_points={},
+		entry_points={
+			"console_scripts": ["nrlmsise00 = nrlmsise00.batch:main"],
+		},
 		zip_safe=False)
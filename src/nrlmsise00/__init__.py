@@ -13,5 +13,15 @@ __version__ = "0.1.2"
 
 from . import _nrlmsise00
 from .core import *
+from .cache import *
 
-__all__ = ["msise_model", "msise_flat", "gtd7_flat", "gtd7d_flat", "scale_height"]
+__all__ = [
+	"msise_model", "msise_flat", "gtd7_flat", "gtd7d_flat", "ghp7_flat",
+	"gtd7_profile", "gtd7d_profile",
+	"gtd7_jacobian", "gtd7d_jacobian",
+	"MsisConfig", "ap_a_3h",
+	"scale_height",
+	"get_num_threads", "set_num_threads",
+	"local_solar_time",
+	"MsisCache",
+]
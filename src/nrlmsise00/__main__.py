@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8
+#
+# Copyright (c) 2019 Stefan Bender
+#
+# This file is part of pynrlmsise00.
+# pynrlmsise00 is free software: you can redistribute it or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+# See accompanying LICENSE file or http://www.gnu.org/licenses/gpl-2.0.html.
+"""Command line interface, ``python -m nrlmsise00``"""
+import sys
+
+from .batch import main
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8
+#
+# Copyright (c) 2019 Stefan Bender
+#
+# This file is part of pynrlmsise00.
+# pynrlmsise00 is free software: you can redistribute it or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+# See accompanying LICENSE file or http://www.gnu.org/licenses/gpl-2.0.html.
+"""Coroutines evaluating the model off the event loop (Python 3.7+)
+
+:func:`amsise_flat()` and :func:`amsise_4d()` split the points into
+chunks of about `chunk_size` points and evaluate one chunk after the
+other in an executor, the event loop keeps running the other tasks
+in the meantime. When the calling task is cancelled, the chunk that
+is currently evaluated is finished, but no further chunks are started.
+"""
+import asyncio
+from functools import partial
+
+import numpy as np
+
+from .core import _config_kwargs, _is_per_element, _output_array
+from .core import _output_columns, _split_ap_a, _time_inputs
+from .core import gtd7_flat, gtd7d_flat, msise_flat
+
+__all__ = ["amsise_flat", "amsise_4d"]
+
+# default number of points evaluated at once
+CHUNK_SIZE = 65536
+
+
+def _chunk_axis(shape, chunk_size, axes=None):
+	"""The axis to split `shape` along and the chunk length along it
+
+	The chunks contain about `chunk_size` points (at least one entry
+	of the longest of `axes`, default all axes).
+	"""
+	if chunk_size < 1:
+		raise ValueError("chunk_size must be positive.")
+	axes = range(len(shape)) if axes is None else axes
+	axis = max(axes, key=lambda a: shape[a])
+	per = int(np.prod(shape)) // max(shape[axis], 1)
+	return axis, max(1, chunk_size // max(per, 1))
+
+
+def _chunk(a, axis, sl, ndim, core=0):
+	"""The part `sl` along `axis` of the `ndim`-dim broadcast of `a`
+
+	`a` is returned unchanged if it is broadcast along `axis` or
+	if `sl` is `None`, the last `core` dimensions of `a` are not broadcast.
+	"""
+	if sl is None:
+		return a
+	ax = axis - ndim + a.ndim - core
+	if ax < 0 or a.shape[ax] == 1:
+		return a
+	return a[(slice(None),) * ax + (sl,)]
+
+
+async def amsise_flat(time, alt, lat, lon, f107a, f107, ap,
+		lst=None, ap_a=None, flags=None, method="gtd7", config=None,
+		n_threads=None, outputs=None, out=None, dtype=None,
+		chunk_size=CHUNK_SIZE, executor=None):
+	"""Coroutine variant of :func:`msise_flat()`
+
+	The inputs are the same as for :func:`msise_flat()`, the broadcast
+	points are split along their longest axis into chunks of about
+	`chunk_size` points, which are written to the output one after
+	the other by :func:`gtd7_flat()` or :func:`gtd7d_flat()` using
+	`n_threads` threads each.
+	The chunks (and the time conversion) are evaluated by `executor`,
+	default: the event loop's default executor.
+	Per-element `ap_a` or `flags` (object arrays) are evaluated
+	in one piece.
+
+	Returns
+	-------
+	output: :class:`numpy.ndarray` (..., 11)
+		The same as :func:`msise_flat()`, or `out` if given.
+	"""
+	loop = asyncio.get_running_loop()
+	if _is_per_element(ap_a) or _is_per_element(flags):
+		return await loop.run_in_executor(executor, partial(
+			msise_flat, time, alt, lat, lon, f107a, f107, ap,
+			lst=lst, ap_a=ap_a, flags=flags, method=method, config=config,
+			n_threads=n_threads, outputs=outputs, out=out, dtype=dtype,
+		))
+	year, doy, sec, lst = await loop.run_in_executor(
+		executor, _time_inputs, time, lon, lst,
+	)
+	ins = [
+		np.asarray(a, dtype=np.float64)
+		for a in (year, doy, sec, alt, lat, lon, lst, f107a, f107, ap)
+	]
+	ap_a, ap_arr = _split_ap_a(ap_a)
+	shape = np.broadcast(
+		*(ins if ap_arr is None else ins + [ap_arr[..., 0]])
+	).shape
+	cols = _output_columns(outputs)
+	out = _output_array(
+		out, shape + (11 if cols is None else len(cols),), dtype=dtype,
+	)
+	# convert the switches once for all chunks
+	config = _config_kwargs(ap_a=ap_a, flags=flags, config=config).get("config")
+	flat_func = gtd7d_flat if method == "gtd7d" else gtd7_flat
+	if shape:
+		axis, step = _chunk_axis(shape, chunk_size)
+		slices = [slice(i0, i0 + step) for i0 in range(0, shape[axis], step)]
+	else:
+		# single point
+		axis, slices = 0, [None]
+	for sl in slices:
+		idx = () if sl is None else (slice(None),) * axis + (sl,)
+		await loop.run_in_executor(executor, partial(
+			flat_func,
+			*[_chunk(a, axis, sl, len(shape)) for a in ins],
+			ap_a=None if ap_arr is None else _chunk(ap_arr, axis, sl, len(shape), core=1),
+			config=config, n_threads=n_threads, outputs=outputs, out=out[idx],
+		))
+	return out
+
+
+def _msise_4d_fill(msis_data, idx, inputs):
+	from .dataset.core import _msise_4d_data
+	_msise_4d_data(*idx, out=msis_data[(slice(None),) + idx], **inputs)
+
+
+async def amsise_4d(
+	time, alt, lat, lon,
+	f107a=None, f107=None, ap=None,
+	lst=None,
+	ap_a=None, flags=None,
+	method="gtd7",
+	pressure=False,
+	config=None,
+	outputs=None,
+	dtype=None,
+	chunk_size=CHUNK_SIZE,
+	executor=None,
+):
+	"""Coroutine variant of :func:`nrlmsise00.dataset.msise_4d()`
+
+	The arguments are the same as for :func:`nrlmsise00.dataset.msise_4d()`,
+	the grid is split along the longest of the "time", "lat", and "lon"
+	dimensions into blocks of about `chunk_size` points, keeping the
+	altitude profiles in one piece.
+	The input preparation (including the `spaceweather` look-up),
+	the blocks, and the dataset assembly are evaluated by `executor`,
+	default: the event loop's default executor.
+	Requires the "dataset" extra.
+
+	Returns
+	-------
+	msise_4d: :class:`xarray.Dataset`
+		The same as :func:`nrlmsise00.dataset.msise_4d()`.
+	"""
+	from .dataset.core import _lst_attrs, _msise_4d_dataset, _msise_4d_inputs
+
+	loop = asyncio.get_running_loop()
+	inputs, dts, lsts = await loop.run_in_executor(executor, partial(
+		_msise_4d_inputs,
+		time, alt, lat, lon, f107a, f107, ap, lst,
+		ap_a, flags, config, method, pressure, outputs=outputs, dtype=dtype,
+	))
+	nout = len(inputs["outputs"]) + int(pressure)
+	sizes = tuple(inputs[k].size for k in ("ts", "alt", "lat", "lon"))
+	msis_data = np.empty((nout,) + sizes, dtype=inputs["dtype"])
+	axis, step = _chunk_axis(sizes, chunk_size, axes=(0, 2, 3))
+	for i0 in range(0, sizes[axis], step):
+		idx = [slice(None)] * 4
+		idx[axis] = slice(i0, i0 + step)
+		await loop.run_in_executor(
+			executor, _msise_4d_fill, msis_data, tuple(idx), inputs,
+		)
+	return await loop.run_in_executor(executor, partial(
+		_msise_4d_dataset, msis_data, dts, lsts, lst_attrs=_lst_attrs(lst),
+		**inputs
+	))
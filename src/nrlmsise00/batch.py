@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8
+#
+# Copyright (c) 2019 Stefan Bender
+#
+# This file is part of pynrlmsise00.
+# pynrlmsise00 is free software: you can redistribute it or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+# See accompanying LICENSE file or http://www.gnu.org/licenses/gpl-2.0.html.
+"""Batch evaluation of input records from files
+
+Reads the times and locations from CSV, Parquet, or NumPy ".npy" files
+in chunks, evaluates the model for each chunk, and appends the outputs
+to a CSV, Parquet, or ".npy" file, such that the memory use does not
+depend on the size of the files. Also available as the command line
+tool ``nrlmsise00``, see :func:`main()`.
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+from collections import OrderedDict
+import os
+
+import numpy as np
+
+from . import __version__
+from .core import _OUTPUT_NAMES, _output_columns, msise_flat
+from .instrument import _stage
+
+__all__ = ["msise_file", "main"]
+
+# input columns, in this order for plain 2-D ".npy" arrays
+INPUT_COLUMNS = ["time", "alt", "lat", "lon", "f107a", "f107", "ap"]
+_FORMATS = {
+	".csv": "csv", ".txt": "csv", ".gz": "csv", ".bz2": "csv",
+	".parquet": "parquet", ".pq": "parquet",
+	".npy": "npy",
+}
+
+
+def _file_format(path, fmt=None):
+	"""The format of `path` from its extension, unless given as `fmt`"""
+	if fmt is None:
+		ext = os.path.splitext(str(path))[1].lower()
+		try:
+			fmt = _FORMATS[ext]
+		except KeyError:
+			raise ValueError(
+				"Unknown format of {0}, use one of 'csv', 'parquet', "
+				"or 'npy'.".format(path)
+			)
+	if fmt not in ["csv", "parquet", "npy"]:
+		raise ValueError(
+			"Unsupported format '{0}', use 'csv', 'parquet', or 'npy'.".format(fmt)
+		)
+	return fmt
+
+
+def _import_pyarrow():
+	try:
+		import pyarrow
+		import pyarrow.parquet
+	except ImportError:
+		raise ImportError(
+			"Parquet files require `pyarrow`, install it with:\n"
+			"  pip install pyarrow"
+		)
+	return pyarrow
+
+
+def _read_csv(path, chunksize):
+	import pandas as pd
+
+	for df in pd.read_csv(path, chunksize=chunksize):
+		yield OrderedDict((c, df[c].to_numpy()) for c in df.columns)
+
+
+def _read_parquet(path, chunksize):
+	pa = _import_pyarrow()
+	pf = pa.parquet.ParquetFile(path)
+	for batch in pf.iter_batches(batch_size=chunksize):
+		yield OrderedDict(
+			(name, col.to_numpy(zero_copy_only=False))
+			for name, col in zip(batch.schema.names, batch.columns)
+		)
+
+
+def _read_npy(path, chunksize):
+	arr = np.load(path, mmap_mode="r")
+	if arr.dtype.names is None and (arr.ndim != 2 or arr.shape[1] > len(INPUT_COLUMNS)):
+		raise ValueError(
+			"npy input must be a structured array or a 2-D array with the "
+			"columns {0} (or the first 4).".format(INPUT_COLUMNS)
+		)
+	for i0 in range(0, arr.shape[0], chunksize):
+		# read the block into memory
+		block = np.array(arr[i0:i0 + chunksize])
+		if arr.dtype.names is not None:
+			yield OrderedDict((c, block[c]) for c in arr.dtype.names)
+		else:
+			yield OrderedDict(
+				(c, block[:, j]) for j, c in enumerate(INPUT_COLUMNS[:arr.shape[1]])
+			)
+
+
+def _num_rows(path, fmt):
+	"""Number of records in `path`, `None` if unknown before reading"""
+	if fmt == "npy":
+		return np.load(path, mmap_mode="r").shape[0]
+	if fmt == "parquet":
+		return _import_pyarrow().parquet.ParquetFile(path).metadata.num_rows
+	return None
+
+
+class _CsvWriter(object):
+	def __init__(self, path):
+		self.path = path
+		self.first = True
+
+	def write(self, columns):
+		import pandas as pd
+
+		pd.DataFrame(columns).to_csv(
+			self.path, mode="w" if self.first else "a",
+			header=self.first, index=False,
+		)
+		self.first = False
+
+	def close(self):
+		if self.first:
+			# no records, empty file
+			open(self.path, "w").close()
+
+
+class _ParquetWriter(object):
+	def __init__(self, path):
+		self.pa = _import_pyarrow()
+		self.path = path
+		self.writer = None
+
+	def write(self, columns):
+		table = self.pa.Table.from_pydict(columns)
+		if self.writer is None:
+			self.writer = self.pa.parquet.ParquetWriter(self.path, table.schema)
+		self.writer.write_table(table)
+
+	def close(self):
+		if self.writer is not None:
+			self.writer.close()
+
+
+class _NpyWriter(object):
+	def __init__(self, path, nrows, names):
+		self.out = np.lib.format.open_memmap(
+			path, mode="w+", shape=(nrows,),
+			dtype=[(n, np.float64) for n in names],
+		)
+		self.i0 = 0
+
+	def write(self, columns):
+		for name, values in columns.items():
+			self.out[name][self.i0:self.i0 + len(values)] = values
+		self.i0 += len(values)
+
+	def close(self):
+		self.out.flush()
+		del self.out
+
+
+def _times(t):
+	"""UTC `datetime64` from date-time strings, `datetime64`, or
+	seconds since 1970-01-01 00:00 UTC
+	"""
+	t = np.asarray(t)
+	if t.dtype.kind in "iuf":
+		return np.datetime64("1970-01-01") + (t * 1e6).astype("timedelta64[us]")
+	if t.dtype.kind == "M":
+		return t
+	import pandas as pd
+
+	return pd.to_datetime(t, utc=True).tz_localize(None).to_numpy()
+
+
+def _msise_chunk(
+	chunk, f107a=None, f107=None, ap=None, flags=None, method="gtd7",
+	outputs=None, n_threads=None,
+):
+	"""Model outputs (n, len(outputs)) for the input columns `chunk`"""
+	missing = [c for c in INPUT_COLUMNS[:4] if c not in chunk]
+	if missing:
+		raise ValueError("Missing input columns {0}.".format(missing))
+	times = _times(chunk["time"])
+	f107a, f107, ap = [
+		chunk[c] if c in chunk else v
+		for c, v in zip(INPUT_COLUMNS[4:], (f107a, f107, ap))
+	]
+	ap_a = None
+	if f107a is None or f107 is None or ap is None or (flags and flags[9] == -1):
+		try:
+			from .dataset.core import _ap_a_inputs, _gm_inputs
+		except ImportError:
+			raise ImportError(
+				"Missing indices are looked up from the `spaceweather` package, "
+				"install it with:\n  pip install 'nrlmsise00[dataset]'"
+			)
+		with _stage("msise_file.indices"):
+			ap, f107, f107a = _gm_inputs(times, ap, f107, f107a)
+			ap_a = _ap_a_inputs(times, None, flags, None)
+	return msise_flat(
+		times, chunk["alt"], chunk["lat"], chunk["lon"], f107a, f107, ap,
+		lst=chunk.get("lst"), ap_a=ap_a, flags=flags, method=method,
+		outputs=outputs, n_threads=n_threads,
+	)
+
+
+def msise_file(
+	infile, outfile,
+	f107a=None, f107=None, ap=None,
+	flags=None,
+	method="gtd7",
+	outputs=None,
+	keep=None,
+	chunksize=100000,
+	in_format=None,
+	out_format=None,
+	n_threads=None,
+):
+	"""Evaluates the model for the records of a file
+
+	Reads `chunksize` records at a time from `infile`, evaluates
+	the model with :func:`msise_flat()`, and appends the outputs
+	to `outfile`, keeping only one chunk in memory.
+
+	The input needs the columns "time", "alt", "lat", and "lon",
+	and optionally "f107a", "f107", "ap", and "lst". The times can be
+	date-time strings (as accepted by :func:`pandas.to_datetime()`),
+	`datetime64` values (taken as UTC), or seconds since 1970-01-01 UTC.
+	".npy" files contain either a structured array with these fields,
+	or a 2-D array with the columns "time" (in seconds since 1970),
+	"alt", "lat", "lon", and optionally "f107a", "f107", "ap".
+
+	Parameters
+	----------
+	infile: str or path-like
+		The input file, CSV (requires `pandas`), Parquet (requires `pyarrow`),
+		or NumPy ".npy", the format is taken from the extension
+		unless set with `in_format`.
+	outfile: str or path-like
+		The output file, CSV, Parquet, or ".npy" (only for ".npy" or
+		Parquet input, as a structured array), will be overwritten.
+		The format is taken from the extension unless set with `out_format`.
+	f107a, f107, ap: float, optional
+		Indices used for all records without these columns.
+		When neither given here nor as columns, the indices are looked up
+		from the `spaceweather` package, see :func:`nrlmsise00.dataset.msise_4d()`.
+	flags: list of 24 int, optional
+		The model switches, with `flags[9]` set to -1, the Ap arrays are
+		assembled from the 3-hourly `spaceweather` values.
+	method: str, optional, default "gtd7"
+		"gtd7" or "gtd7d", see :func:`msise_flat()`.
+	outputs: list of str, optional
+		Names of the model outputs to write, default: all 11 outputs.
+	keep: list of str, optional
+		Input columns to copy to the CSV or Parquet output,
+		before the model outputs.
+	chunksize: int, optional, default 100000
+		The number of records evaluated at once.
+	in_format, out_format: str, optional
+		"csv", "parquet", or "npy", to override the extensions.
+	n_threads: int, optional
+		Number of threads, see :func:`gtd7_flat()`.
+
+	Returns
+	-------
+	nrows: int
+		The number of records.
+	"""
+	if chunksize < 1:
+		raise ValueError("chunksize must be positive.")
+	in_format = _file_format(infile, in_format)
+	out_format = _file_format(outfile, out_format)
+	cols = _output_columns(outputs)
+	names = [_OUTPUT_NAMES[c] for c in (cols or range(11))]
+	keep = list(keep or [])
+
+	if out_format == "npy":
+		if keep:
+			raise ValueError("keep is not supported for npy output.")
+		nrows = _num_rows(infile, in_format)
+		if nrows is None:
+			raise ValueError("npy output requires npy or parquet input.")
+		writer = _NpyWriter(outfile, nrows, names)
+	elif out_format == "parquet":
+		writer = _ParquetWriter(outfile)
+	else:
+		writer = _CsvWriter(outfile)
+
+	reader = {"csv": _read_csv, "parquet": _read_parquet, "npy": _read_npy}[in_format]
+	nrows = 0
+	try:
+		chunks = reader(infile, chunksize)
+		while True:
+			with _stage("msise_file.read"):
+				chunk = next(chunks, None)
+			if chunk is None:
+				break
+			out = _msise_chunk(
+				chunk, f107a=f107a, f107=f107, ap=ap, flags=flags,
+				method=method, outputs=cols, n_threads=n_threads,
+			)
+			columns = OrderedDict((c, chunk[c]) for c in keep)
+			columns.update((n, out[:, i]) for i, n in enumerate(names))
+			with _stage("msise_file.write") as st:
+				writer.write(columns)
+				st.count(out.shape[0], out.nbytes)
+			nrows += out.shape[0]
+	finally:
+		writer.close()
+	return nrows
+
+
+def _list_arg(s):
+	return [a.strip() for a in s.split(",") if a.strip()]
+
+
+def main(argv=None):
+	"""Command line interface ``nrlmsise00``
+
+	Evaluates the model for the records of a file, see :func:`msise_file()`
+	and ``nrlmsise00 --help``.
+	"""
+	parser = argparse.ArgumentParser(
+		prog="nrlmsise00",
+		description=(
+			"Evaluate the NRLMSISE-00 model for the records (time, alt, lat, lon, "
+			"and optionally f107a, f107, ap, lst) of a CSV, Parquet, or npy file."
+		),
+	)
+	parser.add_argument("infile", help="input file (.csv, .parquet, or .npy)")
+	parser.add_argument("outfile", help="output file (.csv, .parquet, or .npy)")
+	parser.add_argument("--f107a", type=float, help="81-day average f10.7 flux")
+	parser.add_argument("--f107", type=float, help="f10.7 flux of the previous day")
+	parser.add_argument("--ap", type=float, help="daily Ap index")
+	parser.add_argument(
+		"--ap-3h", action="store_true",
+		help="use the 3-hourly Ap history (sets flags[9] to -1)",
+	)
+	parser.add_argument("--method", choices=["gtd7", "gtd7d"], default="gtd7")
+	parser.add_argument(
+		"--outputs", type=_list_arg,
+		help="comma-separated model outputs, e.g. rho,Talt (default: all)",
+	)
+	parser.add_argument(
+		"--keep", type=_list_arg, help="comma-separated input columns to copy",
+	)
+	parser.add_argument(
+		"--chunksize", type=int, default=100000,
+		help="records evaluated at once (default: %(default)s)",
+	)
+	parser.add_argument("--in-format", choices=["csv", "parquet", "npy"])
+	parser.add_argument("--out-format", choices=["csv", "parquet", "npy"])
+	parser.add_argument(
+		"-j", "--threads", type=int, dest="n_threads",
+		help="number of threads, 0 for all CPUs",
+	)
+	parser.add_argument(
+		"--version", action="version", version="%(prog)s " + __version__,
+	)
+	args = parser.parse_args(argv)
+
+	flags = None
+	if args.ap_3h:
+		flags = [0] + [1] * 23
+		flags[9] = -1
+	try:
+		msise_file(
+			args.infile, args.outfile,
+			f107a=args.f107a, f107=args.f107, ap=args.ap,
+			flags=flags, method=args.method, outputs=args.outputs,
+			keep=args.keep, chunksize=args.chunksize,
+			in_format=args.in_format, out_format=args.out_format,
+			n_threads=args.n_threads,
+		)
+	except (IOError, ImportError, KeyError, ValueError) as e:
+		parser.exit(1, "nrlmsise00: error: {0}\n".format(e))
+	return 0
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8
+#
+# Copyright (c) 2019 Stefan Bender
+#
+# This file is part of pynrlmsise00.
+# pynrlmsise00 is free software: you can redistribute it or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+# See accompanying LICENSE file or http://www.gnu.org/licenses/gpl-2.0.html.
+"""Memoization of repeated NRLMSISE-00 model calls
+
+Caches the results of single-point model evaluations in a bounded
+least-recently-used (LRU) cache, such that repeated identical queries
+do not evaluate the model again.
+"""
+from __future__ import absolute_import, division, print_function
+
+from collections import OrderedDict, namedtuple
+import threading
+
+from ._nrlmsise00 import gtd7, gtd7d
+from .core import _msise_model_time
+
+__all__ = ["MsisCache", "CacheInfo"]
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class MsisCache(object):
+	"""Bounded LRU cache of model results
+
+	Provides :meth:`msise_model()`, :meth:`gtd7()`, and :meth:`gtd7d()`
+	with the same arguments as the uncached functions, returning
+	the cached results for repeated inputs. The instances can be used
+	from multiple threads.
+
+	Parameters
+	----------
+	maxsize: int, optional, default 1024
+		The maximum number of cached results, the least recently used
+		results are discarded first.
+	decimals: int, optional
+		Round the time (seconds of the day) and the floating point
+		inputs to this number of decimals before looking them up,
+		the model is then evaluated at the rounded values.
+		By default, the inputs are used as they are.
+
+	Examples
+	--------
+	>>> from datetime import datetime
+	>>> from nrlmsise00 import MsisCache
+	>>> cache = MsisCache(maxsize=128)
+	>>> time = datetime(2009, 6, 21, 8, 3, 20)
+	>>> ds, ts = cache.msise_model(time, 400, 60, -70, 150, 150, 4)
+	>>> ds, ts = cache.msise_model(time, 400, 60, -70, 150, 150, 4)
+	>>> cache.cache_info()
+	CacheInfo(hits=1, misses=1, maxsize=128, currsize=1)
+	"""
+	def __init__(self, maxsize=1024, decimals=None):
+		if maxsize < 1:
+			raise ValueError("maxsize must be positive.")
+		self.maxsize = int(maxsize)
+		self.decimals = decimals
+		self._cache = OrderedDict()
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+
+	def _key(self, name, year, doy, sec, alt, g_lat, g_long, lst,
+			f107A, f107, ap, ap_a, flags, config):
+		args = (
+			int(year), int(doy), float(sec), float(alt), float(g_lat),
+			float(g_long), float(lst), float(f107A), float(f107), float(ap),
+		)
+		if self.decimals is not None:
+			args = args[:2] + tuple(round(x, self.decimals) for x in args[2:])
+		if config is not None:
+			ap_a, flags = config.ap_a, config.flags
+		if ap_a is not None:
+			ap_a = tuple(float(a) for a in ap_a)
+		if flags is not None:
+			flags = tuple(int(f) for f in flags)
+		return args, (name,) + args + (ap_a, flags)
+
+	def _gtd7(self, func, name, year, doy, sec, alt, g_lat, g_long, lst,
+			f107A, f107, ap, ap_a=None, flags=None, config=None):
+		args, key = self._key(
+			name, year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap,
+			ap_a, flags, config,
+		)
+		with self._lock:
+			res = self._cache.pop(key, None)
+			if res is not None:
+				self.hits += 1
+				# most recently used last
+				self._cache[key] = res
+				return list(res[0]), list(res[1])
+			self.misses += 1
+		# evaluated without holding the lock, concurrent misses
+		# of the same key evaluate the model more than once
+		kwargs = {}
+		if ap_a is not None:
+			kwargs["ap_a"] = ap_a
+		if flags is not None:
+			kwargs["flags"] = flags
+		if config is not None:
+			kwargs["config"] = config
+		ds, ts = func(*args, **kwargs)
+		with self._lock:
+			self._cache.pop(key, None)
+			self._cache[key] = (tuple(ds), tuple(ts))
+			while len(self._cache) > self.maxsize:
+				self._cache.popitem(last=False)
+		return ds, ts
+
+	def gtd7(self, year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap,
+			ap_a=None, flags=None, config=None):
+		"""Cached :func:`gtd7()`, see :func:`nrlmsise00._nrlmsise00.gtd7()`"""
+		return self._gtd7(
+			gtd7, "gtd7", year, doy, sec, alt, g_lat, g_long, lst,
+			f107A, f107, ap, ap_a=ap_a, flags=flags, config=config,
+		)
+
+	def gtd7d(self, year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap,
+			ap_a=None, flags=None, config=None):
+		"""Cached :func:`gtd7d()`, see :func:`nrlmsise00._nrlmsise00.gtd7d()`"""
+		return self._gtd7(
+			gtd7d, "gtd7d", year, doy, sec, alt, g_lat, g_long, lst,
+			f107A, f107, ap, ap_a=ap_a, flags=flags, config=config,
+		)
+
+	def msise_model(self, time, alt, lat, lon, f107a, f107, ap,
+			lst=None, ap_a=None, flags=None, method="gtd7", config=None):
+		"""Cached :func:`msise_model()`
+
+		Same arguments and return values as :func:`msise_model()`.
+		"""
+		year, doy, sec, lst = _msise_model_time(time, lon, lst)
+		cached = self.gtd7d if method == "gtd7d" else self.gtd7
+		return cached(
+			year, doy, sec, alt, lat, lon, lst, f107a, f107, ap,
+			ap_a=ap_a, flags=flags, config=config,
+		)
+
+	def cache_info(self):
+		"""Hits, misses, and the maximum and current size of the cache
+
+		Returns
+		-------
+		info: CacheInfo
+			Named tuple (hits, misses, maxsize, currsize) like
+			:func:`functools.lru_cache`.
+		"""
+		with self._lock:
+			return CacheInfo(self.hits, self.misses, self.maxsize, len(self._cache))
+
+	def cache_clear(self):
+		"""Removes all results and resets the counters"""
+		with self._lock:
+			self._cache.clear()
+			self.hits = 0
+			self.misses = 0
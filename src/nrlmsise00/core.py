@@ -15,12 +15,49 @@
 from __future__ import absolute_import, division, print_function
 
 from functools import wraps
+from multiprocessing import cpu_count
+import os
+import threading
+import warnings
 
 import numpy as np
 
-from ._nrlmsise00 import gtd7, gtd7d
+from ._nrlmsise00 import gtd7, gtd7d, ghp7
+from ._nrlmsise00 import gtd7_array, gtd7d_array, ghp7_array
+from ._nrlmsise00 import gtd7_profile_array, gtd7d_profile_array
+from ._nrlmsise00 import gtd7_jacobian_array, gtd7d_jacobian_array
+from ._nrlmsise00 import MsisConfig
+from .instrument import _stage
 
-__all__ = ["gtd7_flat", "gtd7d_flat", "msise_model", "msise_flat", "scale_height"]
+__all__ = [
+	"gtd7_flat", "gtd7d_flat", "ghp7_flat",
+	"gtd7_profile", "gtd7d_profile",
+	"gtd7_jacobian", "gtd7d_jacobian",
+	"MsisConfig", "ap_a_3h",
+	"msise_model", "msise_flat", "scale_height",
+	"get_num_threads", "set_num_threads",
+	"local_solar_time",
+]
+
+# minimum number of points evaluated by a single thread
+_MIN_CHUNK_SIZE = 1024
+# names of the output columns, the altitude only from `ghp7()`
+_OUTPUT_NAMES = [
+	"He", "O", "N2", "O2", "Ar", "rho", "H", "N", "AnomO",
+	"Texo", "Talt", "alt",
+]
+# inputs for the derivatives, index in the argument list and default step
+_JACOBIAN_INPUTS = {
+	"alt": (3, 1e-3),
+	"lat": (4, 1e-3),
+	"lon": (5, 1e-3),
+	"lst": (6, 1e-4),
+	"f107a": (7, 1e-2),
+	"f107": (8, 1e-2),
+	"ap": (9, 1e-2),
+}
+# default number of threads, see `_env_num_threads()`
+_num_threads = 1
 
 
 def _doc_param(*sub):
@@ -47,47 +84,821 @@ def vectorize_function(pyfunc, **kwargs):
 	return run_wrapped
 
 
+def get_num_threads():
+	"""Default number of threads for the batched model evaluation
+
+	Initially set from the environment variable `NRLMSISE00_NUM_THREADS`,
+	and 1 if that is not set or not an integer. Values smaller than 1
+	select the number of available CPUs.
+
+	Returns
+	-------
+	n_threads: int
+		The number of threads used when `n_threads` is not given.
+	"""
+	return _num_threads
+
+
+def set_num_threads(n_threads):
+	"""Sets the default number of threads for the batched model evaluation
+
+	Parameters
+	----------
+	n_threads: int
+		The number of threads used when `n_threads` is not given explicitly
+		to :func:`gtd7_flat()`, :func:`gtd7d_flat()`, or :func:`msise_flat()`.
+		Values smaller than 1 select the number of available CPUs.
+
+	Returns
+	-------
+	n_threads: int
+		The previous setting.
+	"""
+	global _num_threads
+	old, _num_threads = _num_threads, int(n_threads)
+	return old
+
+
+def _check_num_threads(n_threads):
+	if n_threads is None:
+		n_threads = _num_threads
+	if n_threads < 1:
+		n_threads = cpu_count()
+	return n_threads
+
+
+def _env_num_threads():
+	"""Number of threads from the environment variable `NRLMSISE00_NUM_THREADS`
+
+	Falls back to 1 with a warning if it is set but not an integer.
+	"""
+	value = os.environ.get("NRLMSISE00_NUM_THREADS", "1")
+	try:
+		n_threads = int(value)
+	except ValueError:
+		warnings.warn(
+			"Invalid NRLMSISE00_NUM_THREADS={0!r}, using 1 thread.".format(value),
+			RuntimeWarning,
+		)
+		n_threads = 1
+	return _check_num_threads(n_threads)
+
+
+_num_threads = _env_num_threads()
+
+
+def _run_threaded(cfunc, ins, out, n_threads, split=None, **kwargs):
+	"""Splits the points into contiguous chunks evaluated by `n_threads`
+
+	The C functions release the GIL and the model is thread-safe,
+	so the chunks are evaluated in parallel. `out` is a 2-D array
+	with one row per point (or profile), the rows are split between
+	the threads. The arrays in the dictionary `split` are split along
+	their first axis as well and passed as keyword arguments.
+	Profile outputs can also be 3-D (profile, altitude, output)
+	or 4-D, the latter with the profiles along the first two axes,
+	which is split along the first one, or along the second one
+	if the first one is shorter than `n_threads`.
+	"""
+	split = split or {}
+	# profiles per entry along the first axis
+	m = out.shape[1] if out.ndim == 4 else 1
+	n = out.shape[0]
+	axis = 1 if out.ndim == 4 and n < n_threads else 0
+	n_threads = min(n_threads, max(1, n * m // _MIN_CHUNK_SIZE), max(out.shape[axis], 1))
+	if n_threads == 1:
+		kwargs.update({k: v.reshape(-1) for k, v in split.items()})
+		cfunc(*ins, out=out, **kwargs)
+		return
+
+	errors = []
+
+	def _part(a, i0, i1):
+		# the inputs of the profiles `i0:i1` along `axis`
+		if axis == 0:
+			return a[i0 * m:i1 * m]
+		a = a.reshape((n, m) + a.shape[1:])[:, i0:i1]
+		return a.reshape((-1,) + a.shape[2:])
+
+	def _eval(i0, i1):
+		kw = dict(kwargs)
+		kw.update({
+			k: v.reshape(-1) if v.shape[0] == 1 else _part(v, i0, i1).reshape(-1)
+			for k, v in split.items()
+		})
+		try:
+			cfunc(
+				*[a if a.size == 1 else _part(a, i0, i1) for a in ins],
+				out=out[i0:i1] if axis == 0 else out[:, i0:i1], **kw
+			)
+		except Exception as e:
+			errors.append(e)
+
+	bounds = np.linspace(0, out.shape[axis], n_threads + 1).astype(int)
+	threads = [
+		threading.Thread(target=_eval, args=(i0, i1))
+		for i0, i1 in zip(bounds[:-1], bounds[1:])
+	]
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	if errors:
+		raise errors[0]
+
+
+def _shard_eval(shm_name, shape, dtype, index, func, args, kwargs):
+	"""Evaluates `func(*args, **kwargs)` into `index` of the shared array
+
+	`func` writes to its `out` argument. Runs in the worker processes
+	of :func:`_run_processes()`.
+	"""
+	from multiprocessing import shared_memory
+
+	shm = shared_memory.SharedMemory(name=shm_name)
+	try:
+		res = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+		func(*args, out=res[index], **kwargs)
+		del res
+	finally:
+		shm.close()
+
+
+def _check_num_jobs(n_jobs):
+	if n_jobs is None or n_jobs < 1:
+		return cpu_count()
+	return n_jobs
+
+
+def _shard_bounds(n, n_jobs):
+	"""Contiguous, non-empty shards of `n` items for `n_jobs`"""
+	bounds = np.linspace(0, n, min(n, n_jobs) + 1).astype(int)
+	return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _run_processes(func, shape, dtype, shards, n_jobs, executor=None, out=None):
+	"""Evaluates the `shards` in worker processes
+
+	Each shard is a tuple `(index, args, kwargs)`, `func(*args, **kwargs)`
+	writes to `index` of the result with `shape` and `dtype`
+	passed as its `out` argument.
+	The result is allocated in shared memory, such that the workers
+	write their parts directly instead of returning them to this process.
+	The shards are submitted to `executor` if given, otherwise to
+	a new :class:`concurrent.futures.ProcessPoolExecutor` with
+	`n_jobs` processes.
+	The result is copied once from the shared memory to `out`
+	(the same number of elements, reshaped to `out.shape`) if given,
+	otherwise to a new array.
+	"""
+	try:
+		from concurrent.futures import ProcessPoolExecutor
+		from multiprocessing import shared_memory
+	except ImportError:
+		raise ImportError(
+			"`n_jobs` and `executor` require `concurrent.futures` and "
+			"`multiprocessing.shared_memory` (Python 3.8 or later)."
+		)
+	dtype = np.dtype(dtype)
+	size = max(1, int(np.prod(shape)) * dtype.itemsize)
+	shm = shared_memory.SharedMemory(create=True, size=size)
+	try:
+		own = executor is None
+		if own:
+			executor = ProcessPoolExecutor(n_jobs)
+		try:
+			futures = [
+				executor.submit(
+					_shard_eval, shm.name, shape, dtype, index, func, args, kwargs
+				)
+				for index, args, kwargs in shards
+			]
+			for f in futures:
+				f.result()
+		finally:
+			if own:
+				executor.shutdown()
+		res = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+		if out is None:
+			out = np.empty(shape, dtype=dtype)
+		out[...] = res.reshape(out.shape)
+		del res
+		return out
+	finally:
+		shm.close()
+		shm.unlink()
+
+
+def _output_array(out, shape, dtype=None):
+	"""Checks the output array `out`, or allocates it if `None`
+
+	`out` needs to have the full output `shape` and
+	a float64 or float32 dtype, and it can be strided.
+	"""
+	if out is None:
+		return np.empty(shape, dtype=np.float64 if dtype is None else dtype)
+	if not isinstance(out, np.ndarray):
+		raise TypeError("out must be a numpy.ndarray.")
+	if out.shape != shape:
+		raise ValueError(
+			"out must have the shape {0}, got {1}.".format(shape, out.shape)
+		)
+	if dtype is not None and out.dtype != np.dtype(dtype):
+		raise ValueError(
+			"out has dtype {0}, but {1} was requested.".format(out.dtype, dtype)
+		)
+	return out
+
+
+def _output_rows(out, ncols, nblocks=1):
+	"""2-D (points, `nblocks` * `ncols`) view of `out` for the C functions
+
+	For profiles (`nblocks` altitudes), also tries 3-D views
+	(profiles, `nblocks`, `ncols`) and 4-D views with the profiles
+	along the first two axes, as supported by the C functions.
+	Returns a new 2-D array if `out` cannot be viewed that way,
+	its values then need to be copied back to `out`.
+	"""
+	if out.dtype not in (np.float64, np.float32):
+		raise TypeError(
+			"Only float64 and float32 outputs are supported, got {0}.".format(out.dtype)
+		)
+	shapes = [(-1, nblocks * ncols)]
+	if nblocks > 1 and out.ndim > 2:
+		shapes += [(-1, nblocks, ncols), (out.shape[0], -1, nblocks, ncols)]
+	for shape in shapes:
+		rows = out.view()
+		try:
+			rows.shape = shape
+			return rows
+		except (AttributeError, ValueError):
+			# the strides do not allow a view
+			pass
+	return np.empty((out.size // (nblocks * ncols), nblocks * ncols), dtype=out.dtype)
+
+
+def _split_ap_a(ap_a):
+	"""Separates `ap_a` arrays with shape (..., 7) from single lists
+
+	Returns the list (or `None`) and the array (or `None`).
+	"""
+	if ap_a is not None and np.ndim(ap_a) > 1:
+		ap_arr = np.asarray(ap_a, dtype=np.float64)
+		if ap_arr.shape[-1] != 7:
+			raise ValueError(
+				"ap_a arrays must have shape (..., 7), got {0}.".format(ap_arr.shape)
+			)
+		return None, ap_arr
+	return ap_a, None
+
+
+def _broadcast_ap_a(ap_arr, shape):
+	"""Per-point Ap arrays with shape (`prod(shape)`, 7) or (1, 7)"""
+	if ap_arr[..., 0].size > 1:
+		ap_arr = np.broadcast_to(ap_arr, shape + (7,))
+	return np.ascontiguousarray(ap_arr).reshape(-1, 7)
+
+
+def _config_kwargs(ap_a=None, flags=None, config=None):
+	"""Keyword arguments for the C functions
+
+	Converts `ap_a` and `flags` to a :class:`MsisConfig` once,
+	which is then shared by all calls (and threads).
+	"""
+	kwargs = {}
+	if ap_a is not None:
+		kwargs.update({"ap_a": list(ap_a)})
+	if flags is not None:
+		kwargs.update({"flags": list(flags)})
+	if config is not None:
+		if kwargs:
+			raise ValueError("config cannot be combined with ap_a or flags.")
+		return {"config": config}
+	return {"config": MsisConfig(**kwargs)} if kwargs else {}
+
+
+def _output_columns(outputs, nout=11):
+	"""Column indices of the names (or indices) in `outputs`
+
+	Returns `None` if `outputs` is `None`, i.e. all `nout` columns.
+	"""
+	if outputs is None:
+		return None
+	if isinstance(outputs, (str, int)):
+		outputs = [outputs]
+	cols = []
+	for o in outputs:
+		c = _OUTPUT_NAMES.index(o) if o in _OUTPUT_NAMES[:nout] else o
+		if isinstance(c, str) or not 0 <= c < nout:
+			raise ValueError(
+				"Unknown output {0!r}, must be one of {1} or their index.".format(
+					o, _OUTPUT_NAMES[:nout]
+				)
+			)
+		cols.append(int(c))
+	if not cols:
+		raise ValueError("outputs must not be empty.")
+	return cols
+
+
+def _msis_array(cfunc, year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap,
+		ap_a=None, flags=None, config=None, n_threads=None, nout=11,
+		outputs=None, out=None, dtype=None):
+	"""Broadcasts the inputs and calls the batched C function `cfunc`
+
+	The output is allocated once with shape (..., `nout`), or
+	(..., len(`outputs`)), unless given as `out`, and filled
+	in-place by the C code. Scalar inputs are passed as is,
+	all other inputs are broadcast to the common shape and
+	made contiguous.
+	"""
+	cols = _output_columns(outputs, nout=nout)
+	ap_a, ap_arr = _split_ap_a(ap_a)
+	ins = [
+		np.asarray(a, dtype=np.float64)
+		for a in (year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap)
+	]
+	shape = np.broadcast(
+		*(ins if ap_arr is None else ins + [ap_arr[..., 0]])
+	).shape
+	ins = [
+		a.reshape(-1) if a.size == 1
+		else np.ascontiguousarray(np.broadcast_to(a, shape)).reshape(-1)
+		for a in ins
+	]
+	nout = nout if cols is None else len(cols)
+	new_out = out is None
+	out = _output_array(out, shape + (nout,), dtype=dtype)
+	rows = _output_rows(out, nout)
+	# allocated output size
+	nbytes = (out.nbytes if new_out else 0) + (rows.nbytes if rows.base is None else 0)
+
+	kwargs = _config_kwargs(ap_a=ap_a, flags=flags, config=config)
+	if cols is not None:
+		kwargs.update({"outputs": cols})
+	split = {}
+	if ap_arr is not None:
+		split.update({"ap_a": _broadcast_ap_a(ap_arr, shape)})
+
+	with _stage(cfunc.__name__) as st:
+		_run_threaded(
+			cfunc, ins, rows, _check_num_threads(n_threads),
+			split=split, **kwargs
+		)
+		st.count(rows.shape[0], nbytes)
+	if rows.base is None:
+		out[...] = rows.reshape(out.shape)
+	return out
+
+
 @_doc_param(gtd7.__doc__)
-def _gtd7_flat(*args, **kwargs):
+def gtd7_flat(year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap,
+		ap_a=None, flags=None, config=None, n_threads=None, outputs=None,
+		out=None, dtype=None):
 	"""Flattened variant of the MSIS `gtd7()` function
 
 	Returns a single 11-element :class:`numpy.ndarray` instead of
-	the two lists. All arguments except the keywords `flags` and
-	`ap_a` can be :class:`numpy.ndarray` to facilitate calculations
-	at many locations/times.
+	the two lists. All arguments except the keywords `flags`,
+	`ap_a`, and `config` can be :class:`numpy.ndarray` to facilitate calculations
+	at many locations/times. The inputs are broadcast against each
+	other and the model is evaluated in a single call to the
+	C extension, the result has the shape (..., 11).
+	`ap_a` can be an array of shape (..., 7) with a separate
+	Ap array for each point, broadcast against the other inputs.
+
+	Large inputs can be split across several threads, set by the
+	keyword `n_threads` (default from :func:`get_num_threads()`).
+	Values smaller than 1 use all available CPUs.
+
+	The keyword `outputs` selects the output columns by name,
+	"He", "O", "N2", "O2", "Ar", "rho", "H", "N", "AnomO", "Texo", "Talt",
+	or by index, the result then has the shape (..., len(`outputs`)).
+	Densities that are not needed for these are not calculated,
+	e.g. all except N2 for the temperatures only.
+
+	The result is written to `out` if given, a :class:`numpy.ndarray`
+	of the result's shape, which can be strided (e.g. a slice of
+	a larger array) and can be reused for repeated calls.
+	`dtype` can be set to :class:`numpy.float32` to return
+	single precision values, the model itself is evaluated
+	in double precision. `out` can be float64 or float32.
 
 	{0}
 	"""
-	ds, ts = gtd7(*args, **kwargs)
-	return np.asarray(ds + ts)
+	return _msis_array(
+		gtd7_array,
+		year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap,
+		ap_a=ap_a, flags=flags, config=config, n_threads=n_threads,
+		outputs=outputs, out=out, dtype=dtype,
+	)
 
 
 @_doc_param(gtd7d.__doc__)
-def _gtd7d_flat(*args, **kwargs):
+def gtd7d_flat(year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap,
+		ap_a=None, flags=None, config=None, n_threads=None, outputs=None,
+		out=None, dtype=None):
 	"""Flattened variant of the MSIS `gtd7d()` function
 
 	Returns a single 11-element :class:`numpy.ndarray` instead of
-	the two lists. All arguments except the keywords `flags` and
-	`ap_a` can be :class:`numpy.ndarray` to facilitate calculations
-	at many locations/times.
+	the two lists. All arguments except the keywords `flags`,
+	`ap_a`, and `config` can be :class:`numpy.ndarray` to facilitate calculations
+	at many locations/times. The inputs are broadcast against each
+	other and the model is evaluated in a single call to the
+	C extension, the result has the shape (..., 11).
+	`ap_a` can be an array of shape (..., 7) with a separate
+	Ap array for each point, broadcast against the other inputs.
+
+	Large inputs can be split across several threads, set by the
+	keyword `n_threads` (default from :func:`get_num_threads()`).
+	Values smaller than 1 use all available CPUs.
+
+	The keyword `outputs` selects the output columns by name,
+	"He", "O", "N2", "O2", "Ar", "rho", "H", "N", "AnomO", "Texo", "Talt",
+	or by index, the result then has the shape (..., len(`outputs`)).
+	Densities that are not needed for these are not calculated,
+	e.g. all except N2 for the temperatures only.
+
+	The result is written to `out` if given, a :class:`numpy.ndarray`
+	of the result's shape, which can be strided (e.g. a slice of
+	a larger array) and can be reused for repeated calls.
+	`dtype` can be set to :class:`numpy.float32` to return
+	single precision values, the model itself is evaluated
+	in double precision. `out` can be float64 or float32.
 
 	{0}
 	"""
-	ds, ts = gtd7d(*args, **kwargs)
-	return np.asarray(ds + ts)
+	return _msis_array(
+		gtd7d_array,
+		year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap,
+		ap_a=ap_a, flags=flags, config=config, n_threads=n_threads,
+		outputs=outputs, out=out, dtype=dtype,
+	)
 
 
-gtd7_flat = vectorize_function(_gtd7_flat,
-		signature='(),(),(),(),(),(),(),(),(),()->(n)',
-		excluded=["ap_a", "flags"])
+@_doc_param(ghp7.__doc__)
+def ghp7_flat(year, doy, sec, press, g_lat, g_long, lst, f107A, f107, ap,
+		ap_a=None, flags=None, config=None, n_threads=None, outputs=None,
+		out=None, dtype=None):
+	"""Flattened variant of the MSIS `ghp7()` function
 
-gtd7d_flat = vectorize_function(_gtd7d_flat,
-		signature='(),(),(),(),(),(),(),(),(),()->(n)',
-		excluded=["ap_a", "flags"])
+	Returns a single 12-element :class:`numpy.ndarray` instead of
+	the two lists and the altitude, the altitude of the pressure level
+	in [km] is the last element. All arguments except the keywords
+	`flags`, `ap_a`, and `config` can be :class:`numpy.ndarray` and are
+	broadcast against each other, the result has the shape (..., 12).
+	See :func:`gtd7_flat()` for `ap_a` arrays of shape (..., 7)
+	and the `n_threads`, `out`, `dtype`, and `outputs` keywords, the altitude
+	can be selected as "alt". The full model is evaluated to find
+	the pressure level, `outputs` only selects the columns.
+
+	{0}
+	"""
+	return _msis_array(
+		ghp7_array,
+		year, doy, sec, press, g_lat, g_long, lst, f107A, f107, ap,
+		ap_a=ap_a, flags=flags, config=config, n_threads=n_threads, nout=12,
+		outputs=outputs, out=out, dtype=dtype,
+	)
+
+
+def _msis_profile(cfunc, year, doy, sec, g_lat, g_long, lst, f107A, f107, ap, alt,
+		ap_a=None, flags=None, config=None, n_threads=None, outputs=None,
+		out=None, dtype=None):
+	"""Broadcasts the inputs and calls the C profile function `cfunc`
+
+	The output has the shape (..., `alt.shape`, 11), or
+	(..., `alt.shape`, len(`outputs`)), with the broadcast
+	shape of the time and location inputs first.
+	"""
+	cols = _output_columns(outputs)
+	nout = 11 if cols is None else len(cols)
+	ap_a, ap_arr = _split_ap_a(ap_a)
+	ins = [
+		np.asarray(a, dtype=np.float64)
+		for a in (year, doy, sec, g_lat, g_long, lst, f107A, f107, ap)
+	]
+	shape = np.broadcast(
+		*(ins if ap_arr is None else ins + [ap_arr[..., 0]])
+	).shape
+	ins = [
+		a.reshape(-1) if a.size == 1
+		else np.ascontiguousarray(np.broadcast_to(a, shape)).reshape(-1)
+		for a in ins
+	]
+	alt = np.ascontiguousarray(alt, dtype=np.float64)
+	new_out = out is None
+	out = _output_array(out, shape + alt.shape + (nout,), dtype=dtype)
+	if out.size == 0:
+		return out
+	# one row per profile for splitting across threads
+	rows = _output_rows(out, nout, nblocks=alt.size)
+	# allocated output size
+	nbytes = (out.nbytes if new_out else 0) + (rows.nbytes if rows.base is None else 0)
+
+	kwargs = _config_kwargs(ap_a=ap_a, flags=flags, config=config)
+	kwargs.update({"alt": alt.reshape(-1)})
+	if cols is not None:
+		kwargs.update({"outputs": cols})
+	split = {}
+	if ap_arr is not None:
+		split.update({"ap_a": _broadcast_ap_a(ap_arr, shape)})
+
+	with _stage(cfunc.__name__) as st:
+		_run_threaded(
+			cfunc, ins, rows,
+			_check_num_threads(n_threads), split=split, **kwargs
+		)
+		st.count(out.size // nout, nbytes)
+	if rows.base is None:
+		out[...] = rows.reshape(out.shape)
+	return out
+
+
+def gtd7_profile(year, doy, sec, g_lat, g_long, lst, f107A, f107, ap, alt,
+		ap_a=None, flags=None, config=None, n_threads=None, outputs=None,
+		out=None, dtype=None):
+	"""Altitude profiles of the MSIS `gtd7()` function
+
+	Evaluates the model at the altitudes `alt` for each time and location,
+	calculating the altitude-independent parts of the model only once
+	per profile. The results are the same as from :func:`gtd7_flat()`.
+
+	Parameters
+	----------
+	year, doy, sec, g_lat, g_long, lst, f107A, f107, ap: float or array_like
+		Time, location, local solar time, and indices as for `gtd7()`,
+		broadcast against each other to a common shape (...).
+	alt: float or array_like (J,)
+		The altitudes of each profile in [km].
+	ap_a: list of 7 floats or array_like (..., 7), optional
+		Same as for `gtd7()`, or an Ap array for each profile.
+	flags: list of 24 int, optional
+		Same as for `gtd7()`.
+	config: MsisConfig, optional
+		Same as for `gtd7()`.
+	n_threads: int, optional
+		Number of threads, the profiles are split between them,
+		see :func:`gtd7_flat()`.
+	outputs: list of str or int, optional
+		Names or indices of the output columns, see :func:`gtd7_flat()`.
+		Only the densities needed for these are calculated.
+	out: numpy.ndarray (..., J, 11) or (..., J, len(outputs)), optional
+		Array to write the result to, can be strided,
+		see :func:`gtd7_flat()`.
+	dtype: numpy.dtype, optional
+		float64 (default) or float32, the type of the result.
+
+	Returns
+	-------
+	output: numpy.ndarray (..., J, 11) or (..., J, len(outputs))
+		The nine densities and the two temperatures as for
+		:func:`gtd7_flat()` at each altitude of each profile,
+		or the columns selected by `outputs`.
+	"""
+	return _msis_profile(
+		gtd7_profile_array,
+		year, doy, sec, g_lat, g_long, lst, f107A, f107, ap, alt,
+		ap_a=ap_a, flags=flags, config=config, n_threads=n_threads,
+		outputs=outputs, out=out, dtype=dtype,
+	)
+
+
+def gtd7d_profile(year, doy, sec, g_lat, g_long, lst, f107A, f107, ap, alt,
+		ap_a=None, flags=None, config=None, n_threads=None, outputs=None,
+		out=None, dtype=None):
+	"""Altitude profiles of the MSIS `gtd7d()` function
+
+	Same as :func:`gtd7_profile()`, but including anomalous oxygen
+	in the total mass density as `gtd7d()` does.
+
+	See also
+	--------
+	gtd7_profile
+	"""
+	return _msis_profile(
+		gtd7d_profile_array,
+		year, doy, sec, g_lat, g_long, lst, f107A, f107, ap, alt,
+		ap_a=ap_a, flags=flags, config=config, n_threads=n_threads,
+		outputs=outputs, out=out, dtype=dtype,
+	)
+
+
+def _msis_jacobian(cfunc, year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap,
+		wrt=("alt", "lat", "lon", "f107"), steps=None,
+		ap_a=None, flags=None, config=None, n_threads=None, outputs=None):
+	"""Broadcasts the inputs and calls the C jacobian function `cfunc`
+
+	Returns the output with shape (..., `nout`) and the derivatives
+	with shape (..., `nout`, len(`wrt`)).
+	"""
+	if isinstance(wrt, str):
+		wrt = [wrt]
+	steps = steps or {}
+	unknown = set(wrt) - set(_JACOBIAN_INPUTS)
+	if unknown or not wrt:
+		raise ValueError(
+			"wrt must contain names of {0}, got {1}.".format(
+				sorted(_JACOBIAN_INPUTS), list(wrt)
+			)
+		)
+	idx = [_JACOBIAN_INPUTS[w][0] for w in wrt]
+	hs = [float(steps.get(w, _JACOBIAN_INPUTS[w][1])) for w in wrt]
+
+	cols = _output_columns(outputs)
+	nout = 11 if cols is None else len(cols)
+	ap_a, ap_arr = _split_ap_a(ap_a)
+	ins = [
+		np.asarray(a, dtype=np.float64)
+		for a in (year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap)
+	]
+	shape = np.broadcast(
+		*(ins if ap_arr is None else ins + [ap_arr[..., 0]])
+	).shape
+	ins = [
+		a.reshape(-1) if a.size == 1
+		else np.ascontiguousarray(np.broadcast_to(a, shape)).reshape(-1)
+		for a in ins
+	]
+	out = np.empty(shape + (nout,))
+	jac = np.empty(shape + (nout, len(wrt)))
+
+	kwargs = _config_kwargs(ap_a=ap_a, flags=flags, config=config)
+	kwargs.update({"wrt": idx, "steps": hs})
+	if cols is not None:
+		kwargs.update({"outputs": cols})
+	split = {"jac": jac.reshape(-1, nout * len(wrt))}
+	if ap_arr is not None:
+		split.update({"ap_a": _broadcast_ap_a(ap_arr, shape)})
+
+	with _stage(cfunc.__name__) as st:
+		_run_threaded(
+			cfunc, ins, out.reshape(-1, nout), _check_num_threads(n_threads),
+			split=split, **kwargs
+		)
+		st.count(out.size // nout * (1 + 2 * len(wrt)), out.nbytes + jac.nbytes)
+	return out, jac
+
+
+def gtd7_jacobian(year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap,
+		wrt=("alt", "lat", "lon", "f107"), steps=None,
+		ap_a=None, flags=None, config=None, n_threads=None, outputs=None):
+	"""The MSIS `gtd7()` function and its derivatives
+
+	Evaluates the model and its derivatives with respect to the
+	inputs `wrt` in a single call to the C extension.
+	The derivatives are calculated from central differences,
+	the altitude derivative uses the same altitude-independent
+	model terms as the point itself, the others evaluate the model
+	twice for each input.
+
+	Parameters
+	----------
+	year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap: float or array_like
+		The inputs as for :func:`gtd7_flat()`, broadcast against
+		each other to a common shape (...).
+	wrt: list of str, optional
+		The inputs for the derivatives, out of "alt", "lat", "lon", "lst",
+		"f107a", "f107", and "ap", default: ("alt", "lat", "lon", "f107").
+		The longitude derivative is taken at fixed universal time,
+		i.e. including the change of the local solar time.
+	steps: dict, optional
+		Finite difference steps for the inputs in `wrt`, the defaults are
+		1e-3 km, 1e-3°, 1e-3°, 1e-4 h, 1e-2 sfu, 1e-2 sfu, and 1e-2.
+	ap_a: list of 7 floats or array_like (..., 7), optional
+		Same as for :func:`gtd7_flat()`.
+	flags: list of 24 int, optional
+		Same as for `gtd7()`.
+	config: MsisConfig, optional
+		Same as for `gtd7()`.
+	n_threads: int, optional
+		Number of threads, see :func:`gtd7_flat()`.
+	outputs: list of str or int, optional
+		Names or indices of the output columns, see :func:`gtd7_flat()`.
+
+	Returns
+	-------
+	output: numpy.ndarray (..., 11) or (..., len(outputs))
+		The nine densities and the two temperatures as for
+		:func:`gtd7_flat()`, or the columns selected by `outputs`.
+	jacobian: numpy.ndarray (..., 11, len(wrt)) or (..., len(outputs), len(wrt))
+		The derivatives of the outputs with respect to the inputs
+		in `wrt`, per km, degree, hour, sfu, or Ap unit.
+
+	Examples
+	--------
+	>>> from nrlmsise00 import gtd7_jacobian
+	>>> rho, drho = gtd7_jacobian(
+	... 	2009, 172, 29000, 400, 60, -70, 16, 150, 150, 4,
+	... 	wrt=["alt", "f107"], outputs=["rho"],
+	... )
+	>>> drho.shape
+	(1, 2)
+	"""
+	return _msis_jacobian(
+		gtd7_jacobian_array,
+		year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap,
+		wrt=wrt, steps=steps, ap_a=ap_a, flags=flags, config=config,
+		n_threads=n_threads, outputs=outputs,
+	)
+
+
+def gtd7d_jacobian(year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap,
+		wrt=("alt", "lat", "lon", "f107"), steps=None,
+		ap_a=None, flags=None, config=None, n_threads=None, outputs=None):
+	"""The MSIS `gtd7d()` function and its derivatives
+
+	Same as :func:`gtd7_jacobian()`, but including anomalous oxygen
+	in the total mass density as `gtd7d()` does.
+
+	See also
+	--------
+	gtd7_jacobian
+	"""
+	return _msis_jacobian(
+		gtd7d_jacobian_array,
+		year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap,
+		wrt=wrt, steps=steps, ap_a=ap_a, flags=flags, config=config,
+		n_threads=n_threads, outputs=outputs,
+	)
+
+
+def _equation_of_time(year, doy, sec):
+	"""Equation of time (apparent minus mean solar time) in [h]
+
+	Uses the Fourier series of Spencer (1971) [#]_ for the fractional
+	year at `doy` and `sec` (UT), accurate to about half a minute.
+
+	.. [#] Spencer, J. W., Fourier series representation of the position
+		of the sun, Search 2(5), 172, 1971
+	"""
+	year = np.asarray(year)
+	leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+	gamma = 2. * np.pi / (365. + leap) * (doy - 1. + (sec / 3600. - 12.) / 24.)
+	return 229.18 / 60. * (
+		0.000075
+		+ 0.001868 * np.cos(gamma) - 0.032077 * np.sin(gamma)
+		- 0.014615 * np.cos(2. * gamma) - 0.040849 * np.sin(2. * gamma)
+	)
+
+
+def _local_solar_time(year, doy, sec, lon, lst=None):
+	"""Local solar time in [h], vectorized over all inputs
+
+	Returns the mean local solar time if `lst` is `None` or "mean",
+	the apparent local solar time including the equation of time
+	if `lst` is "apparent", and `lst` itself otherwise.
+	"""
+	if lst is not None and not isinstance(lst, str):
+		return lst
+	if lst not in [None, "mean", "apparent"]:
+		raise ValueError(
+			"Unknown lst '{0}', use 'mean', 'apparent', or numbers.".format(lst)
+		)
+	lmst = sec / 3600. + np.asarray(lon) / 15.0
+	if lst == "apparent":
+		return lmst + _equation_of_time(year, doy, sec)
+	return lmst
+
+
+def local_solar_time(time, lon, apparent=False):
+	"""Local solar time for the model
+
+	Parameters
+	----------
+	time: datetime.datetime or array_like
+		The times (UT) in any of the formats supported by :func:`msise_flat()`.
+	lon: float or array_like
+		Longitude in degrees east, broadcast against `time`.
+	apparent: bool, optional, default False
+		Return the apparent local solar time, including the equation
+		of time (up to about 16 minutes), instead of the mean local
+		solar time ``sec / 3600 + lon / 15``.
+
+	Returns
+	-------
+	lst: float or numpy.ndarray
+		The local solar time in [h], not wrapped to [0, 24).
+	"""
+	year, doy, sec = _time_split_array(time)
+	return _local_solar_time(
+		year, doy, sec, lon, lst="apparent" if apparent else None,
+	)
+
+
+def _msise_model_time(time, lon, lst=None):
+	"""Year, day of year, seconds, and local solar time of `time`"""
+	year = time.year
+	doy = time.timetuple().tm_yday
+	sec = (time.hour * 3600.
+			+ time.minute * 60.
+			+ time.second
+			+ time.microsecond * 1e-6)
+	lst = _local_solar_time(year, doy, sec, lon, lst=lst)
+	return year, doy, sec, lst
 
 
 def msise_model(time, alt, lat, lon, f107a, f107, ap,
-		lst=None, ap_a=None, flags=None, method="gtd7"):
+		lst=None, ap_a=None, flags=None, method="gtd7", config=None):
 	"""Interface to `gtd7()` [1]_ and `gtd7d()` [2]_
 
 	Calls the C model function using a :class:`datetime.datetime`
@@ -115,8 +926,11 @@ def msise_model(time, alt, lat, lon, f107a, f107, ap,
 		The observed f107 value on the previous day.
 	ap: float
 		The ap value at date.
-	lst: float, optional
+	lst: float or str, optional
 		The local solar time, can be different from the calculated one.
+		Set to "apparent" to calculate the apparent local solar time,
+		including the equation of time, instead of the mean local solar
+		time (`None` or "mean"), see :func:`local_solar_time()`.
 	ap_a: list, optional
 		List of length 7 containing ap values to be used when flags[9] is set
 		to -1, otherwise no effect.
@@ -126,6 +940,9 @@ def msise_model(time, alt, lat, lon, f107a, f107, ap,
 		Set to "gtd7d" to use `gtd7d()` (which includes anomalous oxygen
 		in the total mass density) instead of the "standard" `gtd7()` function
 		without it.
+	config: MsisConfig, optional
+		Pre-converted `ap_a` and `flags` for repeated calls with the
+		same settings, cannot be combined with `ap_a` or `flags`.
 
 	Returns
 	-------
@@ -151,26 +968,21 @@ def msise_model(time, alt, lat, lon, f107a, f107, ap,
 	use ``<index>.to_pydatetime()``,
 	for :class:`astropy.time.Time` use ``<Time>.to_datetime()``.
 
-	The local solar time is calculated from time and longitude, except when
-	`lst` is set, then that value is used.
+	The (mean) local solar time is calculated from time and longitude,
+	except when `lst` is set, then that value is used.
 
 	The solar and geomagnetic indices have to be provided, so far the values
 	are not included in the module.
 	"""
-	year = time.year
-	doy = int(time.strftime("%j"))
-	sec = (time.hour * 3600.
-			+ time.minute * 60.
-			+ time.second
-			+ time.microsecond * 1e-6)
-	if lst is None:
-		lst = sec / 3600. + lon / 15.0
+	year, doy, sec, lst = _msise_model_time(time, lon, lst)
 
 	kwargs = {}
 	if ap_a is not None:
 		kwargs.update({"ap_a": ap_a})
 	if flags is not None:
 		kwargs.update({"flags": flags})
+	if config is not None:
+		kwargs.update({"config": config})
 
 	if method == "gtd7d":
 		return gtd7d(year, doy, sec, alt, lat, lon, lst, f107a, f107, ap, **kwargs)
@@ -184,26 +996,260 @@ def _msise_flat(*args, **kwargs):
 
 _msise_flatv = np.vectorize(_msise_flat,
 		signature='(),(),(),(),(),(),(),(),(),()->(n)',
-		excluded=["method"])
+		excluded=["method", "config"])
+
+
+def _time_split(time):
+	"""Year, day of year, and seconds of the day (UT)"""
+	tt = time.timetuple()
+	sec = (time.hour * 3600.
+			+ time.minute * 60.
+			+ time.second
+			+ time.microsecond * 1e-6)
+	return tt.tm_year, tt.tm_yday, sec
+
+
+_time_splitv = np.vectorize(_time_split, otypes=[np.float64] * 3)
+
+
+def _as_datetime64(time):
+	"""UTC `numpy.datetime64` from `astropy` and `pandas` times
+
+	Other inputs are returned as :class:`numpy.ndarray`.
+	"""
+	if hasattr(time, "scale") and hasattr(time, "utc"):
+		# astropy.time.Time
+		time = time.utc.datetime64
+	elif getattr(time, "tz", None) is not None:
+		# timezone-aware pandas datetimes
+		time = time.tz_convert("UTC").tz_localize(None)
+	return np.asarray(time)
+
+
+def _time_split_array(time):
+	"""Year, day of year, and seconds of the day (UT) for arrays
+
+	Uses vectorized `numpy.datetime64` arithmetic for `numpy.datetime64`
+	arrays, `pandas.DatetimeIndex`, `astropy.time.Time`, and numbers
+	(seconds since 1970-01-01 00:00 UTC). Other inputs, e.g. arrays of
+	`datetime.datetime`, are converted element-wise.
+	"""
+	time = _as_datetime64(time)
+	if time.dtype.kind == "M":
+		days = time.astype("datetime64[D]")
+		years = days.astype("datetime64[Y]")
+		sec = (time - days) / np.timedelta64(1, "s")
+	elif time.dtype.kind in "iuf":
+		days = np.floor(time / 86400.)
+		sec = time - days * 86400.
+		days = days.astype("datetime64[D]")
+		years = days.astype("datetime64[Y]")
+	else:
+		return _time_splitv(time)
+	year = years.astype(np.float64) + 1970.
+	doy = (days - years).astype(np.float64) + 1.
+	return year, doy, sec
+
+
+def _time_inputs(time, lon, lst=None):
+	"""Model time inputs from `datetime`s
+
+	Returns the year, day of year, seconds of the day, and
+	the local solar time calculated from `time` and `lon`
+	if `lst` is `None`, "mean", or "apparent".
+	"""
+	year, doy, sec = _time_split_array(time)
+	lst = _local_solar_time(year, doy, sec, lon, lst=lst)
+	return year, doy, sec, lst
+
+
+def _is_per_element(a):
+	# `ap_a` or `flags` given separately for each element
+	return isinstance(a, np.ndarray) and a.dtype == object
 
 
 @_doc_param(msise_model.__doc__.replace("Interface", "interface"))
-def msise_flat(*args, **kwargs):
+def msise_flat(time, alt, lat, lon, f107a, f107, ap,
+		lst=None, ap_a=None, flags=None, method="gtd7", config=None,
+		n_threads=None, outputs=None, out=None, dtype=None,
+		n_jobs=None, executor=None):
 	"""Flattened {0}
 	Attention
 	---------
 	This flattened version returns a single 11-element array instead of two
 	separate lists. Additionally, it can take :class:`numpy.ndarray` as input.
-	However, the `time` input needs to contain entries of :class:`datetime.datetime`,
-	e.g. using :meth:`pandas.DatetimeIndex.to_pydatetime()`
-	or :meth:`astropy.time.Time.to_datetime()`.
+	The `time` input can be a :class:`numpy.ndarray` of `datetime64`,
+	a :class:`pandas.DatetimeIndex`, an :class:`astropy.time.Time`,
+	or numbers (seconds since 1970-01-01 00:00 UTC), which are converted
+	using vectorized :mod:`numpy` operations. Timezone-aware `pandas`
+	datetimes are converted to UTC, `numpy.datetime64` values are taken
+	as UTC. Entries of :class:`datetime.datetime` are converted one by one.
+
+	`ap_a` can be an array of shape (..., 7) to use separate
+	Ap arrays for each point, see :func:`ap_a_3h()`.
+	The keyword `n_threads` sets the number of threads used for the
+	evaluation, `outputs` selects the output columns by name,
+	and `out` and `dtype` set the output array or its type,
+	see :func:`gtd7_flat()`.
+
+	With `n_jobs` or `executor`, the points are split into shards
+	evaluated in separate processes, either `n_jobs` processes
+	(values smaller than 1 use all available CPUs) of a
+	:class:`concurrent.futures.ProcessPoolExecutor`, or the workers
+	of the given :class:`concurrent.futures.Executor`.
+	The processes write their results to shared memory instead of
+	returning them. Threads (`n_threads`) are usually more efficient,
+	since the model releases the GIL. Requires Python 3.8 or later.
+	"""
+	if _is_per_element(ap_a) and not _is_per_element(flags):
+		# separate Ap arrays as object array, convert to (..., 7)
+		ap_a = np.array(ap_a.tolist(), dtype=np.float64)
+	if _is_per_element(ap_a) or _is_per_element(flags):
+		# different `ap_a` or `flags` for each element,
+		# evaluate point by point
+		cols = _output_columns(outputs)
+		ret = _msise_flatv(
+			time, alt, lat, lon, f107a, f107, ap,
+			lst=lst, ap_a=ap_a, flags=flags, method=method, config=config,
+		)
+		if cols is not None:
+			ret = ret[..., cols]
+		if out is None and dtype is None:
+			return ret
+		out = _output_array(out, ret.shape, dtype=dtype)
+		out[...] = ret
+		return out
+
+	with _stage("msise_flat.time"):
+		year, doy, sec, lst = _time_inputs(time, lon, lst=lst)
+
+	flat_func = gtd7d_flat if method == "gtd7d" else gtd7_flat
+	if n_jobs is None and executor is None:
+		return flat_func(
+			year, doy, sec, alt, lat, lon, lst, f107a, f107, ap,
+			ap_a=ap_a, flags=flags, config=config, n_threads=n_threads,
+			outputs=outputs, out=out, dtype=dtype,
+		)
+	return _msise_flat_processes(
+		flat_func, year, doy, sec, alt, lat, lon, lst, f107a, f107, ap,
+		ap_a=ap_a, flags=flags, config=config, n_threads=n_threads,
+		outputs=outputs, out=out, dtype=dtype,
+		n_jobs=n_jobs, executor=executor,
+	)
+
+
+def _msise_flat_processes(flat_func, year, doy, sec, alt, lat, lon, lst,
+		f107a, f107, ap, ap_a=None, flags=None, config=None, n_threads=None,
+		outputs=None, out=None, dtype=None, n_jobs=None, executor=None):
+	"""Evaluates `flat_func` for shards of the points in worker processes
+
+	The inputs are broadcast and flattened, and each process evaluates
+	a contiguous part of the points, see :func:`_run_processes()`.
 	"""
-	# Set keyword arguments to None if not given to make `np.vectorize` happy
-	lst = kwargs.pop("lst", None)
-	ap_a = kwargs.pop("ap_a", None)
-	flags = kwargs.pop("flags", None)
+	cols = _output_columns(outputs)
+	nout = 11 if cols is None else len(cols)
+	ap_a, ap_arr = _split_ap_a(ap_a)
+	ins = [
+		np.asarray(a, dtype=np.float64)
+		for a in (year, doy, sec, alt, lat, lon, lst, f107a, f107, ap)
+	]
+	shape = np.broadcast(
+		*(ins if ap_arr is None else ins + [ap_arr[..., 0]])
+	).shape
+	ins = [
+		a.reshape(-1) if a.size == 1 else np.broadcast_to(a, shape).reshape(-1)
+		for a in ins
+	]
+	if ap_arr is not None:
+		ap_arr = _broadcast_ap_a(ap_arr, shape)
+	out = _output_array(out, shape + (nout,), dtype=dtype)
+	n = int(np.prod(shape))
 
-	return _msise_flatv(*args, lst=lst, ap_a=ap_a, flags=flags, **kwargs)
+	kwargs = dict(_config_kwargs(ap_a=ap_a, flags=flags, config=config))
+	kwargs.update({"n_threads": n_threads, "outputs": cols, "dtype": out.dtype})
+	shards = []
+	for i0, i1 in _shard_bounds(n, _check_num_jobs(n_jobs)):
+		kw = dict(kwargs)
+		if ap_arr is not None:
+			kw["ap_a"] = ap_arr if ap_arr.shape[0] == 1 else ap_arr[i0:i1]
+		shards.append((
+			slice(i0, i1),
+			[a if a.size == 1 else a[i0:i1] for a in ins],
+			kw,
+		))
+	with _stage("msise_flat.processes") as st:
+		_run_processes(
+			flat_func, (n, nout), out.dtype, shards, n_jobs,
+			executor=executor, out=out,
+		)
+		st.count(n, out.nbytes)
+	return out
+
+
+def _bins_3h(time):
+	"""Indices of the 3-hour intervals since 1970-01-01 00:00 UTC"""
+	time = _as_datetime64(time)
+	if time.dtype.kind in "iuf":
+		return np.floor(time / 10800.).astype(np.int64)
+	if time.dtype.kind != "M":
+		time = time.astype("datetime64[us]")
+	return time.astype("datetime64[h]").astype(np.int64) // 3
+
+
+def ap_a_3h(time, ap_time, ap):
+	"""Ap arrays for `ap_a` from 3-hourly Ap indices
+
+	Assembles the 7-element Ap arrays used with `flags[9] = -1`
+	for all `time`s at once from a series of 3-hourly Ap values.
+
+	Parameters
+	----------
+	time: array_like (...)
+		The times for which to assemble the arrays, with the same types
+		supported as for :func:`msise_flat()`.
+	ap_time: array_like (N,)
+		Times within the 3-hour intervals (e.g. the start or centre)
+		of the Ap values, for example the index of
+		:func:`spaceweather.ap_kp_3h()`. Intervals may be missing.
+	ap: array_like (N,)
+		The 3-hourly Ap indices.
+
+	Returns
+	-------
+	ap_a: numpy.ndarray (..., 7)
+		The Ap arrays for each time, the elements are the
+		daily Ap (mean of the 3-hourly values of the day), the Ap of the
+		current interval and of 3, 6, and 9 hours before, and the averages
+		of the eight 3-hourly values from 12 to 33 and from 36 to 57 hours
+		before the current interval.
+		Raises a `ValueError` when required values are missing.
+	"""
+	bins = _bins_3h(time)
+	ap_bins = _bins_3h(ap_time).reshape(-1)
+	ap = np.asarray(ap, dtype=np.float64).reshape(-1)
+	if ap.size != ap_bins.size:
+		raise ValueError("ap_time and ap must have the same length.")
+	order = np.argsort(ap_bins, kind="mergesort")
+	ap_bins = ap_bins[order]
+	ap = ap[order]
+	# the eight intervals of the day, the current and 19 previous ones
+	offsets = np.arange(8)
+	need = np.concatenate([
+		(bins // 8 * 8)[..., None] + offsets,
+		bins[..., None] - np.arange(20),
+	], axis=-1)
+	idx = np.searchsorted(ap_bins, need)
+	found = idx < ap_bins.size
+	found[found] = ap_bins[idx[found]] == need[found]
+	if not np.all(found):
+		raise ValueError("3-hourly Ap values missing for the requested times.")
+	aps = ap[idx]
+	return np.stack([
+		aps[..., :8].mean(axis=-1),
+		aps[..., 8], aps[..., 9], aps[..., 10], aps[..., 11],
+		aps[..., 12:20].mean(axis=-1),
+		aps[..., 20:28].mean(axis=-1),
+	], axis=-1)
 
 
 def scale_height(alt, lat, molw, temp):
@@ -22,6 +22,6 @@ except ImportError as e:
 	)
 	raise ImportError(msg)
 
-__all__ = ["msise_4d"]
+__all__ = ["msise_4d", "msise_4d_to_store", "msise_track"]
 
 warn("The xarray 4d interface is experimental.", UserWarning)
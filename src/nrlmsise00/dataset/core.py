@@ -10,16 +10,22 @@
 
 """
 from collections import OrderedDict
+from functools import partial
+import os
 
 import numpy as np
 import pandas as pd
 import xarray as xr
 
-from spaceweather import sw_daily
+from spaceweather import SW_PATH_5Y, SW_PATH_ALL, sw_daily
 
-from ..core import msise_flat
+from ..core import _check_num_jobs, _run_processes, _shard_bounds
+from ..core import _local_solar_time, _time_inputs, _time_split_array
+from ..core import ap_a_3h, ghp7_flat, gtd7_profile, gtd7d_profile
+from ..core import gtd7_flat, gtd7d_flat
+from ..instrument import _stage
 
-__all__ = ["msise_4d"]
+__all__ = ["msise_4d", "msise_4d_to_store", "msise_track"]
 
 MSIS_OUTPUT = [
 	# name, long name, units
@@ -53,8 +59,93 @@ SW_INDICES = [
 	),
 ]
 
+# columns of `spaceweather.sw_daily()` used for the indices above
+SW_COLUMNS = ["Apavg", "f107_obs", "f107_81ctr_obs"]
+# 3-hourly Ap columns, starting at 00, 03, ..., 21 UT
+SW_AP3H_COLUMNS = ["Ap{0}".format(h) for h in range(0, 24, 3)]
+
+# daily space weather data as numpy arrays, see `_sw_table()`
+_sw_cache = {}
+
 
 # helper functions
+def _sw_mtimes():
+	try:
+		return tuple(os.path.getmtime(f) for f in (SW_PATH_ALL, SW_PATH_5Y))
+	except OSError:
+		return None
+
+
+def _sw_table():
+	"""Daily space weather indices as :mod:`numpy` arrays
+
+	Reads the data using :func:`spaceweather.sw_daily()` once and
+	caches the days (`numpy.datetime64[D]`), the `SW_COLUMNS`, and the
+	3-hourly Ap values with shape (days, 8) as "Ap3h".
+	The data are read again only when the data files have changed,
+	the new table replaces the cached one as a whole, so that concurrent
+	readers always see a complete table.
+	"""
+	global _sw_cache
+	sw_cache = _sw_cache
+	mtimes = _sw_mtimes()
+	if mtimes is None or sw_cache.get("mtimes") != mtimes:
+		sw = sw_daily()
+		if sw.index.tz is not None:
+			sw = sw.tz_convert("UTC").tz_localize(None)
+		sw_cache = dict(
+			{c: sw[c].to_numpy() for c in SW_COLUMNS},
+			days=sw.index.to_numpy().astype("datetime64[D]"),
+			Ap3h=sw[SW_AP3H_COLUMNS].to_numpy(),
+			# `sw_daily()` may have downloaded the files
+			mtimes=_sw_mtimes(),
+		)
+		_sw_cache = sw_cache
+	return sw_cache
+
+
+def _sw_index(days):
+	"""Indices of `days` (`numpy.datetime64[D]`) in the space weather table
+
+	Raises a `KeyError` for days not contained in the data.
+	"""
+	sw_days = _sw_table()["days"]
+	idx = np.searchsorted(sw_days, days)
+	found = idx < sw_days.size
+	found[found] = sw_days[idx[found]] == days[found]
+	if not np.all(found):
+		raise KeyError(
+			"No space weather data for {0}.".format(days[~found])
+		)
+	return idx
+
+
+def _sw_ap_a(dts):
+	"""Ap arrays (for `flags[9] = -1`) at `dts` from the space weather data"""
+	sw = _sw_table()
+	ap_time = (
+		sw["days"][:, None]
+		+ np.arange(0, 24, 3).astype("timedelta64[h]")
+	)
+	return ap_a_3h(dts, ap_time.reshape(-1), sw["Ap3h"].reshape(-1))
+
+
+def _check_ap_a(ap_a, dts):
+	"""Check that separate Ap arrays have the correct shape
+
+	Returns lists unchanged and arrays with shape (`dts`, 7).
+	"""
+	if ap_a is None or np.ndim(ap_a) < 2:
+		return ap_a
+	ap_a = np.asarray(ap_a, dtype=np.float64)
+	if ap_a.ndim > 2 or ap_a.shape[-1] != 7 or ap_a.shape[0] not in [1, dts.size]:
+		raise ValueError(
+			"ap_a arrays must have shape (7,), (1, 7), or (time, 7), "
+			"got {0}.".format(ap_a.shape)
+		)
+	return np.broadcast_to(ap_a, dts.shape + (7,))
+
+
 def _check_nd(a, ndim=1):
 	a = np.atleast_1d(a)
 	if a.ndim > ndim:
@@ -65,17 +156,14 @@ def _check_nd(a, ndim=1):
 	return a
 
 
-def _check_gm(gm, dts, df=None):
+def _check_gm(gm, dts, sw=None):
 	"""Check that GM indices have the correct shape
 
-	Returns the GM index broadcasted to shape (`dts`,).
+	Returns the GM index broadcasted to shape (`dts`,),
+	or the space weather values `sw` at `dts` if `gm` is `None`.
 	"""
-	def _dfloc(t, df=None):
-		return df.loc[t.floor("D")]
-
-	if gm is None and df is not None:
-		# select arbitrary shapes from pandas dataframes
-		return np.vectorize(_dfloc, excluded=["df"])(dts, df=df)
+	if gm is None and sw is not None:
+		return sw
 	gm = np.atleast_1d(gm)
 	if gm.ndim > 1:
 		raise ValueError(
@@ -119,12 +207,324 @@ def _check_lst(lst, time, lon):
 	return lsts
 
 
+def _gm_inputs(dts, ap, f107, f107a):
+	"""Ap, f10.7, and f10.7a indices at the UTC `datetime64` times `dts`
+
+	Missing (`None`) indices are taken from the space weather data.
+	"""
+	sw_ap = sw_f107 = sw_f107a = None
+	if ap is None or f107 is None or f107a is None:
+		sw = _sw_table()
+		days = dts.astype("datetime64[D]")
+		idx = _sw_index(days)
+		# previous day for f10.7
+		idxp = _sw_index(days - np.timedelta64(1, "D"))
+		sw_ap = sw["Apavg"][idx]
+		sw_f107 = sw["f107_obs"][idxp]
+		sw_f107a = sw["f107_81ctr_obs"][idx]
+
+	ap = _check_gm(ap, dts, sw=sw_ap)
+	f107 = _check_gm(f107, dts, sw=sw_f107)
+	f107a = _check_gm(f107a, dts, sw=sw_f107a)
+	return ap, f107, f107a
+
+
+def _ap_a_inputs(dts, ap_a, flags, config):
+	"""Ap arrays at `dts`, from the space weather data if needed"""
+	_flags = config.flags if config is not None else flags
+	if (
+		ap_a is None and _flags is not None and _flags[9] == -1
+		and (config is None or config.ap_a is None)
+	):
+		ap_a = _sw_ap_a(dts)
+	return _check_ap_a(ap_a, dts)
+
+
+def _check_outputs(outputs):
+	"""Indices into `MSIS_OUTPUT` of the variable names `outputs`"""
+	names = [m[0] for m in MSIS_OUTPUT]
+	if outputs is None:
+		return list(range(len(names)))
+	if isinstance(outputs, str):
+		outputs = [outputs]
+	unknown = [o for o in outputs if o not in names]
+	if unknown or not outputs:
+		raise ValueError(
+			"Unknown outputs {0}, must be a list of {1}.".format(unknown, names)
+		)
+	return [names.index(o) for o in outputs]
+
+
+def _msise_4d_inputs(
+	time, alt, lat, lon, f107a, f107, ap, lst,
+	ap_a, flags, config, method, pressure, outputs=None, dtype=None,
+):
+	"""Checks and prepares the inputs of :func:`msise_4d()`
+
+	Returns the keyword arguments for :func:`_msise_4d_data()`,
+	the times as :class:`pandas.DatetimeIndex`, and the
+	local solar times with shape (time, lon).
+	"""
+	if pressure and method != "gtd7":
+		raise ValueError(
+			"Pressure levels are only supported for method 'gtd7'."
+		)
+	outputs = _check_outputs(outputs)
+	time = _check_nd(time)
+	alt = _check_nd(alt)
+	lat = _check_nd(lat)
+	lon = _check_nd(lon)
+
+	with _stage("msise_4d.time"):
+		# convert arbitrary shapes
+		dts = pd.to_datetime(time, utc=True)
+		# UTC `datetime64` for the vectorized conversions
+		dtsv = dts.tz_localize(None).to_numpy()
+
+	with _stage("msise_4d.indices"):
+		ap, f107, f107a = _gm_inputs(dtsv, ap, f107, f107a)
+		ap_a = _ap_a_inputs(dtsv, ap_a, flags, config)
+
+	with _stage("msise_4d.lst"):
+		if lst is None or isinstance(lst, str):
+			# calculated on the (time, lon) grid for the returned dataset
+			year, doy, sec = _time_split_array(dtsv)
+			lsts = _local_solar_time(
+				year[:, None], doy[:, None], sec[:, None], lon[None, :], lst=lst,
+			)
+		else:
+			lsts = _check_lst(lst, time, lon)
+
+	inputs = dict(
+		ts=dtsv, alt=alt, lat=lat, lon=lon,
+		ap=ap, f107=f107, f107a=f107a,
+		lst=None if lst is None else lsts,
+		ap_a=ap_a, flags=flags, config=config,
+		method=method, pressure=pressure, outputs=outputs,
+		dtype=np.dtype(np.float64 if dtype is None else dtype),
+	)
+	return inputs, dts, lsts
+
+
+def _lst_attrs(lst):
+	"""Attributes of the local solar time variable for the `lst` argument"""
+	if isinstance(lst, str) and lst == "apparent":
+		return {"long_name": "Apparent Local Solar Time", "units": "h"}
+	return {"long_name": "Mean Local Solar Time", "units": "h"}
+
+
+def _msise_4d_dataset(
+	msis_data, dts, lsts, it=slice(None),
+	ts=None, alt=None, lat=None, lon=None,
+	ap=None, f107=None, f107a=None, pressure=False, outputs=None,
+	lst_attrs=None,
+	**kwargs
+):
+	"""Assembles the :class:`xarray.Dataset` for the times `it`
+
+	`msis_data` contains the model output for these times with the
+	outputs along the first axis, the variables are views of it,
+	the other arguments are those from :func:`_msise_4d_inputs()`,
+	and `lst_attrs` from :func:`_lst_attrs()`.
+	"""
+	if outputs is None:
+		outputs = list(range(len(MSIS_OUTPUT)))
+	vert = "press" if pressure else "alt"
+	if pressure:
+		vert_coord = (vert, alt, {"long_name": "pressure", "units": "mbar"})
+	else:
+		vert_coord = (vert, alt, {"long_name": "altitude", "units": "km"})
+	ret = xr.Dataset(
+		OrderedDict([(
+			MSIS_OUTPUT[o][0], (
+				["time", vert, "lat", "lon"],
+				msis_data[i],
+				{"long_name": MSIS_OUTPUT[o][1], "units": MSIS_OUTPUT[o][2]}
+			))
+			for i, o in enumerate(outputs)
+		]),
+		coords=OrderedDict([
+			("time", dts.tz_localize(None)[it]),
+			(vert, vert_coord),
+			("lat", ("lat", lat, {"long_name": "latitude", "units": "degrees_north"})),
+			("lon", ("lon", lon, {"long_name": "longitude", "units": "degrees_east"})),
+		]),
+	)
+	if pressure:
+		ret["alt"] = (
+			["time", vert, "lat", "lon"], msis_data[-1],
+			{"long_name": "altitude", "units": "km"},
+		)
+	ret["lst"] = (["time", "lon"], lsts[it], lst_attrs or _lst_attrs(None))
+	ret["Ap"] = (["time"], ap[it])
+	ret["f107"] = (["time"], f107[it])
+	ret["f107a"] = (["time"], f107a[it])
+	for _sw in SW_INDICES:
+		ret[_sw[0]].attrs.update({"long_name": _sw[1], "units": _sw[2]})
+	return ret
+
+
+def _msise_4d_data(
+	it, ij, ik, il,
+	ts, alt, lat, lon, ap, f107, f107a, lst,
+	ap_a, flags, config, method, pressure, outputs=None, dtype=None,
+	out=None,
+):
+	"""MSIS model output for a (time, alt, lat, lon) block
+
+	The indices (or slices) `it`, `ij`, `ik`, `il` select the block from
+	the 1-D inputs, `lst` has shape (time, lon) or is `None`.
+	Returns the model output with shape (11, I, J, K, L),
+	or (12, I, J, K, L) including the altitudes for pressure levels.
+	With the column indices `outputs`, only these are returned
+	(followed by the altitudes for pressure levels), as `dtype`.
+	The outputs are written to `out` if given, otherwise to a new
+	array, such that each output is contiguous.
+	"""
+	it, ij, ik, il = [
+		np.ravel(i) if isinstance(i, np.ndarray) else i
+		for i in (it, ij, ik, il)
+	]
+	# expand dimensions to 4d
+	ts = ts[it][:, None, None, None]
+	alts = alt[ij][None, :, None, None]
+	lats = lat[ik][None, None, :, None]
+	lons = lon[il][None, None, None, :]
+
+	aps = ap[it][:, None, None, None]
+	f107s = f107[it][:, None, None, None]
+	f107as = f107a[it][:, None, None, None]
+
+	if lst is not None:
+		lst = lst[it][:, il][:, None, None, :]
+	if np.ndim(ap_a) == 2:
+		ap_a = ap_a[it]
+
+	if out is None:
+		nout = (len(MSIS_OUTPUT) if outputs is None else len(outputs)) + int(pressure)
+		out = np.empty(
+			(nout, ts.shape[0], alts.shape[1], lats.shape[2], lons.shape[3]),
+			dtype=dtype,
+		)
+	# (I, J, K, L, nout) view for the model functions
+	out_last = np.moveaxis(out, 0, -1)
+
+	if pressure:
+		year, doy, sec, lst = _time_inputs(ts, lons, lst=lst)
+		if np.ndim(ap_a) == 2:
+			ap_a = ap_a[:, None, None, None, :]
+		ghp7_flat(
+			year, doy, sec, alts, lats, lons, lst,
+			f107as, f107s, aps,
+			ap_a=ap_a, flags=flags, config=config,
+			outputs=None if outputs is None else list(outputs) + [11],
+			out=out_last,
+		)
+		return out
+	# altitude profiles for each (time, lat, lon)
+	year, doy, sec, lst = _time_inputs(
+		ts[:, 0], lons[:, 0],
+		lst=None if lst is None else lst[:, 0],
+	)
+	if np.ndim(ap_a) == 2:
+		ap_a = ap_a[:, None, None, :]
+	profile_func = gtd7d_profile if method == "gtd7d" else gtd7_profile
+	# the profiles are written as (time, lat, lon, alt, nout)
+	profile_func(
+		year, doy, sec, lats[:, 0], lons[:, 0], lst,
+		f107as[:, 0], f107s[:, 0], aps[:, 0], alt[ij],
+		ap_a=ap_a, flags=flags, config=config, outputs=outputs,
+		out=np.moveaxis(out_last, 1, 3),
+	)
+	return out
+
+
+def _msise_4d_dask(chunks, dims, nout, **kwargs):
+	"""Lazy (`nout`, time, alt, lat, lon) model output as `dask` array
+
+	`chunks` is either a dictionary with the chunk sizes for the
+	dimensions `dims`, or anything else accepted by `dask.array`
+	for the four dimensions. The blocks are evaluated only when computed.
+	"""
+	try:
+		import dask.array as da
+	except ImportError:
+		raise ImportError(
+			"`chunks` requires `dask`, install it with:\n"
+			"  pip install 'dask[array]'"
+		)
+	sizes = tuple(kwargs[k].size for k in ("ts", "alt", "lat", "lon"))
+	if isinstance(chunks, dict):
+		chunks = tuple(chunks.get(d, -1) for d in dims)
+	# `dtype` is also a keyword of `map_blocks()`
+	dtype = kwargs.pop("dtype")
+	chunks = da.core.normalize_chunks(chunks, shape=sizes, dtype=dtype)
+	# block indices along each dimension, broadcast to 4-D
+	idxs = [
+		da.arange(n, chunks=(c,))[
+			tuple(slice(None) if j == i else None for j in range(4))
+		]
+		for i, (n, c) in enumerate(zip(sizes, chunks))
+	]
+	return da.map_blocks(
+		partial(_msise_4d_data, dtype=dtype), *idxs,
+		new_axis=0,
+		chunks=((nout,),) + chunks,
+		dtype=dtype,
+		meta=np.empty((0,) * 5, dtype=dtype),
+		**kwargs
+	)
+
+
+def _msise_4d_processes(n_jobs, executor, nout, **kwargs):
+	"""(`nout`, time, alt, lat, lon) model output from worker processes
+
+	The grid is split along the longest of the "time", "lat", and
+	"lon" dimensions, keeping the altitude profiles in one piece,
+	see :func:`nrlmsise00.core._run_processes()`.
+	"""
+	sizes = tuple(kwargs[k].size for k in ("ts", "alt", "lat", "lon"))
+	axis = max((0, 2, 3), key=lambda a: sizes[a])
+	shards = []
+	for i0, i1 in _shard_bounds(sizes[axis], _check_num_jobs(n_jobs)):
+		idx = [slice(None)] * 4
+		idx[axis] = slice(i0, i1)
+		shards.append(((slice(None),) + tuple(idx), idx, kwargs))
+	return _run_processes(
+		_msise_4d_data, (nout,) + sizes, kwargs["dtype"], shards,
+		n_jobs, executor=executor,
+	)
+
+
+def _netcdf_append(path, ds):
+	"""Append `ds` along the unlimited "time" dimension of a NetCDF file"""
+	import netCDF4
+
+	with netCDF4.Dataset(path, "a") as nc:
+		n0 = nc.dimensions["time"].size
+		n1 = n0 + ds.sizes["time"]
+		nc["time"][n0:n1] = (
+			(ds.time.values - np.datetime64("1970-01-01"))
+			// np.timedelta64(1, "us")
+		)
+		for name, var in ds.data_vars.items():
+			if var.dims[0] == "time":
+				nc[name][n0:n1] = var.values
+
+
 def msise_4d(
 	time, alt, lat, lon,
 	f107a=None, f107=None, ap=None,
 	lst=None,
 	ap_a=None, flags=None,
 	method="gtd7",
+	pressure=False,
+	config=None,
+	chunks=None,
+	outputs=None,
+	dtype=None,
+	n_jobs=None,
+	executor=None,
 ):
 	u"""4-D Xarray Interface to :func:`msise_flat()`.
 
@@ -142,6 +542,9 @@ def msise_4d(
 	the shape of either `time` or `lon`, or a 2-D array matching the shape
 	of (`time`, `lon`).
 
+	With `pressure` set to `True`, the model is evaluated on pressure levels
+	using :func:`ghp7_flat()`, and `alt` contains these levels in [mbar].
+
 	Parameters
 	----------
 	time: `datetime.datetime`, `pandas` datetime, str, or 1-d array_like (I,)
@@ -149,7 +552,8 @@ def msise_4d(
 		string supported by `pandas.to_datetime()`, or an array of those.
 		Will be converted with `pandas.to_datetime()`.
 	alt: float or 1-d array_like (J,)
-		Altitudes in [km].
+		Altitudes in [km], or pressure levels in [mbar] (hPa)
+		if `pressure` is `True`.
 	lat: float or 1-d array_like (K,)
 		Latitudes in [°N].
 	lon: float or 1-d array_like (L,)
@@ -164,28 +568,70 @@ def msise_4d(
 	ap: float or 1-d array_like (I,), optional
 		The daily geomagnetic Ap index at the day(s) of `time`.
 		Set to `None` (default) to use the `spaceweather` package.
-	lst: float, 1-d (I,) or (L,) or 2-d array_like (I,L), optional
+	lst: float, 1-d (I,) or (L,) or 2-d array_like (I,L), or str, optional
 		The local solar time at `time` and `lon`, to override the
-		calculated values.
-		Default: `None` (calculate from `time` and `lon`)
-	ap_a: list of int (7,), optional
-		List of Ap indices, passed to `msise_flat()`,
-		broadcasting is currently not supported.
+		calculated values, or "apparent" to calculate the apparent
+		local solar time including the equation of time.
+		Default: `None` (calculate the mean local solar time
+		from `time` and `lon`)
+	ap_a: list of int (7,) or array_like (I, 7), optional
+		List of Ap indices, passed to `msise_flat()`, or separate
+		Ap arrays for each time.
+		If `flags[9]` is -1 and `ap_a` is not given, the arrays are
+		assembled from the 3-hourly Ap indices of the `spaceweather`
+		package, see :func:`ap_a_3h()`.
 	flags: list of int (23,), optional
 		List of flags, passed to `msise_flat()`,
 		broadcasting is currently not supported.
 	method: str, optional, default "gtd7"
 		Select MSISE-00 method, changes the output of "rho",
 		the atmospheric mass density.
+	pressure: bool, optional, default False
+		Evaluate the model on the pressure levels given in `alt`
+		instead of on altitudes, only supported for `method` "gtd7".
+	config: :class:`MsisConfig`, optional
+		Pre-converted `ap_a` and `flags`, cannot be combined with those.
+	chunks: int, tuple, or dict, optional
+		Return the model output as `dask` arrays with these chunks,
+		given either for ("time", "alt", "lat", "lon") as accepted by
+		:func:`dask.array.from_array()`, or as a dictionary with the
+		dimension names as keys (missing dimensions are not chunked).
+		The chunks are evaluated only when computed or written to disk,
+		using the `dask` scheduler (threads by default).
+		Leaving "alt" unchunked keeps the profiles in one piece,
+		see :func:`gtd7_profile()`. Requires `dask`.
+		Default: `None` (evaluate immediately using :mod:`numpy` arrays)
+	outputs: list of str, optional
+		Names of the model outputs to include, e.g. ``["rho", "Talt"]``,
+		the densities that are not needed for these are not calculated.
+		Default: `None` (all outputs listed below)
+	dtype: numpy.dtype, optional
+		Set to :class:`numpy.float32` to return the model output in
+		single precision, written directly by the model functions.
+		Default: `None` (float64)
+	n_jobs: int, optional
+		Split the grid along the longest of the "time", "lat", and "lon"
+		dimensions and evaluate the parts in `n_jobs` processes,
+		values smaller than 1 use all available CPUs.
+		The results are collected in shared memory, see
+		:func:`msise_flat()`. Cannot be combined with `chunks`.
+		Default: `None` (evaluate in this process)
+	executor: :class:`concurrent.futures.Executor`, optional
+		Submit the parts to this executor instead of a new
+		:class:`concurrent.futures.ProcessPoolExecutor`,
+		split into `n_jobs` parts (default: the number of CPUs).
 
 	Returns
 	-------
 	msise_4d: :class:`xarray.Dataset`
 		The MSIS atmosphere with dimensions ("time", "alt", "lat", "lon")
 		and shape (I, J, K, L) containing the data arrays:
-		"He", "O", "N2", "O2", "Ar", "rho", "H", "N", "AnomO", "Texo", "Talt",
+		"He", "O", "N2", "O2", "Ar", "rho", "H", "N", "AnomO", "Texo", "Talt"
+		(or those selected by `outputs`),
 		as well as the local solar times "lst" (I,L), and the
 		values used for "Ap" (I,), "f107" (I,), "f107a" (I,).
+		For pressure levels, the dimensions are ("time", "press", "lat", "lon")
+		and the altitudes of the levels are included as "alt" (I, J, K, L).
 
 	Example
 	-------
@@ -230,70 +676,231 @@ def msise_4d(
 	msise_flat
 	"""
 
-	time = _check_nd(time)
-	alt = _check_nd(alt)
-	lat = _check_nd(lat)
-	lon = _check_nd(lon)
+	inputs, dts, lsts = _msise_4d_inputs(
+		time, alt, lat, lon, f107a, f107, ap, lst,
+		ap_a, flags, config, method, pressure, outputs=outputs, dtype=dtype,
+	)
+	nout = len(inputs["outputs"]) + int(pressure)
+	with _stage("msise_4d.model") as st:
+		if n_jobs is not None or executor is not None:
+			if chunks is not None:
+				raise ValueError("chunks cannot be combined with n_jobs or executor.")
+			msis_data = _msise_4d_processes(n_jobs, executor, nout, **inputs)
+		elif chunks is None:
+			msis_data = _msise_4d_data(
+				slice(None), slice(None), slice(None), slice(None),
+				**inputs
+			)
+		else:
+			msis_data = _msise_4d_dask(
+				chunks, ["time", "press" if pressure else "alt", "lat", "lon"],
+				nout, **inputs
+			)
+		if chunks is None:
+			# only known for evaluated data
+			st.count(msis_data.size // nout, msis_data.nbytes)
+	with _stage("msise_4d.dataset"):
+		return _msise_4d_dataset(
+			msis_data, dts, lsts, lst_attrs=_lst_attrs(lst), **inputs
+		)
 
-	sw = sw_daily()
-	if sw.index.tz is None:
-		sw = sw.tz_localize("utc")
-	# convert arbitrary shapes
-	dts = pd.to_datetime(time, utc=True)
-	# convert to numpy array for further processing
-	dtsv = dts.to_numpy()
-	# previous day for f10.7
-	dtps = dtsv - pd.to_timedelta("1d")
 
-	ap = _check_gm(ap, dtsv, df=sw[["Apavg"]])
-	f107 = _check_gm(f107, dtps, df=sw[["f107_obs"]])
-	f107a = _check_gm(f107a, dtsv, df=sw[["f107_81ctr_obs"]])
+def msise_4d_to_store(
+	path,
+	time, alt, lat, lon,
+	f107a=None, f107=None, ap=None,
+	lst=None,
+	ap_a=None, flags=None,
+	method="gtd7",
+	pressure=False,
+	config=None,
+	time_block=24,
+	engine=None,
+	outputs=None,
+	dtype=None,
+):
+	u"""Evaluate :func:`msise_4d()` block-wise and write to Zarr or NetCDF
+
+	Evaluates the model for `time_block` times at once and appends
+	each block to the store along the "time" dimension, such that only
+	one block is kept in memory. The variables and attributes are the
+	same as returned by :func:`msise_4d()`.
 
-	# expand dimensions to 4d
-	ts = dtsv[:, None, None, None]
-	alts = alt[None, :, None, None]
-	lats = lat[None, None, :, None]
-	lons = lon[None, None, None, :]
+	Parameters
+	----------
+	path: str or path-like
+		The Zarr store or NetCDF file to write to, will be overwritten.
+	time, alt, lat, lon, f107a, f107, ap, lst, ap_a, flags, method, pressure, config, outputs, dtype:
+		Same as for :func:`msise_4d()`.
+	time_block: int, optional, default 24
+		The number of times evaluated and written at once.
+	engine: str, optional
+		"zarr" (requires `zarr`) or "netcdf4" (requires `netCDF4`),
+		default: "zarr" for paths ending in ".zarr", "netcdf4" otherwise.
 
-	aps = ap[:, None, None, None]
-	f107s = f107[:, None, None, None]
-	f107as = f107a[:, None, None, None]
+	See also
+	--------
+	msise_4d
+	"""
+	if engine is None:
+		engine = "zarr" if str(path).rstrip("/\\").endswith(".zarr") else "netcdf4"
+	if engine not in ["zarr", "netcdf4"]:
+		raise ValueError(
+			"Unsupported engine '{0}', use 'zarr' or 'netcdf4'.".format(engine)
+		)
+	if time_block < 1:
+		raise ValueError("time_block must be positive.")
 
-	if lst is not None:
-		lsts = _check_lst(lst, time, lon)
-		# used for MSIS below
-		lst = lsts[:, None, None, :]
-	else:
-		# calculated for the returned dataset
-		lsts = np.array([
-			t.hour + t.minute / 60. + t.second / 3600. + lon / 15.
-			for t in dts
-		])
-
-	msis_data = msise_flat(
-		ts, alts, lats, lons,
-		f107as, f107s, aps,
-		lst=lst, ap_a=ap_a, flags=flags, method=method,
+	inputs, dts, lsts = _msise_4d_inputs(
+		time, alt, lat, lon, f107a, f107, ap, lst,
+		ap_a, flags, config, method, pressure, outputs=outputs, dtype=dtype,
+	)
+	for i0 in range(0, len(dts), time_block):
+		it = slice(i0, i0 + time_block)
+		msis_data = _msise_4d_data(
+			it, slice(None), slice(None), slice(None), **inputs
+		)
+		ds = _msise_4d_dataset(
+			msis_data, dts, lsts, it=it, lst_attrs=_lst_attrs(lst), **inputs
+		)
+		if engine == "zarr":
+			if i0 == 0:
+				ds.to_zarr(path, mode="w")
+			else:
+				ds.to_zarr(path, append_dim="time")
+		elif i0 == 0:
+			ds.to_netcdf(
+				path, mode="w", engine="netcdf4",
+				unlimited_dims=["time"],
+				# exact times when appending
+				encoding={"time": {
+					"units": "microseconds since 1970-01-01", "dtype": "int64",
+				}},
+			)
+		else:
+			_netcdf_append(path, ds)
+
+
+def msise_track(
+	time, alt, lat, lon,
+	f107a=None, f107=None, ap=None,
+	lst=None,
+	ap_a=None, flags=None,
+	method="gtd7",
+	config=None,
+	outputs=None,
+	dtype=None,
+	n_threads=None,
+):
+	u"""MSIS model along a track, e.g. a satellite orbit
+
+	Evaluates the model at the points (`time`, `alt`, `lat`, `lon`),
+	each point with its own time and location, instead of on the
+	(time, alt, lat, lon) grid of :func:`msise_4d()`.
+	The indices are looked up for all points at once and the model
+	is evaluated in a single call of :func:`gtd7_flat()`.
+
+	Parameters
+	----------
+	time: `datetime.datetime`, `pandas` datetime, str, or 1-d array_like (I,)
+		Time as `datetime.datetime`s, a `pandas` datetime object, a date-time
+		string supported by `pandas.to_datetime()`, or an array of those.
+		Will be converted with `pandas.to_datetime()`.
+	alt: float or 1-d array_like (I,)
+		Altitudes in [km].
+	lat: float or 1-d array_like (I,)
+		Latitudes in [°N].
+	lon: float or 1-d array_like (I,)
+		Longitudes in [°E]
+	f107a, f107, ap: float or 1-d array_like (I,), optional
+		The Solar flux and geomagnetic indices as for :func:`msise_4d()`.
+		Set to `None` (default) to use the `spaceweather` package.
+	lst: float, 1-d array_like (I,), or str, optional
+		The local solar time at each point, to override the
+		calculated values, or "apparent", see :func:`msise_4d()`.
+		Default: `None` (calculate from `time` and `lon`)
+	ap_a: list of int (7,) or array_like (I, 7), optional
+		List of Ap indices, or separate Ap arrays for each point.
+		If `flags[9]` is -1 and `ap_a` is not given, the arrays are
+		assembled from the 3-hourly Ap indices of the `spaceweather`
+		package, see :func:`ap_a_3h()`.
+	flags: list of int (23,), optional
+		List of flags, passed to :func:`gtd7_flat()`.
+	method: str, optional, default "gtd7"
+		Select MSISE-00 method, changes the output of "rho",
+		the atmospheric mass density.
+	config: :class:`MsisConfig`, optional
+		Pre-converted `ap_a` and `flags`, cannot be combined with those.
+	outputs: list of str, optional
+		Names of the model outputs to include, see :func:`msise_4d()`.
+	dtype: numpy.dtype, optional
+		Set to :class:`numpy.float32` for single precision outputs.
+	n_threads: int, optional
+		Number of threads, see :func:`gtd7_flat()`.
+
+	Returns
+	-------
+	msise_track: :class:`xarray.Dataset`
+		The MSIS atmosphere along the track with dimension "time" (I,)
+		containing the model outputs as for :func:`msise_4d()`,
+		the local solar times "lst", and the values used for
+		"Ap", "f107", and "f107a". The altitudes, latitudes, and
+		longitudes are included as coordinates "alt", "lat", and "lon".
+
+	See also
+	--------
+	msise_4d, msise_flat
+	"""
+	time = _check_nd(time)
+	dts = pd.to_datetime(time, utc=True)
+	# UTC `datetime64` for the vectorized conversions
+	dtsv = dts.tz_localize(None).to_numpy()
+	try:
+		alt, lat, lon = [
+			np.broadcast_to(np.asarray(a, dtype=np.float64), dtsv.shape)
+			for a in (_check_nd(alt), _check_nd(lat), _check_nd(lon))
+		]
+		if lst is not None and not isinstance(lst, str):
+			lst = np.broadcast_to(_check_nd(lst), dtsv.shape)
+	except ValueError:
+		raise ValueError(
+			"alt, lat, lon, and lst must be scalars or have the shape "
+			"of time {0}.".format(dtsv.shape)
+		)
+
+	with _stage("msise_track.indices"):
+		ap, f107, f107a = _gm_inputs(dtsv, ap, f107, f107a)
+		ap_a = _ap_a_inputs(dtsv, ap_a, flags, config)
+	cols = _check_outputs(outputs)
+
+	year, doy, sec, lsts = _time_inputs(dtsv, lon, lst=lst)
+	flat_func = gtd7d_flat if method == "gtd7d" else gtd7_flat
+	# contiguous outputs, written as (time, output) by the model
+	msis_data = np.empty(
+		(len(cols),) + dtsv.shape, dtype=np.float64 if dtype is None else dtype,
 	)
+	flat_func(
+		year, doy, sec, alt, lat, lon, lsts, f107a, f107, ap,
+		ap_a=ap_a, flags=flags, config=config, outputs=cols,
+		out=msis_data.T, n_threads=n_threads,
+	)
+
 	ret = xr.Dataset(
 		OrderedDict([(
-			m[0], (
-				["time", "alt", "lat", "lon"],
-				d,
-				{"long_name": m[1], "units": m[2]}
+			MSIS_OUTPUT[o][0], (
+				["time"], msis_data[i],
+				{"long_name": MSIS_OUTPUT[o][1], "units": MSIS_OUTPUT[o][2]}
 			))
-			for m, d in zip(MSIS_OUTPUT, np.rollaxis(msis_data, -1))
+			for i, o in enumerate(cols)
 		]),
 		coords=OrderedDict([
 			("time", dts.tz_localize(None)),
-			("alt", ("alt", alt, {"long_name": "altitude", "units": "km"})),
-			("lat", ("lat", lat, {"long_name": "latitude", "units": "degrees_north"})),
-			("lon", ("lon", lon, {"long_name": "longitude", "units": "degrees_east"})),
+			("alt", ("time", alt, {"long_name": "altitude", "units": "km"})),
+			("lat", ("time", lat, {"long_name": "latitude", "units": "degrees_north"})),
+			("lon", ("time", lon, {"long_name": "longitude", "units": "degrees_east"})),
 		]),
 	)
-	ret["lst"] = (
-		["time", "lon"], lsts, {"long_name": "Mean Local Solar Time", "units": "h"}
-	)
+	ret["lst"] = (["time"], np.broadcast_to(lsts, dtsv.shape), _lst_attrs(lst))
 	ret["Ap"] = (["time"], ap)
 	ret["f107"] = (["time"], f107)
 	ret["f107a"] = (["time"], f107a)
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8
+#
+# Copyright (c) 2019 Stefan Bender
+#
+# This file is part of pynrlmsise00.
+# pynrlmsise00 is free software: you can redistribute it or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+# See accompanying LICENSE file or http://www.gnu.org/licenses/gpl-2.0.html.
+"""Opt-in timing of the processing stages
+
+The batched model functions, :func:`msise_flat()`, and the
+:mod:`nrlmsise00.dataset` functions report the wall time of their
+processing stages, together with the number of model evaluations
+and the size of the allocated outputs, to the registered hooks.
+Without hooks, the overhead is a single check per stage.
+
+Stages are nested, e.g. "msise_4d.model" includes the time of the
+"gtd7_profile_array" call(s) it makes.
+"""
+from __future__ import absolute_import, division, print_function
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import threading
+import timeit
+
+__all__ = ["add_hook", "remove_hook", "record", "Recorder"]
+
+_hooks = []
+_hooks_lock = threading.Lock()
+
+
+def add_hook(hook):
+	"""Registers a function called after each processing stage
+
+	Parameters
+	----------
+	hook: callable
+		Called as ``hook(stage, seconds, evaluations, nbytes)`` with
+		the name of the stage, its wall time in seconds, the number of
+		model evaluations, and the number of bytes of the outputs
+		allocated in that stage (0 if not applicable).
+		It is called from the thread that ran the stage.
+	"""
+	with _hooks_lock:
+		_hooks.append(hook)
+
+
+def remove_hook(hook):
+	"""Removes a hook registered with :func:`add_hook()`"""
+	with _hooks_lock:
+		_hooks.remove(hook)
+
+
+class _Stage(object):
+	"""Times a processing stage and reports it to the hooks"""
+	__slots__ = ("name", "evaluations", "nbytes", "_t0")
+
+	def __init__(self, name):
+		self.name = name
+		self.evaluations = 0
+		self.nbytes = 0
+
+	def count(self, evaluations=0, nbytes=0):
+		self.evaluations += int(evaluations)
+		self.nbytes += int(nbytes)
+
+	def __enter__(self):
+		self._t0 = timeit.default_timer()
+		return self
+
+	def __exit__(self, *exc):
+		seconds = timeit.default_timer() - self._t0
+		for hook in list(_hooks):
+			hook(self.name, seconds, self.evaluations, self.nbytes)
+		return False
+
+
+class _NoStage(object):
+	"""Stand-in for :class:`_Stage` when no hooks are registered"""
+	__slots__ = ()
+
+	def count(self, evaluations=0, nbytes=0):
+		pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		return False
+
+
+_no_stage = _NoStage()
+
+
+def _stage(name):
+	"""Context manager for the stage `name`, timed only if there are hooks"""
+	return _Stage(name) if _hooks else _no_stage
+
+
+class Recorder(object):
+	"""Hook accumulating the stages
+
+	Attributes
+	----------
+	stages: OrderedDict
+		For each stage in the order of their first occurrence,
+		a dictionary with the number of "calls", the total "seconds",
+		"evaluations", and "nbytes".
+	"""
+	def __init__(self):
+		self.stages = OrderedDict()
+		self._lock = threading.Lock()
+
+	def __call__(self, stage, seconds, evaluations, nbytes):
+		with self._lock:
+			st = self.stages.setdefault(
+				stage, {"calls": 0, "seconds": 0., "evaluations": 0, "nbytes": 0}
+			)
+			st["calls"] += 1
+			st["seconds"] += seconds
+			st["evaluations"] += evaluations
+			st["nbytes"] += nbytes
+
+	def __str__(self):
+		lines = ["{0:<24s} {1:>6s} {2:>10s} {3:>12s} {4:>12s}".format(
+			"stage", "calls", "time [s]", "evaluations", "bytes")]
+		for name, st in self.stages.items():
+			lines.append("{0:<24s} {1:6d} {2:10.4f} {3:12d} {4:12d}".format(
+				name, st["calls"], st["seconds"], st["evaluations"], st["nbytes"]))
+		return "\n".join(lines)
+
+
+@contextmanager
+def record():
+	"""Records the stages within the context
+
+	Yields
+	------
+	recorder: Recorder
+		The accumulated stages, also from other threads.
+
+	Examples
+	--------
+	>>> import nrlmsise00
+	>>> from nrlmsise00.instrument import record
+	>>> with record() as rec:
+	... 	_ = nrlmsise00.gtd7_flat(2009, 172, 29000, [200, 400], 60, -70, 16, 150, 150, 4)
+	>>> rec.stages["gtd7_array"]["evaluations"]
+	2
+	"""
+	rec = Recorder()
+	add_hook(rec)
+	try:
+		yield rec
+	finally:
+		remove_hook(rec)
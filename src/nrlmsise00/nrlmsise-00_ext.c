@@ -0,0 +1,561 @@
+/* Thread-safe build of the NRLMSISE-00 C model and extensions.
+ *
+ * The upstream C code keeps intermediate results (gravity, Legendre
+ * polynomials, local time harmonics, mesosphere temperature nodes, ...)
+ * in file-level static variables which are shared between all calls.
+ * Since the python wrapper releases the GIL during the model evaluation,
+ * concurrent calls from different threads would overwrite each other's
+ * state. Therefore the upstream source `nrlmsise-00.c` is included
+ * unmodified, with all of these variables declared thread-local,
+ * which gives each thread its own copy and makes the model functions
+ * reentrant across threads.
+ *
+ * The extensions below (see `nrlmsise-00_ext.h`) are compiled in the same
+ * unit to access the upstream static functions and variables:
+ *  - `msis_density_mask()` selects the densities needed for the outputs,
+ *  - `msis_profile_init()` and `msis_profile_eval()` evaluate altitude
+ *    profiles, calculating the altitude-independent terms only once.
+ *    They re-implement the altitude split of `gtd7()`, `gtd7d()`, and
+ *    `gts7()` and duplicate the upstream expressions, so they must be
+ *    kept in sync with `nrlmsise-00.c` when updating the upstream code.
+ *
+ * Note that the parameter arrays from `nrlmsise-00_data.c` are shared,
+ * but they are only read by the model functions.
+ */
+
+/* include the system headers before redefining `static` below */
+#include <math.h>
+#include <stdio.h>
+#include <stdlib.h>
+
+#if defined(_MSC_VER)
+#define MSIS_THREAD_LOCAL __declspec(thread)
+#elif defined(__STDC_VERSION__) && __STDC_VERSION__ >= 201112L \
+	&& !defined(__STDC_NO_THREADS__)
+#define MSIS_THREAD_LOCAL _Thread_local
+#else
+#define MSIS_THREAD_LOCAL __thread
+#endif
+
+/* The upstream source uses `static` only for its shared variables. */
+#define static static MSIS_THREAD_LOCAL
+#include "nrlmsise-00.c"
+#undef static
+
+#include "nrlmsise-00_ext.h"
+
+
+
+/* ------------------------------------------------------------------- */
+/* ---------------------------- PROFILES ----------------------------- */
+/* ------------------------------------------------------------------- */
+
+unsigned int msis_density_mask(const int *cols, int ncols, int drag) {
+	unsigned int mask = 0;
+	int i;
+	for (i = 0; i < ncols; i++) {
+		if (cols[i] == 5)
+			/* the total mass density needs all species,
+			 * anomalous oxygen only for `gtd7d()` */
+			mask |= drag ? MSIS_ALL_DENSITIES : MSIS_ALL_DENSITIES & ~MSIS_DENSITY(8);
+		else if (cols[i] >= 0 && cols[i] < 9)
+			mask |= MSIS_DENSITY(cols[i]);
+	}
+	return mask;
+}
+
+/* The following splits `gtd7()` and `gts7()` into the part that depends
+ * only on time, location, and the indices, and the part that depends on
+ * the altitude. The expressions and the order of the `globe7()` and
+ * `glob7s()` calls are the same as in the upstream code, because these
+ * functions pass intermediate results (e.g. `apt` and `apdf`) via the
+ * shared variables, so the results are identical to calling `gtd7()`
+ * for each altitude. */
+
+void msis_profile_init(struct nrlmsise_input *input, struct nrlmsise_flags *flags, struct msis_profile *prof, double zmin, unsigned int mask) {
+	double xlat;
+	double zn2_0 = 72.5;
+	double dgtr=1.74533E-2;
+	double dr=1.72142E-2;
+
+	tselec(flags);
+
+	/* Latitude variation of gravity (none for sw[2]=0) */
+	xlat=input->g_lat;
+	if (flags->sw[2]==0)
+		xlat=45.0;
+	glatf(xlat, &gsurf, &re);
+	prof->gsurf = gsurf;
+	prof->re = re;
+
+	/* GTS7: TINF, G0, and TLB */
+	prof->tinf = ptm[0]*pt[0] * \
+		(1.0+flags->sw[16]*globe7(pt,input,flags));
+	prof->g0 = ptm[3]*ps[0] * \
+		(1.0+flags->sw[19]*globe7(ps,input,flags));
+	prof->tlb = ptm[1] * (1.0 + flags->sw[17]*globe7(pd[3],input,flags))*pd[3][0];
+
+	/* The lower atmosphere uses all the densities at zn2[0], and the
+	 * nodes below depend on the state left by the last `globe7()` call. */
+	if (zmin < zn2_0)
+		mask = MSIS_ALL_DENSITIES;
+	prof->mask = mask;
+
+	/* GTS7: lower thermosphere temperature nodes, not used above 300 km */
+	if (zmin < 300.0) {
+		prof->tn1[1]=ptm[6]*ptl[0][0]/(1.0-flags->sw[18]*glob7s(ptl[0], input, flags));
+		prof->tn1[2]=ptm[2]*ptl[1][0]/(1.0-flags->sw[18]*glob7s(ptl[1], input, flags));
+		prof->tn1[3]=ptm[7]*ptl[2][0]/(1.0-flags->sw[18]*glob7s(ptl[2], input, flags));
+		prof->tn1[4]=ptm[4]*ptl[3][0]/(1.0-flags->sw[18]*flags->sw[20]*glob7s(ptl[3], input, flags));
+		prof->tgn1[1]=ptm[8]*pma[8][0]*(1.0+flags->sw[18]*flags->sw[20]*glob7s(pma[8], input, flags))*prof->tn1[4]*prof->tn1[4]/(pow((ptm[4]*ptl[3][0]),2.0));
+	}
+
+	/* GTS7: density variation factors at Zlb, N2 is always needed */
+	prof->g28 = flags->sw[21]*globe7(pd[2], input, flags);
+	if (mask & MSIS_DENSITY(0))
+		prof->g04 = flags->sw[21]*globe7(pd[0], input, flags);
+	if (mask & MSIS_DENSITY(1))
+		prof->g16 = flags->sw[21]*globe7(pd[1], input, flags);
+	if (mask & MSIS_DENSITY(3))
+		prof->g32 = flags->sw[21]*globe7(pd[4], input, flags);
+	if (mask & MSIS_DENSITY(4))
+		prof->g40 = flags->sw[21]*globe7(pd[5], input, flags);
+	if (mask & MSIS_DENSITY(6))
+		prof->g01 = flags->sw[21]*globe7(pd[6], input, flags);
+	if (mask & MSIS_DENSITY(7))
+		prof->g14 = flags->sw[21]*globe7(pd[7], input, flags);
+	if (mask & MSIS_DENSITY(8))
+		prof->g16h = flags->sw[21]*globe7(pd[8], input, flags);
+
+	/* GTS7: variation of turbopause height */
+	prof->zhf=pdl[1][24]*(1.0+flags->sw[5]*pdl[0][24]*sin(dgtr*input->g_lat)*cos(dr*(input->doy-pt[13])));
+
+	prof->has_low = 0;
+	if (zmin >= zn2_0)
+		return;
+
+	/* GTD7: lower mesosphere / upper stratosphere nodes */
+	prof->tgn2[0]=prof->tgn1[1];
+	prof->tn2[0]=prof->tn1[4];
+	prof->tn2[1]=pma[0][0]*pavgm[0]/(1.0-flags->sw[20]*glob7s(pma[0], input, flags));
+	prof->tn2[2]=pma[1][0]*pavgm[1]/(1.0-flags->sw[20]*glob7s(pma[1], input, flags));
+	prof->tn2[3]=pma[2][0]*pavgm[2]/(1.0-flags->sw[20]*flags->sw[22]*glob7s(pma[2], input, flags));
+	prof->tgn2[1]=pavgm[8]*pma[9][0]*(1.0+flags->sw[20]*flags->sw[22]*glob7s(pma[9], input, flags))*prof->tn2[3]*prof->tn2[3]/(pow((pma[2][0]*pavgm[2]),2.0));
+	prof->tn3[0]=prof->tn2[3];
+
+	/* GTD7: lower stratosphere and troposphere nodes */
+	prof->tgn3[0]=prof->tgn2[1];
+	prof->tn3[1]=pma[3][0]*pavgm[3]/(1.0-flags->sw[22]*glob7s(pma[3], input, flags));
+	prof->tn3[2]=pma[4][0]*pavgm[4]/(1.0-flags->sw[22]*glob7s(pma[4], input, flags));
+	prof->tn3[3]=pma[5][0]*pavgm[5]/(1.0-flags->sw[22]*glob7s(pma[5], input, flags));
+	prof->tn3[4]=pma[6][0]*pavgm[6]/(1.0-flags->sw[22]*glob7s(pma[6], input, flags));
+	prof->tgn3[1]=pma[7][0]*pavgm[7]*(1.0+flags->sw[22]*glob7s(pma[7], input, flags)) *prof->tn3[4]*prof->tn3[4]/(pow((pma[6][0]*pavgm[6]),2.0));
+}
+
+/* Altitude-dependent part of `gts7()` at `alt` (> 72.5 km),
+ * only the densities set in `prof->mask` are calculated, the others
+ * are zero. N2 is always calculated, it is needed for the other species. */
+static void gts7_profile(struct msis_profile *prof, double alt, struct nrlmsise_input *input, struct nrlmsise_flags *flags, struct nrlmsise_output *output) {
+	unsigned int mask = prof->mask;
+	double za;
+	int i, j;
+	double ddum, z;
+	double zn1[5] = {120.0, 110.0, 100.0, 90.0, 72.5};
+	double tn1[5], tgn1[2];
+	double tinf;
+	int mn1 = 5;
+	double g0;
+	double tlb;
+	double s;
+	double db01, db04, db14, db16, db28, db32, db40;
+	double zh28, zh04, zh16, zh32, zh40, zh01, zh14;
+	double zhm28, zhm04, zhm16, zhm32, zhm40, zhm01, zhm14;
+	double xmd;
+	double b28, b04, b16, b32, b40, b01, b14;
+	double tz;
+	double zhf, xmm;
+	double zc04, zc16, zc32, zc40, zc01, zc14;
+	double hc04, hc16, hc32, hc40, hc01, hc14;
+	double hcc16, hcc32, hcc01, hcc14;
+	double zcc16, zcc32, zcc01, zcc14;
+	double rc16, rc32, rc01, rc14;
+	double rl;
+	double db16h, tho, zsht, zmho, zsho;
+	double alpha[9]={-0.38, 0.0, 0.0, 0.0, 0.17, 0.0, -0.38, 0.0, 0.0};
+	double altl[8]={200.0, 300.0, 160.0, 250.0, 240.0, 450.0, 320.0, 450.0};
+	double dd;
+	double hc216, hcc232;
+	za = pdl[1][15];
+	zn1[0] = za;
+	for (j=0;j<9;j++)
+		output->d[j]=0;
+
+	/* TINF VARIATIONS NOT IMPORTANT BELOW ZA OR ZN1(1) */
+	if (alt>zn1[0])
+		tinf = prof->tinf;
+	else
+		tinf = ptm[0]*pt[0];
+	output->t[0]=tinf;
+
+	/*  GRADIENT VARIATIONS NOT IMPORTANT BELOW ZN1(5) */
+	if (alt>zn1[4])
+		g0 = prof->g0;
+	else
+		g0 = ptm[3]*ps[0];
+	tlb = prof->tlb;
+	s = g0 / (tinf - tlb);
+
+/*      Lower thermosphere temp variations not significant for
+ *       density above 300 km */
+	tn1[0] = 0.0;
+	tgn1[0] = 0.0;
+	if (alt<300.0) {
+		for (i=1;i<5;i++)
+			tn1[i]=prof->tn1[i];
+		tgn1[1]=prof->tgn1[1];
+	} else {
+		tn1[1]=ptm[6]*ptl[0][0];
+		tn1[2]=ptm[2]*ptl[1][0];
+		tn1[3]=ptm[7]*ptl[2][0];
+		tn1[4]=ptm[4]*ptl[3][0];
+		tgn1[1]=ptm[8]*pma[8][0]*tn1[4]*tn1[4]/(pow((ptm[4]*ptl[3][0]),2.0));
+	}
+
+	zhf=prof->zhf;
+	output->t[0]=tinf;
+	xmm = pdm[2][4];
+	z = alt;
+
+
+        /**** N2 DENSITY ****/
+
+	/* Diffusive density at Zlb */
+	db28 = pdm[2][0]*exp(prof->g28)*pd[2][0];
+	/* Diffusive density at Alt */
+	output->d[2]=densu(z,db28,tinf,tlb,28.0,alpha[2],&output->t[1],ptm[5],s,mn1,zn1,tn1,tgn1);
+	dd=output->d[2];
+	/* Turbopause */
+	zh28=pdm[2][2]*zhf;
+	zhm28=pdm[2][3]*pdl[1][5];
+	xmd=28.0-xmm;
+	/* Mixed density at Zlb */
+	b28=densu(zh28,db28,tinf,tlb,xmd,(alpha[2]-1.0),&tz,ptm[5],s,mn1, zn1,tn1,tgn1);
+	if ((flags->sw[15])&&(z<=altl[2])) {
+		/*  Mixed density at Alt */
+		dm28=densu(z,b28,tinf,tlb,xmm,alpha[2],&tz,ptm[5],s,mn1,zn1,tn1,tgn1);
+		/*  Net density at Alt */
+		output->d[2]=dnet(output->d[2],dm28,zhm28,xmm,28.0);
+	}
+
+
+        /**** HE DENSITY ****/
+	if (mask & MSIS_DENSITY(0)) {
+
+		/*  Diffusive density at Zlb */
+		db04 = pdm[0][0]*exp(prof->g04)*pd[0][0];
+	        /*  Diffusive density at Alt */
+		output->d[0]=densu(z,db04,tinf,tlb, 4.,alpha[0],&output->t[1],ptm[5],s,mn1,zn1,tn1,tgn1);
+		dd=output->d[0];
+		if ((flags->sw[15]) && (z<altl[0])) {
+			/*  Turbopause */
+			zh04=pdm[0][2];
+			/*  Mixed density at Zlb */
+			b04=densu(zh04,db04,tinf,tlb,4.-xmm,alpha[0]-1.,&output->t[1],ptm[5],s,mn1,zn1,tn1,tgn1);
+			/*  Mixed density at Alt */
+			dm04=densu(z,b04,tinf,tlb,xmm,0.,&output->t[1],ptm[5],s,mn1,zn1,tn1,tgn1);
+			zhm04=zhm28;
+			/*  Net density at Alt */
+			output->d[0]=dnet(output->d[0],dm04,zhm04,xmm,4.);
+			/*  Correction to specified mixing ratio at ground */
+			rl=log(b28*pdm[0][1]/b04);
+			zc04=pdm[0][4]*pdl[1][0];
+			hc04=pdm[0][5]*pdl[1][1];
+			/*  Net density corrected at Alt */
+			output->d[0]=output->d[0]*ccor(z,rl,hc04,zc04);
+		}
+	}
+
+
+        /**** O DENSITY ****/
+	if (mask & MSIS_DENSITY(1)) {
+
+		/*  Diffusive density at Zlb */
+		db16 =  pdm[1][0]*exp(prof->g16)*pd[1][0];
+	        /*   Diffusive density at Alt */
+		output->d[1]=densu(z,db16,tinf,tlb, 16.,alpha[1],&output->t[1],ptm[5],s,mn1, zn1,tn1,tgn1);
+		dd=output->d[1];
+		if ((flags->sw[15]) && (z<=altl[1])) {
+			/*   Turbopause */
+			zh16=pdm[1][2];
+			/*  Mixed density at Zlb */
+			b16=densu(zh16,db16,tinf,tlb,16.0-xmm,(alpha[1]-1.0), &output->t[1],ptm[5],s,mn1,zn1,tn1,tgn1);
+			/*  Mixed density at Alt */
+			dm16=densu(z,b16,tinf,tlb,xmm,0.,&output->t[1],ptm[5],s,mn1,zn1,tn1,tgn1);
+			zhm16=zhm28;
+			/*  Net density at Alt */
+			output->d[1]=dnet(output->d[1],dm16,zhm16,xmm,16.);
+			rl=pdm[1][1]*pdl[1][16]*(1.0+flags->sw[1]*pdl[0][23]*(input->f107A-150.0));
+			hc16=pdm[1][5]*pdl[1][3];
+			zc16=pdm[1][4]*pdl[1][2];
+			hc216=pdm[1][5]*pdl[1][4];
+			output->d[1]=output->d[1]*ccor2(z,rl,hc16,zc16,hc216);
+			/*   Chemistry correction */
+			hcc16=pdm[1][7]*pdl[1][13];
+			zcc16=pdm[1][6]*pdl[1][12];
+			rc16=pdm[1][3]*pdl[1][14];
+			/*  Net density corrected at Alt */
+			output->d[1]=output->d[1]*ccor(z,rc16,hcc16,zcc16);
+		}
+	}
+
+
+        /**** O2 DENSITY ****/
+	if (mask & MSIS_DENSITY(3)) {
+
+	        /*  Diffusive density at Zlb */
+		db32 = pdm[3][0]*exp(prof->g32)*pd[4][0];
+	        /*   Diffusive density at Alt */
+		output->d[3]=densu(z,db32,tinf,tlb, 32.,alpha[3],&output->t[1],ptm[5],s,mn1, zn1,tn1,tgn1);
+		dd=output->d[3];
+		if (flags->sw[15]) {
+			if (z<=altl[3]) {
+				/*   Turbopause */
+				zh32=pdm[3][2];
+				/*  Mixed density at Zlb */
+				b32=densu(zh32,db32,tinf,tlb,32.-xmm,alpha[3]-1., &output->t[1],ptm[5],s,mn1,zn1,tn1,tgn1);
+				/*  Mixed density at Alt */
+				dm32=densu(z,b32,tinf,tlb,xmm,0.,&output->t[1],ptm[5],s,mn1,zn1,tn1,tgn1);
+				zhm32=zhm28;
+				/*  Net density at Alt */
+				output->d[3]=dnet(output->d[3],dm32,zhm32,xmm,32.);
+				/*   Correction to specified mixing ratio at ground */
+				rl=log(b28*pdm[3][1]/b32);
+				hc32=pdm[3][5]*pdl[1][7];
+				zc32=pdm[3][4]*pdl[1][6];
+				output->d[3]=output->d[3]*ccor(z,rl,hc32,zc32);
+			}
+			/*  Correction for general departure from diffusive equilibrium above Zlb */
+			hcc32=pdm[3][7]*pdl[1][22];
+			hcc232=pdm[3][7]*pdl[0][22];
+			zcc32=pdm[3][6]*pdl[1][21];
+			rc32=pdm[3][3]*pdl[1][23]*(1.+flags->sw[1]*pdl[0][23]*(input->f107A-150.));
+			/*  Net density corrected at Alt */
+			output->d[3]=output->d[3]*ccor2(z,rc32,hcc32,zcc32,hcc232);
+		}
+	}
+
+
+        /**** AR DENSITY ****/
+	if (mask & MSIS_DENSITY(4)) {
+
+	        /*  Diffusive density at Zlb */
+		db40 = pdm[4][0]*exp(prof->g40)*pd[5][0];
+		/*   Diffusive density at Alt */
+		output->d[4]=densu(z,db40,tinf,tlb, 40.,alpha[4],&output->t[1],ptm[5],s,mn1,zn1,tn1,tgn1);
+		dd=output->d[4];
+		if ((flags->sw[15]) && (z<=altl[4])) {
+			/*   Turbopause */
+			zh40=pdm[4][2];
+			/*  Mixed density at Zlb */
+			b40=densu(zh40,db40,tinf,tlb,40.-xmm,alpha[4]-1.,&output->t[1],ptm[5],s,mn1,zn1,tn1,tgn1);
+			/*  Mixed density at Alt */
+			dm40=densu(z,b40,tinf,tlb,xmm,0.,&output->t[1],ptm[5],s,mn1,zn1,tn1,tgn1);
+			zhm40=zhm28;
+			/*  Net density at Alt */
+			output->d[4]=dnet(output->d[4],dm40,zhm40,xmm,40.);
+			/*   Correction to specified mixing ratio at ground */
+			rl=log(b28*pdm[4][1]/b40);
+			hc40=pdm[4][5]*pdl[1][9];
+			zc40=pdm[4][4]*pdl[1][8];
+			/*  Net density corrected at Alt */
+			output->d[4]=output->d[4]*ccor(z,rl,hc40,zc40);
+		  }
+	}
+
+
+        /**** HYDROGEN DENSITY ****/
+	if (mask & MSIS_DENSITY(6)) {
+
+	        /*  Diffusive density at Zlb */
+		db01 = pdm[5][0]*exp(prof->g01)*pd[6][0];
+	        /*   Diffusive density at Alt */
+		output->d[6]=densu(z,db01,tinf,tlb,1.,alpha[6],&output->t[1],ptm[5],s,mn1,zn1,tn1,tgn1);
+		dd=output->d[6];
+		if ((flags->sw[15]) && (z<=altl[6])) {
+			/*   Turbopause */
+			zh01=pdm[5][2];
+			/*  Mixed density at Zlb */
+			b01=densu(zh01,db01,tinf,tlb,1.-xmm,alpha[6]-1., &output->t[1],ptm[5],s,mn1,zn1,tn1,tgn1);
+			/*  Mixed density at Alt */
+			dm01=densu(z,b01,tinf,tlb,xmm,0.,&output->t[1],ptm[5],s,mn1,zn1,tn1,tgn1);
+			zhm01=zhm28;
+			/*  Net density at Alt */
+			output->d[6]=dnet(output->d[6],dm01,zhm01,xmm,1.);
+			/*   Correction to specified mixing ratio at ground */
+			rl=log(b28*pdm[5][1]*sqrt(pdl[1][17]*pdl[1][17])/b01);
+			hc01=pdm[5][5]*pdl[1][11];
+			zc01=pdm[5][4]*pdl[1][10];
+			output->d[6]=output->d[6]*ccor(z,rl,hc01,zc01);
+			/*   Chemistry correction */
+			hcc01=pdm[5][7]*pdl[1][19];
+			zcc01=pdm[5][6]*pdl[1][18];
+			rc01=pdm[5][3]*pdl[1][20];
+			/*  Net density corrected at Alt */
+			output->d[6]=output->d[6]*ccor(z,rc01,hcc01,zcc01);
+		}
+	}
+
+
+        /**** ATOMIC NITROGEN DENSITY ****/
+	if (mask & MSIS_DENSITY(7)) {
+
+	        /*  Diffusive density at Zlb */
+		db14 = pdm[6][0]*exp(prof->g14)*pd[7][0];
+	        /*   Diffusive density at Alt */
+		output->d[7]=densu(z,db14,tinf,tlb,14.,alpha[7],&output->t[1],ptm[5],s,mn1,zn1,tn1,tgn1);
+		dd=output->d[7];
+		if ((flags->sw[15]) && (z<=altl[7])) {
+			/*   Turbopause */
+			zh14=pdm[6][2];
+			/*  Mixed density at Zlb */
+			b14=densu(zh14,db14,tinf,tlb,14.-xmm,alpha[7]-1., &output->t[1],ptm[5],s,mn1,zn1,tn1,tgn1);
+			/*  Mixed density at Alt */
+			dm14=densu(z,b14,tinf,tlb,xmm,0.,&output->t[1],ptm[5],s,mn1,zn1,tn1,tgn1);
+			zhm14=zhm28;
+			/*  Net density at Alt */
+			output->d[7]=dnet(output->d[7],dm14,zhm14,xmm,14.);
+			/*   Correction to specified mixing ratio at ground */
+			rl=log(b28*pdm[6][1]*sqrt(pdl[0][2]*pdl[0][2])/b14);
+			hc14=pdm[6][5]*pdl[0][1];
+			zc14=pdm[6][4]*pdl[0][0];
+			output->d[7]=output->d[7]*ccor(z,rl,hc14,zc14);
+			/*   Chemistry correction */
+			hcc14=pdm[6][7]*pdl[0][4];
+			zcc14=pdm[6][6]*pdl[0][3];
+			rc14=pdm[6][3]*pdl[0][5];
+			/*  Net density corrected at Alt */
+			output->d[7]=output->d[7]*ccor(z,rc14,hcc14,zcc14);
+		}
+	}
+
+
+        /**** Anomalous OXYGEN DENSITY ****/
+	if (mask & MSIS_DENSITY(8)) {
+
+		db16h = pdm[7][0]*exp(prof->g16h)*pd[8][0];
+		tho = pdm[7][9]*pdl[0][6];
+		dd=densu(z,db16h,tho,tho,16.,alpha[8],&output->t[1],ptm[5],s,mn1, zn1,tn1,tgn1);
+		zsht=pdm[7][5];
+		zmho=pdm[7][4];
+		zsho=scalh(zmho,16.0,tho);
+		output->d[8]=dd*exp(-zsht/zsho*(exp(-(z-zmho)/zsht)-1.));
+	}
+
+
+	/* total mass density */
+	output->d[5] = 1.66E-24*(4.0*output->d[0]+16.0*output->d[1]+28.0*output->d[2]+32.0*output->d[3]+40.0*output->d[4]+ output->d[6]+14.0*output->d[7]);
+
+
+	/* temperature */
+	z = sqrt(alt*alt);
+	ddum = densu(z,1.0, tinf, tlb, 0.0, 0.0, &output->t[1], ptm[5], s, mn1, zn1, tn1, tgn1);
+	(void) ddum; /* silence gcc */
+	if (flags->sw[0]) {
+		for(i=0;i<9;i++)
+			output->d[i]=output->d[i]*1.0E6;
+		output->d[5]=output->d[5]/1000;
+	}
+}
+
+void msis_profile_eval(struct msis_profile *prof, double alt, struct nrlmsise_input *input, struct nrlmsise_flags *flags, struct nrlmsise_output *output, int drag) {
+	double xmm;
+	int mn3 = 5;
+	double zn3[5]={32.5,20.0,15.0,10.0,0.0};
+	int mn2 = 4;
+	double zn2[4]={72.5,55.0,45.0,32.5};
+	double zmix=62.5;
+	double dm28m;
+	double tz;
+	double dmc;
+	double dmr;
+	double dz28;
+	struct nrlmsise_output *soutput;
+
+	gsurf = prof->gsurf;
+	re = prof->re;
+
+	/* THERMOSPHERE / MESOSPHERE (above zn2[0]) */
+	if (alt>=zn2[0]) {
+		gts7_profile(prof, alt, input, flags, output);
+		goto drag;
+	}
+
+	/* The thermospheric values at zn2[0] are the same for all
+	 * altitudes below. */
+	if (!prof->has_low) {
+		gts7_profile(prof, zn2[0], input, flags, &prof->low);
+		prof->dm28_low = dm28;
+		prof->has_low = 1;
+	}
+	soutput = &prof->low;
+
+	xmm = pdm[2][4];
+	if (flags->sw[0])   /* metric adjustment */
+		dm28m=prof->dm28_low*1.0E6;
+	else
+		dm28m=prof->dm28_low;
+	output->t[0]=soutput->t[0];
+	output->t[1]=soutput->t[1];
+
+        /* LINEAR TRANSITION TO FULL MIXING BELOW zn2[0] */
+
+	dmc=0;
+	if (alt>zmix)
+		dmc = 1.0 - (zn2[0]-alt)/(zn2[0] - zmix);
+	dz28=soutput->d[2];
+
+	/**** N2 density ****/
+	dmr=soutput->d[2] / dm28m - 1.0;
+	output->d[2]=densm(alt,dm28m,xmm, &tz, mn3, zn3, prof->tn3, prof->tgn3, mn2, zn2, prof->tn2, prof->tgn2);
+	output->d[2]=output->d[2] * (1.0 + dmr*dmc);
+
+	/**** HE density ****/
+	dmr = soutput->d[0] / (dz28 * pdm[0][1]) - 1.0;
+	output->d[0] = output->d[2] * pdm[0][1] * (1.0 + dmr*dmc);
+
+	/**** O density ****/
+	output->d[1] = 0;
+	output->d[8] = 0;
+
+	/**** O2 density ****/
+	dmr = soutput->d[3] / (dz28 * pdm[3][1]) - 1.0;
+	output->d[3] = output->d[2] * pdm[3][1] * (1.0 + dmr*dmc);
+
+	/**** AR density ***/
+	dmr = soutput->d[4] / (dz28 * pdm[4][1]) - 1.0;
+	output->d[4] = output->d[2] * pdm[4][1] * (1.0 + dmr*dmc);
+
+	/**** Hydrogen density ****/
+	output->d[6] = 0;
+
+	/**** Atomic nitrogen density ****/
+	output->d[7] = 0;
+
+	/**** Total mass density */
+	output->d[5] = 1.66E-24 * (4.0 * output->d[0] + 16.0 * output->d[1] + 28.0 * output->d[2] + 32.0 * output->d[3] + 40.0 * output->d[4] + output->d[6] + 14.0 * output->d[7]);
+
+	if (flags->sw[0])
+		output->d[5]=output->d[5]/1000;
+
+	/**** temperature at altitude ****/
+	dd = densm(alt, 1.0, 0, &tz, mn3, zn3, prof->tn3, prof->tgn3, mn2, zn2, prof->tn2, prof->tgn2);
+	output->t[1]=tz;
+
+drag:
+	/* GTD7D: effective total mass density for drag */
+	if (drag) {
+		output->d[5] = 1.66E-24 * (4.0 * output->d[0] + 16.0 * output->d[1] + 28.0 * output->d[2] + 32.0 * output->d[3] + 40.0 * output->d[4] + output->d[6] + 14.0 * output->d[7] + 16.0 * output->d[8]);
+		if (flags->sw[0])
+			output->d[5]=output->d[5]/1000;
+	}
+}
@@ -0,0 +1,65 @@
+/* Extensions to the NRLMSISE-00 C model.
+ *
+ * Include after "nrlmsise-00.h", which has no include guard.
+ */
+#ifndef NRLMSISE_00_EXT_H
+#define NRLMSISE_00_EXT_H
+
+/* ------------------------------------------------------------------- */
+/* ---------------------------- PROFILES ----------------------------- */
+/* ------------------------------------------------------------------- */
+
+/* Bit of density `i` (index into `nrlmsise_output.d`) in the masks */
+#define MSIS_DENSITY(i) (1u << (i))
+#define MSIS_ALL_DENSITIES 0x1ffu
+
+/* Altitude-independent part of the model for one time and location,
+ * calculated once by `msis_profile_init()` and used by
+ * `msis_profile_eval()` for each altitude. */
+struct msis_profile {
+	double gsurf, re;
+	/* densities to be evaluated */
+	unsigned int mask;
+	/* exospheric temperature and gradient, used above za and zn1[4] */
+	double tinf, g0;
+	/* temperature at zlb */
+	double tlb;
+	/* lower thermosphere temperature nodes, used below 300 km */
+	double tn1[5], tgn1[2];
+	/* density variation factors at zlb */
+	double g28, g04, g16, g32, g40, g01, g14, g16h;
+	/* turbopause height */
+	double zhf;
+	/* mesosphere and stratosphere temperature nodes */
+	double tn2[4], tgn2[2], tn3[5], tgn3[2];
+	/* thermospheric output and N2 mixed density at zn2[0],
+	 * set on first use below zn2[0] */
+	int has_low;
+	struct nrlmsise_output low;
+	double dm28_low;
+};
+
+/* Prepares the profile for altitudes >= `zmin` and the densities
+ * in `mask`, the parts of the model that are not needed for these
+ * are skipped. The other densities may be zero or invalid,
+ * the temperatures are always calculated. */
+void msis_profile_init(struct nrlmsise_input *input, \
+                       struct nrlmsise_flags *flags, \
+                       struct msis_profile *prof, \
+                       double zmin, \
+                       unsigned int mask);
+
+/* Same as `gtd7()` (or `gtd7d()` when `drag` is set) at `alt` >= `zmin`,
+ * using the values in `prof` calculated for `input` and `flags`. */
+void msis_profile_eval(struct msis_profile *prof, \
+                       double alt, \
+                       struct nrlmsise_input *input, \
+                       struct nrlmsise_flags *flags, \
+                       struct nrlmsise_output *output, \
+                       int drag);
+
+/* Densities needed for the output columns `cols`
+ * (0-8 densities, 9-10 temperatures) */
+unsigned int msis_density_mask(const int *cols, int ncols, int drag);
+
+#endif /* NRLMSISE_00_EXT_H */
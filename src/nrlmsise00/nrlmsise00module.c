@@ -1,12 +1,13 @@
 #include <Python.h>
 #include "nrlmsise-00.h"
+#include "nrlmsise-00_ext.h"
 
 PyObject *module;
 
 static char module_docstring[] =
 	"NRLMSISE-00 wrapper module";
 static char gtd7_docstring[] =
-	"gtd7(year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap, ap_a=None, flags=None)\n\n\
+	"gtd7(year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap, ap_a=None, flags=None, config=None)\n\n\
 	MSIS Neutral Atmosphere Empircial Model from the surface to lower exosphere.\n\n\
 	Parameters\n\
 	----------\n\
@@ -80,7 +81,10 @@ static char gtd7_docstring[] =
 		20. all TN2 var\n\
 		21. all NLB var\n\
 		22. all TN3 var\n\
-		23. turbo scale height var\n\n\
+		23. turbo scale height var\n\
+	config: MsisConfig, optional\n\
+		Pre-converted `ap_a` and `flags`, see :class:`MsisConfig`.\n\
+		Cannot be combined with `ap_a` or `flags`.\n\n\
 	Returns\n\
 	-------\n\
 	densities: list\n\
@@ -129,6 +133,217 @@ static char gtd7d_docstring[] =
 		in this model, INCLUDING anomalous oxygen.\
 	";
 
+static char gtd7_array_docstring[] =
+	"gtd7_array(year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap, out, ap_a=None, flags=None, config=None, outputs=None)\n\n\
+	Batched version of :func:`gtd7()` operating on contiguous buffers.\n\n\
+	Evaluates the model for `n` points in a single call, without\n\
+	creating intermediate python objects for each point.\n\
+	The global interpreter lock is released during the whole loop.\n\n\
+	Parameters\n\
+	----------\n\
+	year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap: buffer\n\
+		C-contiguous float64 buffers (e.g. :class:`numpy.ndarray`) of\n\
+		either length `n` or length 1. Length-1 buffers are used\n\
+		for all `n` points. See :func:`gtd7()` for the meaning\n\
+		of the individual inputs.\n\
+	out: buffer\n\
+		Writable C-contiguous float64 or float32 buffer of length\n\
+		`n` * 11, the nine densities and the two temperatures for each\n\
+		point are written in this order. With `outputs`, of length\n\
+		`n` * len(`outputs`) instead. A 2-D buffer with shape\n\
+		(`n`, 11) or (`n`, len(`outputs`)) can have arbitrary strides.\n\
+	ap_a: list of 7 floats or buffer, optional\n\
+		Same as for :func:`gtd7()`, or a C-contiguous float64 buffer\n\
+		with 7 values for each of the `n` points.\n\
+		The buffer can be combined with `config`.\n\
+	flags: list of 24 int, optional\n\
+		Same as for :func:`gtd7()`.\n\
+	config: MsisConfig, optional\n\
+		Same as for :func:`gtd7()`.\n\
+	outputs: sequence of int, optional\n\
+		Indices of the output columns to write, in this order.\n\
+		Densities that are not needed for these columns are not\n\
+		calculated, e.g. hydrogen, atomic nitrogen, and anomalous\n\
+		oxygen when only the temperatures are requested.\n\n\
+	Returns\n\
+	-------\n\
+	None\n\
+	";
+static char gtd7d_array_docstring[] =
+	"gtd7d_array(year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap, out, ap_a=None, flags=None, config=None, outputs=None)\n\n\
+	Batched version of :func:`gtd7d()` operating on contiguous buffers.\n\n\
+	Parameters\n\
+	----------\n\
+	Same as for :func:`gtd7_array()`.\n\n\
+	Returns\n\
+	-------\n\
+	None\n\
+	";
+
+static char ghp7_docstring[] =
+	"ghp7(year, doy, sec, press, g_lat, g_long, lst, f107A, f107, ap, ap_a=None, flags=None, config=None)\n\n\
+	MSIS Neutral Atmosphere Empircial Model at a given pressure level.\n\n\
+	Finds the altitude of the pressure level `press` iteratively\n\
+	and evaluates :func:`gtd7()` at that altitude.\n\n\
+	Parameters\n\
+	----------\n\
+	press: float\n\
+		Pressure level in [mbar] (hPa).\n\
+	year, doy, sec, g_lat, g_long, lst, f107A, f107, ap, ap_a, flags, config:\n\
+		Same as for :func:`gtd7()`.\n\n\
+	Returns\n\
+	-------\n\
+	densities, temperatures, alt: (list, list, float)\n\
+		The densities and temperatures as for :func:`gtd7()`,\n\
+		and the altitude of the pressure level in [km].\n\
+	";
+static char ghp7_array_docstring[] =
+	"ghp7_array(year, doy, sec, press, g_lat, g_long, lst, f107A, f107, ap, out, ap_a=None, flags=None, config=None, outputs=None)\n\n\
+	Batched version of :func:`ghp7()` operating on contiguous buffers.\n\n\
+	Parameters\n\
+	----------\n\
+	Same as for :func:`gtd7_array()`, with the pressure levels `press`\n\
+	in [mbar] instead of the altitudes, and the output buffer `out`\n\
+	of length `n` * 12. The altitude in [km] is written after\n\
+	the densities and temperatures of each point, it can be selected\n\
+	as column 11 in `outputs`. The full model is evaluated to find\n\
+	the pressure level, `outputs` only selects the columns.\n\n\
+	Returns\n\
+	-------\n\
+	None\n\
+	";
+
+static char gtd7_profile_array_docstring[] =
+	"gtd7_profile_array(year, doy, sec, g_lat, g_long, lst, f107A, f107, ap, alt, out, ap_a=None, flags=None, config=None, outputs=None)\n\n\
+	Altitude profiles of :func:`gtd7()` operating on contiguous buffers.\n\n\
+	Evaluates the model at `k` altitudes for each of `m` times and\n\
+	locations, calculating the altitude-independent parts of the model\n\
+	only once per profile. The results are the same as from :func:`gtd7()`.\n\n\
+	Parameters\n\
+	----------\n\
+	year, doy, sec, g_lat, g_long, lst, f107A, f107, ap: buffer\n\
+		C-contiguous float64 buffers of either length `m` or length 1,\n\
+		see :func:`gtd7()` for the meaning of the individual inputs.\n\
+	alt: buffer\n\
+		C-contiguous float64 buffer of length `k` with the altitudes\n\
+		in [km] of each profile.\n\
+	out: buffer\n\
+		Writable C-contiguous float64 or float32 buffer of length\n\
+		`m` * `k` * 11, filled in the order (profile, altitude, output).\n\
+		With `outputs`, of length `m` * `k` * len(`outputs`) instead.\n\
+		A 2-D buffer with one row per profile, a 3-D buffer with shape\n\
+		(`m`, `k`, 11), or a 4-D buffer with shape (`m0`, `m1`, `k`, 11),\n\
+		`m0` * `m1` = `m`, can have arbitrary strides.\n\
+	ap_a: list of 7 floats or buffer, optional\n\
+		Same as for :func:`gtd7()`, or a C-contiguous float64 buffer\n\
+		with 7 values for each of the `m` profiles.\n\
+		The buffer can be combined with `config`.\n\
+	flags: list of 24 int, optional\n\
+		Same as for :func:`gtd7()`.\n\
+	config: MsisConfig, optional\n\
+		Same as for :func:`gtd7()`.\n\
+	outputs: sequence of int, optional\n\
+		Same as for :func:`gtd7_array()`.\n\n\
+	Returns\n\
+	-------\n\
+	None\n\
+	";
+static char gtd7d_profile_array_docstring[] =
+	"gtd7d_profile_array(year, doy, sec, g_lat, g_long, lst, f107A, f107, ap, alt, out, ap_a=None, flags=None, config=None, outputs=None)\n\n\
+	Altitude profiles of :func:`gtd7d()` operating on contiguous buffers.\n\n\
+	Parameters\n\
+	----------\n\
+	Same as for :func:`gtd7_profile_array()`.\n\n\
+	Returns\n\
+	-------\n\
+	None\n\
+	";
+
+static char gtd7_jacobian_array_docstring[] =
+	"gtd7_jacobian_array(year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap, out, jac, wrt, steps, ap_a=None, flags=None, config=None, outputs=None)\n\n\
+	Batched :func:`gtd7()` with derivatives with respect to the inputs.\n\n\
+	The derivatives are central differences. The altitude derivative\n\
+	re-uses the altitude-independent part of the model calculated\n\
+	for the point itself, the other derivatives evaluate the model\n\
+	twice for each input. The longitude derivative is taken at fixed\n\
+	universal time, i.e. the local solar time changes by 1 h / 15°\n\
+	together with the longitude.\n\n\
+	Parameters\n\
+	----------\n\
+	year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap: buffer\n\
+		Same as for :func:`gtd7_array()`.\n\
+	out: buffer\n\
+		Same as for :func:`gtd7_array()`.\n\
+	jac: buffer\n\
+		Writable float64 or float32 buffer of length\n\
+		`n` * `m` * len(`wrt`) for the derivatives of the `m` outputs\n\
+		(11, or len(`outputs`)), in the order (point, output, input).\n\
+	wrt: sequence of int\n\
+		Indices of the inputs in the argument list to take the\n\
+		derivatives for, between 3 (`alt`) and 9 (`ap`).\n\
+	steps: sequence of float\n\
+		The finite difference step for each input in `wrt`.\n\
+	ap_a, flags, config, outputs: optional\n\
+		Same as for :func:`gtd7_array()`.\n\n\
+	Returns\n\
+	-------\n\
+	None\n\
+	";
+static char gtd7d_jacobian_array_docstring[] =
+	"gtd7d_jacobian_array(year, doy, sec, alt, g_lat, g_long, lst, f107A, f107, ap, out, jac, wrt, steps, ap_a=None, flags=None, config=None, outputs=None)\n\n\
+	Batched :func:`gtd7d()` with derivatives with respect to the inputs.\n\n\
+	Parameters\n\
+	----------\n\
+	Same as for :func:`gtd7_jacobian_array()`.\n\n\
+	Returns\n\
+	-------\n\
+	None\n\
+	";
+
+static char interp_table_array_docstring[] =
+	"interp_table_array(xs, values, axes, out)\n\n\
+	Multi-linear interpolation on a regular grid, used by\n\
+	:class:`nrlmsise00.table.MsisTable`.\n\n\
+	Parameters\n\
+	----------\n\
+	xs: sequence of buffers\n\
+		The coordinates of the `n` points along each of the `D` axes,\n\
+		C-contiguous float64 buffers of length `n` or 1.\n\
+	values: buffer\n\
+		C-contiguous float64 or float32 buffer with the values on the\n\
+		grid, shape (len(axes[0]), ..., len(axes[D - 1]), `m`).\n\
+	axes: sequence of buffers\n\
+		The `D` grid axes, increasing C-contiguous float64 buffers.\n\
+		Axes with a single value are not interpolated.\n\
+	out: buffer\n\
+		Writable float64 buffer for the `n` * `m` results,\n\
+		see :func:`gtd7_array()`, points outside of the grid are NaN.\n\n\
+	Returns\n\
+	-------\n\
+	None\n\
+	";
+
+static char msis_config_docstring[] =
+	"MsisConfig(ap_a=None, flags=None)\n\n\
+	Pre-converted model switches and Ap array.\n\n\
+	Converts and checks `ap_a` and `flags` once, to be passed as `config`\n\
+	to the model functions instead of converting the lists on every call.\n\
+	This saves time when the same settings are used for many calls.\n\n\
+	Parameters\n\
+	----------\n\
+	ap_a: list of 7 floats, optional\n\
+		Same as for :func:`gtd7()`.\n\
+	flags: list of 24 int, optional\n\
+		Same as for :func:`gtd7()`, the default switches are\n\
+		0 for switch 0 and 1 for switches 1 to 23.\n\n\
+	Attributes\n\
+	----------\n\
+	ap_a: list of 7 floats or None\n\
+		The Ap array, None if not set.\n\
+	flags: list of 24 int\n\
+		The model switches.\n\
+	";
+
 /* Define PyInt_Check (python 2) also for python 3.
  * Improves python 2/3 compatibility. */
 #if PY_MAJOR_VERSION >= 3
@@ -185,6 +400,140 @@ static int list_to_flags(PyObject *fl_list, struct nrlmsise_flags *fl)
 	return 0;
 }
 
+typedef struct {
+	PyObject_HEAD
+	struct nrlmsise_flags flags;
+	struct ap_array ap_a;
+	int has_ap_a;
+} MsisConfig;
+
+static PyTypeObject MsisConfigType;
+
+static PyObject *MsisConfig_new(PyTypeObject *type, PyObject *args, PyObject *kwargs)
+{
+	struct nrlmsise_flags msis_flags = {
+		{0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1,
+		1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1}};
+	MsisConfig *self;
+
+	PyObject *ap_list = NULL, *flags_list = NULL;
+	static char *kwlist[] = {"ap_a", "flags", NULL};
+	if (!PyArg_ParseTupleAndKeywords(args, kwargs, "|OO", kwlist,
+				&ap_list, &flags_list)) {
+		return NULL;
+	}
+	if (ap_list == Py_None)
+		ap_list = NULL;
+	if (flags_list == Py_None)
+		flags_list = NULL;
+	if ((ap_list && !PyList_Check(ap_list))
+			|| (flags_list && !PyList_Check(flags_list))) {
+		PyErr_SetString(PyExc_TypeError, "ap_a and flags must be lists or None.");
+		return NULL;
+	}
+	self = (MsisConfig *) type->tp_alloc(type, 0);
+	if (!self)
+		return NULL;
+	self->flags = msis_flags;
+	if (ap_list) {
+		if (list_to_ap(ap_list, &self->ap_a) != 0)
+			goto fail;
+		self->has_ap_a = 1;
+	}
+	if (flags_list)
+		if (list_to_flags(flags_list, &self->flags) != 0)
+			goto fail;
+
+	return (PyObject *) self;
+
+fail:
+	Py_DECREF(self);
+	return NULL;
+}
+
+static PyObject *MsisConfig_get_ap_a(MsisConfig *self, void *closure)
+{
+	if (!self->has_ap_a)
+		Py_RETURN_NONE;
+	return Py_BuildValue("[ddddddd]",
+			self->ap_a.a[0], self->ap_a.a[1], self->ap_a.a[2],
+			self->ap_a.a[3], self->ap_a.a[4], self->ap_a.a[5],
+			self->ap_a.a[6]);
+}
+
+static PyObject *MsisConfig_get_flags(MsisConfig *self, void *closure)
+{
+	int i;
+	PyObject *fl_list = PyList_New(24);
+
+	if (!fl_list)
+		return NULL;
+	for (i = 0; i < 24; i++)
+		PyList_SET_ITEM(fl_list, i, Py_BuildValue("i", self->flags.switches[i]));
+	return fl_list;
+}
+
+/* Pickling support, recreates the object from its lists */
+static PyObject *MsisConfig_reduce(MsisConfig *self, PyObject *unused)
+{
+	PyObject *ap_a, *flags, *ret;
+
+	ap_a = MsisConfig_get_ap_a(self, NULL);
+	if (!ap_a)
+		return NULL;
+	flags = MsisConfig_get_flags(self, NULL);
+	if (!flags) {
+		Py_DECREF(ap_a);
+		return NULL;
+	}
+	ret = Py_BuildValue("O(NN)", Py_TYPE(self), ap_a, flags);
+	return ret;
+}
+
+static PyMethodDef MsisConfig_methods[] = {
+	{"__reduce__", (PyCFunction) MsisConfig_reduce, METH_NOARGS, NULL},
+	{NULL, NULL, 0, NULL}
+};
+
+static PyGetSetDef MsisConfig_getset[] = {
+	{"ap_a", (getter) MsisConfig_get_ap_a, NULL, "The Ap array, None if not set.", NULL},
+	{"flags", (getter) MsisConfig_get_flags, NULL, "The model switches.", NULL},
+	{NULL, NULL, NULL, NULL, NULL}
+};
+
+static PyTypeObject MsisConfigType = {
+	PyVarObject_HEAD_INIT(NULL, 0)
+	"nrlmsise00._nrlmsise00.MsisConfig",  /* tp_name */
+	sizeof(MsisConfig),                   /* tp_basicsize */
+};
+
+/* Sets the model switches and the Ap array either from `config`
+ * or from the python lists. All of them may be NULL. */
+static int get_config(PyObject *config, PyObject *ap_list, PyObject *flags_list,
+		struct nrlmsise_flags *fl, struct ap_array *ap_a)
+{
+	if (config) {
+		if (ap_list || flags_list) {
+			PyErr_SetString(PyExc_ValueError,
+				"config cannot be combined with ap_a or flags.");
+			return -1;
+		}
+		/* copy, the model functions write to the flags */
+		*fl = ((MsisConfig *) config)->flags;
+		*ap_a = ((MsisConfig *) config)->ap_a;
+		return 0;
+	}
+	if (ap_list)
+		if (list_to_ap(ap_list, ap_a) != 0)
+			return -1;
+
+	if (flags_list)
+		if (list_to_flags(flags_list, fl) != 0)
+			return -1;
+
+	return 0;
+}
+
 static PyObject *nrlmsise00_gtd7(PyObject *self, PyObject *args, PyObject *kwargs)
 {
 	struct nrlmsise_flags msis_flags = {
@@ -194,10 +543,10 @@ static PyObject *nrlmsise00_gtd7(PyObject *self, PyObject *args, PyObject *kwarg
 	struct nrlmsise_input msis_input;
 	struct ap_array ap_arr;
 
-	PyObject *ap_list = NULL, *flags_list = NULL;
+	PyObject *ap_list = NULL, *flags_list = NULL, *config = NULL;
 	static char *kwlist[] = {"year", "doy", "sec", "alt", "g_lat", "g_long",
-		"lst", "f107A", "f107", "ap", "ap_a", "flags", NULL};
-	if (!PyArg_ParseTupleAndKeywords(args, kwargs, "iidddddddd|O!O!", kwlist,
+		"lst", "f107A", "f107", "ap", "ap_a", "flags", "config", NULL};
+	if (!PyArg_ParseTupleAndKeywords(args, kwargs, "iidddddddd|O!O!O!", kwlist,
 				&msis_input.year,   /* year, currently ignored */
 				&msis_input.doy,    /* day of year */
 				&msis_input.sec,    /* seconds in day (UT) */
@@ -209,16 +558,12 @@ static PyObject *nrlmsise00_gtd7(PyObject *self, PyObject *args, PyObject *kwarg
 				&msis_input.f107,   /* daily F10.7 flux for previous day */
 				&msis_input.ap,     /* magnetic index(daily) */
 				&PyList_Type, &ap_list,
-				&PyList_Type, &flags_list)) {
+				&PyList_Type, &flags_list,
+				&MsisConfigType, &config)) {
 		return NULL;
 	}
-	if (ap_list)
-		if (list_to_ap(ap_list, &ap_arr) != 0)
-			return NULL;
-
-	if (flags_list)
-		if (list_to_flags(flags_list, &msis_flags) != 0)
-			return NULL;
+	if (get_config(config, ap_list, flags_list, &msis_flags, &ap_arr) != 0)
+		return NULL;
 
 	msis_input.ap_a = &ap_arr;
 
@@ -242,10 +587,10 @@ static PyObject *nrlmsise00_gtd7d(PyObject *self, PyObject *args, PyObject *kwar
 	struct nrlmsise_input msis_input;
 	struct ap_array ap_arr;
 
-	PyObject *ap_list = NULL, *flags_list = NULL;
+	PyObject *ap_list = NULL, *flags_list = NULL, *config = NULL;
 	static char *kwlist[] = {"year", "doy", "sec", "alt", "g_lat", "g_long",
-		"lst", "f107A", "f107", "ap", "ap_a", "flags", NULL};
-	if (!PyArg_ParseTupleAndKeywords(args, kwargs, "iidddddddd|O!O!", kwlist,
+		"lst", "f107A", "f107", "ap", "ap_a", "flags", "config", NULL};
+	if (!PyArg_ParseTupleAndKeywords(args, kwargs, "iidddddddd|O!O!O!", kwlist,
 				&msis_input.year,   /* year, currently ignored */
 				&msis_input.doy,    /* day of year */
 				&msis_input.sec,    /* seconds in day (UT) */
@@ -257,16 +602,12 @@ static PyObject *nrlmsise00_gtd7d(PyObject *self, PyObject *args, PyObject *kwar
 				&msis_input.f107,   /* daily F10.7 flux for previous day */
 				&msis_input.ap,     /* magnetic index(daily) */
 				&PyList_Type, &ap_list,
-				&PyList_Type, &flags_list)) {
+				&PyList_Type, &flags_list,
+				&MsisConfigType, &config)) {
 		return NULL;
 	}
-	if (ap_list)
-		if (list_to_ap(ap_list, &ap_arr) != 0)
-			return NULL;
-
-	if (flags_list)
-		if (list_to_flags(flags_list, &msis_flags) != 0)
-			return NULL;
+	if (get_config(config, ap_list, flags_list, &msis_flags, &ap_arr) != 0)
+		return NULL;
 
 	msis_input.ap_a = &ap_arr;
 
@@ -281,12 +622,999 @@ static PyObject *nrlmsise00_gtd7d(PyObject *self, PyObject *args, PyObject *kwar
 			msis_output.t[0], msis_output.t[1]);
 }
 
+static PyObject *nrlmsise00_ghp7(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+	struct nrlmsise_flags msis_flags = {
+		{0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1,
+		1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1}};
+	struct nrlmsise_output msis_output;
+	struct nrlmsise_input msis_input;
+	struct ap_array ap_arr;
+	double press;
+
+	PyObject *ap_list = NULL, *flags_list = NULL, *config = NULL;
+	static char *kwlist[] = {"year", "doy", "sec", "press", "g_lat", "g_long",
+		"lst", "f107A", "f107", "ap", "ap_a", "flags", "config", NULL};
+	if (!PyArg_ParseTupleAndKeywords(args, kwargs, "iidddddddd|O!O!O!", kwlist,
+				&msis_input.year,   /* year, currently ignored */
+				&msis_input.doy,    /* day of year */
+				&msis_input.sec,    /* seconds in day (UT) */
+				&press,             /* pressure level in millibar */
+				&msis_input.g_lat,  /* geodetic latitude */
+				&msis_input.g_long, /* geodetic longitude */
+				&msis_input.lst,    /* local apparent solar time (hours), see note below */
+				&msis_input.f107A,  /* 81 day average of F10.7 flux (centered on doy) */
+				&msis_input.f107,   /* daily F10.7 flux for previous day */
+				&msis_input.ap,     /* magnetic index(daily) */
+				&PyList_Type, &ap_list,
+				&PyList_Type, &flags_list,
+				&MsisConfigType, &config)) {
+		return NULL;
+	}
+	if (get_config(config, ap_list, flags_list, &msis_flags, &ap_arr) != 0)
+		return NULL;
+
+	msis_input.ap_a = &ap_arr;
+
+	Py_BEGIN_ALLOW_THREADS
+	ghp7(&msis_input, &msis_flags, &msis_output, press);
+	Py_END_ALLOW_THREADS
+
+	return Py_BuildValue("[ddddddddd][dd]d",
+			msis_output.d[0], msis_output.d[1], msis_output.d[2],
+			msis_output.d[3], msis_output.d[4], msis_output.d[5],
+			msis_output.d[6], msis_output.d[7], msis_output.d[8],
+			msis_output.t[0], msis_output.t[1],
+			msis_input.alt);
+}
+
+#define MSIS_NINPUTS 10
+#define MSIS_NOUTPUTS 11
+
+/* Acquires a C-contiguous float64 buffer of length `n` or 1.
+ * Sets `*step` to 1 or 0 accordingly, 0 indicating that the single
+ * value is used for all points. */
+static int get_input_buffer(PyObject *obj, Py_buffer *view, Py_ssize_t n,
+		Py_ssize_t *step)
+{
+	Py_ssize_t len;
+
+	if (PyObject_GetBuffer(obj, view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) != 0)
+		return -1;
+	if (view->itemsize != sizeof(double)
+			|| (view->format && strcmp(view->format, "d") != 0)) {
+		PyErr_SetString(PyExc_TypeError,
+			"input buffers must contain float64 values.");
+		PyBuffer_Release(view);
+		return -1;
+	}
+	len = view->len / view->itemsize;
+	if (len == n)
+		*step = 1;
+	else if (len == 1)
+		*step = 0;
+	else {
+		PyErr_SetString(PyExc_ValueError,
+			"input buffers must have the length of the output or length 1.");
+		PyBuffer_Release(view);
+		return -1;
+	}
+	return 0;
+}
+
+/* Gets the Ap arrays for `n` points from either a list of 7 values
+ * (stored in `ap_arr`, `*ap_view` is left unused) or from a C-contiguous
+ * float64 buffer of length 7 * `n` or 7, `*ap_step` is set to 7 or 0,
+ * and `*ap_view` needs to be released by the caller.
+ * Returns 1 if the buffer was acquired, 0 if not, and -1 on error. */
+static int get_ap_input(PyObject *ap_obj, PyObject *config, PyObject *flags_list,
+		struct nrlmsise_flags *fl, struct ap_array *ap_arr,
+		Py_buffer *ap_view, Py_ssize_t n, Py_ssize_t *ap_step)
+{
+	Py_ssize_t len;
+
+	if (!ap_obj || PyList_Check(ap_obj)) {
+		if (get_config(config, ap_obj, flags_list, fl, ap_arr) != 0)
+			return -1;
+		return 0;
+	}
+	/* per-point Ap arrays, may be combined with `config` */
+	if (get_config(config, NULL, flags_list, fl, ap_arr) != 0)
+		return -1;
+	if (PyObject_GetBuffer(ap_obj, ap_view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) != 0)
+		return -1;
+	len = ap_view->len / ap_view->itemsize;
+	if (ap_view->itemsize != sizeof(double)
+			|| (ap_view->format && strcmp(ap_view->format, "d") != 0)) {
+		PyErr_SetString(PyExc_TypeError,
+			"ap_a buffer must contain float64 values.");
+		PyBuffer_Release(ap_view);
+		return -1;
+	}
+	if (len == 7 * n)
+		*ap_step = 7;
+	else if (len == 7)
+		*ap_step = 0;
+	else {
+		PyErr_SetString(PyExc_ValueError,
+			"ap_a buffer must contain 7 values for each point or 7 values.");
+		PyBuffer_Release(ap_view);
+		return -1;
+	}
+	return 1;
+}
+
+/* Copies the Ap array of point `i` */
+#define SET_AP(ap_arr, ap_in, ap_step, i) \
+	do { \
+		int _k; \
+		for (_k = 0; _k < 7; _k++) \
+			(ap_arr).a[_k] = (ap_in)[(i) * (ap_step) + _k]; \
+	} while (0)
+
+/* Gets the output column indices from the sequence `obj` into `cols`,
+ * all `nmax` columns in order if `obj` is NULL or None.
+ * Returns the number of columns, or -1 on error. */
+static int get_outputs(PyObject *obj, int nmax, int *cols)
+{
+	PyObject *seq;
+	Py_ssize_t k, len;
+	long c;
+
+	if (!obj || obj == Py_None) {
+		for (k = 0; k < nmax; k++)
+			cols[k] = (int) k;
+		return nmax;
+	}
+	seq = PySequence_Fast(obj, "outputs must be a sequence of int.");
+	if (!seq)
+		return -1;
+	len = PySequence_Fast_GET_SIZE(seq);
+	if (len < 1 || len > nmax) {
+		PyErr_Format(PyExc_ValueError,
+			"outputs must contain between 1 and %d columns.", nmax);
+		Py_DECREF(seq);
+		return -1;
+	}
+	for (k = 0; k < len; k++) {
+		c = PyLong_AsLong(PySequence_Fast_GET_ITEM(seq, k));
+		if (c == -1 && PyErr_Occurred()) {
+			Py_DECREF(seq);
+			return -1;
+		}
+		if (c < 0 || c >= nmax) {
+			PyErr_Format(PyExc_ValueError,
+				"output columns must be between 0 and %d.", nmax - 1);
+			Py_DECREF(seq);
+			return -1;
+		}
+		cols[k] = (int) c;
+	}
+	Py_DECREF(seq);
+	return (int) len;
+}
+
+/* Output buffer with (row, block, column) strides in bytes,
+ * containing either float64 or float32 values. The rows can be
+ * split into two dimensions (rows / r1, r1) with strides s0 and s0b,
+ * the blocks are the altitudes of the profiles. */
+struct out_array {
+	char *buf;
+	Py_ssize_t rows, r1, s0, s0b, sk, s1;
+	int f32;
+};
+
+/* Acquires a writable float64 or float32 output buffer with rows of
+ * `nblocks` * `ncols` values, either C-contiguous, 2-D (rows,
+ * `nblocks` * `ncols`), 3-D (rows, `nblocks`, `ncols`), or 4-D
+ * (rows0, rows1, `nblocks`, `ncols`) with arbitrary strides,
+ * e.g. a strided view of a larger array. */
+static int get_block_buffer(PyObject *obj, Py_buffer *view, Py_ssize_t nblocks,
+		Py_ssize_t ncols, struct out_array *out)
+{
+	Py_ssize_t len, nrow = nblocks * ncols;
+
+	if (PyObject_GetBuffer(obj, view, PyBUF_RECORDS) != 0)
+		return -1;
+	if (!((view->itemsize == sizeof(double)
+				&& (!view->format || strcmp(view->format, "d") == 0))
+			|| (view->itemsize == sizeof(float)
+				&& view->format && strcmp(view->format, "f") == 0))) {
+		PyErr_SetString(PyExc_TypeError,
+			"output buffer must contain float64 or float32 values.");
+		PyBuffer_Release(view);
+		return -1;
+	}
+	out->buf = (char *) view->buf;
+	out->f32 = view->itemsize == sizeof(float);
+	out->r1 = 1;
+	out->s0b = 0;
+	if (view->ndim == 2 && view->shape[1] == nrow) {
+		out->rows = view->shape[0];
+		out->s0 = view->strides[0];
+		out->s1 = view->strides[1];
+		out->sk = ncols * out->s1;
+		return 0;
+	}
+	if (view->ndim == 3 && view->shape[1] == nblocks && view->shape[2] == ncols) {
+		out->rows = view->shape[0];
+		out->s0 = view->strides[0];
+		out->sk = view->strides[1];
+		out->s1 = view->strides[2];
+		return 0;
+	}
+	if (view->ndim == 4 && view->shape[2] == nblocks && view->shape[3] == ncols) {
+		out->rows = view->shape[0] * view->shape[1];
+		out->r1 = view->shape[1] > 0 ? view->shape[1] : 1;
+		out->s0 = view->strides[0];
+		out->s0b = view->strides[1];
+		out->sk = view->strides[2];
+		out->s1 = view->strides[3];
+		return 0;
+	}
+	len = view->len / view->itemsize;
+	if (len % nrow == 0 && PyBuffer_IsContiguous(view, 'C')) {
+		out->rows = len / nrow;
+		out->s0 = nrow * view->itemsize;
+		out->s1 = view->itemsize;
+		out->sk = ncols * view->itemsize;
+		return 0;
+	}
+	PyErr_Format(PyExc_ValueError,
+		"output buffer must be contiguous with a multiple of %zd values, "
+		"or 2-D with %zd columns.", nrow, nrow);
+	PyBuffer_Release(view);
+	return -1;
+}
+
+/* Output buffer with rows of `ncols` values, see `get_block_buffer()` */
+static int get_output_buffer(PyObject *obj, Py_buffer *view, Py_ssize_t ncols,
+		struct out_array *out)
+{
+	return get_block_buffer(obj, view, 1, ncols, out);
+}
+
+/* Start of row `i` of `out` */
+static char *out_row(struct out_array *out, Py_ssize_t i)
+{
+	return out->buf + (i / out->r1) * out->s0 + (i % out->r1) * out->s0b;
+}
+
+/* Writes the `n` values `vals` to row `i` of `out` */
+static void put_values(struct out_array *out, Py_ssize_t i,
+		const double *vals, int n)
+{
+	char *p = out_row(out, i);
+	int j;
+
+	if (out->f32)
+		for (j = 0; j < n; j++)
+			*(float *) (p + j * out->s1) = (float) vals[j];
+	else
+		for (j = 0; j < n; j++)
+			*(double *) (p + j * out->s1) = vals[j];
+}
+
+/* All output columns of `output` (and `alt` as column 11) */
+static void output_values(struct nrlmsise_output *output, double alt,
+		double *vals)
+{
+	int j;
+
+	for (j = 0; j < 9; j++)
+		vals[j] = output->d[j];
+	vals[9] = output->t[0];
+	vals[10] = output->t[1];
+	vals[11] = alt;
+}
+
+/* Writes the output columns `cols` of `output` (and `alt` as column 11)
+ * to block `k` of row `i` of `out`. */
+static void put_outputs(struct out_array *out, Py_ssize_t i, Py_ssize_t k,
+		struct nrlmsise_output *output, double alt, const int *cols, int ncols)
+{
+	double vals[MSIS_NOUTPUTS + 1];
+	char *p = out_row(out, i) + k * out->sk;
+	int j;
+
+	output_values(output, alt, vals);
+	if (out->f32)
+		for (j = 0; j < ncols; j++)
+			*(float *) (p + j * out->s1) = (float) vals[cols[j]];
+	else
+		for (j = 0; j < ncols; j++)
+			*(double *) (p + j * out->s1) = vals[cols[j]];
+}
+
+typedef void (*msis_model)(struct nrlmsise_input *, struct nrlmsise_flags *,
+		struct nrlmsise_output *);
+
+/* `ghp7()` with the same signature as `gtd7()`, `input->alt` contains
+ * the pressure level on entry and the altitude of that level on return. */
+static void ghp7_alt(struct nrlmsise_input *input, struct nrlmsise_flags *flags,
+		struct nrlmsise_output *output)
+{
+	ghp7(input, flags, output, input->alt);
+}
+
+/* Evaluates `model` for all points of the input buffers.
+ * With `with_alt` set, the 4th input contains the pressure levels
+ * and the altitudes are written as a 12th output column.
+ * For `gtd7()` (`drag` = 0) and `gtd7d()` (`drag` = 1), a selection of
+ * `outputs` skips the densities that are not needed, `drag` = -1
+ * evaluates the full model and only selects the columns. */
+static PyObject *msis_array(PyObject *args, PyObject *kwargs,
+		msis_model model, int with_alt, int drag)
+{
+	struct nrlmsise_flags msis_flags = {
+		{0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1,
+		1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1}};
+	struct nrlmsise_output msis_output;
+	struct nrlmsise_input msis_input;
+	struct ap_array ap_arr;
+	struct msis_profile prof;
+
+	PyObject *in_objs[MSIS_NINPUTS];
+	PyObject *out_obj = NULL, *ap_obj = NULL, *flags_list = NULL;
+	PyObject *config = NULL, *outputs = NULL;
+	Py_buffer in_bufs[MSIS_NINPUTS], out_buf, ap_buf;
+	Py_ssize_t steps[MSIS_NINPUTS], ap_step = 0;
+	const double *in[MSIS_NINPUTS];
+	const double *ap_in = NULL;
+	struct out_array out;
+	Py_ssize_t i, n;
+	int j, nacq = 0, have_ap = 0, ret = -1;
+	int cols[MSIS_NOUTPUTS + 1], nout, use_prof;
+	unsigned int mask;
+
+	static char *kwlist_alt[] = {"year", "doy", "sec", "alt", "g_lat", "g_long",
+		"lst", "f107A", "f107", "ap", "out", "ap_a", "flags", "config",
+		"outputs", NULL};
+	static char *kwlist_press[] = {"year", "doy", "sec", "press", "g_lat", "g_long",
+		"lst", "f107A", "f107", "ap", "out", "ap_a", "flags", "config",
+		"outputs", NULL};
+	char **kwlist = with_alt ? kwlist_press : kwlist_alt;
+	if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOOOOOOOOOO|OO!O!O", kwlist,
+				&in_objs[0], &in_objs[1], &in_objs[2], &in_objs[3],
+				&in_objs[4], &in_objs[5], &in_objs[6], &in_objs[7],
+				&in_objs[8], &in_objs[9], &out_obj,
+				&ap_obj,
+				&PyList_Type, &flags_list,
+				&MsisConfigType, &config,
+				&outputs)) {
+		return NULL;
+	}
+	nout = get_outputs(outputs, with_alt ? MSIS_NOUTPUTS + 1 : MSIS_NOUTPUTS, cols);
+	if (nout < 0)
+		return NULL;
+	/* the profile functions give the same results as `gtd7()` and
+	 * `gtd7d()` and skip the unneeded densities */
+	use_prof = drag >= 0 && outputs && outputs != Py_None;
+	mask = drag >= 0 ? msis_density_mask(cols, nout, drag) : MSIS_ALL_DENSITIES;
+	if (get_output_buffer(out_obj, &out_buf, nout, &out) != 0)
+		return NULL;
+	n = out.rows;
+
+	have_ap = get_ap_input(ap_obj, config, flags_list, &msis_flags, &ap_arr,
+			&ap_buf, n, &ap_step);
+	if (have_ap < 0)
+		goto cleanup;
+	if (have_ap)
+		ap_in = (const double *) ap_buf.buf;
+
+	for (nacq = 0; nacq < MSIS_NINPUTS; nacq++) {
+		if (get_input_buffer(in_objs[nacq], &in_bufs[nacq], n, &steps[nacq]) != 0)
+			goto cleanup;
+		in[nacq] = (const double *) in_bufs[nacq].buf;
+	}
+
+	msis_input.ap_a = &ap_arr;
+
+	Py_BEGIN_ALLOW_THREADS
+	for (i = 0; i < n; i++) {
+		msis_input.year = (int) in[0][i * steps[0]];
+		msis_input.doy = (int) in[1][i * steps[1]];
+		msis_input.sec = in[2][i * steps[2]];
+		msis_input.alt = in[3][i * steps[3]];
+		msis_input.g_lat = in[4][i * steps[4]];
+		msis_input.g_long = in[5][i * steps[5]];
+		msis_input.lst = in[6][i * steps[6]];
+		msis_input.f107A = in[7][i * steps[7]];
+		msis_input.f107 = in[8][i * steps[8]];
+		msis_input.ap = in[9][i * steps[9]];
+		if (ap_in)
+			SET_AP(ap_arr, ap_in, ap_step, i);
+		if (use_prof) {
+			msis_profile_init(&msis_input, &msis_flags, &prof,
+					msis_input.alt, mask);
+			msis_profile_eval(&prof, msis_input.alt, &msis_input, &msis_flags,
+					&msis_output, drag);
+		} else
+			model(&msis_input, &msis_flags, &msis_output);
+		put_outputs(&out, i, 0, &msis_output, msis_input.alt, cols, nout);
+	}
+	Py_END_ALLOW_THREADS
+
+	ret = 0;
+
+cleanup:
+	for (j = 0; j < nacq; j++)
+		PyBuffer_Release(&in_bufs[j]);
+	if (have_ap > 0)
+		PyBuffer_Release(&ap_buf);
+	PyBuffer_Release(&out_buf);
+	if (ret != 0)
+		return NULL;
+	Py_RETURN_NONE;
+}
+
+static PyObject *nrlmsise00_gtd7_array(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+	return msis_array(args, kwargs, gtd7, 0, 0);
+}
+
+static PyObject *nrlmsise00_gtd7d_array(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+	return msis_array(args, kwargs, gtd7d, 0, 1);
+}
+
+static PyObject *nrlmsise00_ghp7_array(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+	return msis_array(args, kwargs, ghp7_alt, 1, -1);
+}
+
+static PyObject *msis_profile_array(PyObject *args, PyObject *kwargs, int drag)
+{
+	struct nrlmsise_flags msis_flags = {
+		{0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1,
+		1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1}};
+	struct nrlmsise_output msis_output;
+	struct nrlmsise_input msis_input;
+	struct ap_array ap_arr;
+	struct msis_profile prof;
+
+	PyObject *in_objs[MSIS_NINPUTS - 1];
+	PyObject *alt_obj = NULL, *out_obj = NULL, *ap_obj = NULL, *flags_list = NULL;
+	PyObject *config = NULL, *outputs = NULL;
+	Py_buffer in_bufs[MSIS_NINPUTS - 1], alt_buf, out_buf, ap_buf;
+	Py_ssize_t steps[MSIS_NINPUTS - 1], ap_step = 0;
+	const double *in[MSIS_NINPUTS - 1];
+	const double *alt, *ap_in = NULL;
+	struct out_array out;
+	double zmin;
+	Py_ssize_t i, k, m, nalt;
+	int j, nacq = 0, have_alt = 0, have_ap = 0, ret = -1;
+	int cols[MSIS_NOUTPUTS], nout;
+	unsigned int mask;
+
+	static char *kwlist[] = {"year", "doy", "sec", "g_lat", "g_long",
+		"lst", "f107A", "f107", "ap", "alt", "out", "ap_a", "flags", "config",
+		"outputs", NULL};
+	if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOOOOOOOOOO|OO!O!O", kwlist,
+				&in_objs[0], &in_objs[1], &in_objs[2], &in_objs[3],
+				&in_objs[4], &in_objs[5], &in_objs[6], &in_objs[7],
+				&in_objs[8], &alt_obj, &out_obj,
+				&ap_obj,
+				&PyList_Type, &flags_list,
+				&MsisConfigType, &config,
+				&outputs)) {
+		return NULL;
+	}
+	nout = get_outputs(outputs, MSIS_NOUTPUTS, cols);
+	if (nout < 0)
+		return NULL;
+	mask = msis_density_mask(cols, nout, drag);
+	if (PyObject_GetBuffer(alt_obj, &alt_buf, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) != 0)
+		return NULL;
+	if (alt_buf.itemsize != sizeof(double)
+			|| (alt_buf.format && strcmp(alt_buf.format, "d") != 0)) {
+		PyErr_SetString(PyExc_TypeError,
+			"input buffers must contain float64 values.");
+		PyBuffer_Release(&alt_buf);
+		return NULL;
+	}
+	nalt = alt_buf.len / alt_buf.itemsize;
+	/* one row per profile */
+	if (nalt == 0) {
+		PyErr_SetString(PyExc_ValueError, "alt must not be empty.");
+		PyBuffer_Release(&alt_buf);
+		return NULL;
+	}
+	if (get_block_buffer(out_obj, &out_buf, nalt, nout, &out) != 0) {
+		PyBuffer_Release(&alt_buf);
+		return NULL;
+	}
+	have_alt = 1;
+	m = out.rows;
+
+	have_ap = get_ap_input(ap_obj, config, flags_list, &msis_flags, &ap_arr,
+			&ap_buf, m, &ap_step);
+	if (have_ap < 0)
+		goto cleanup;
+	if (have_ap)
+		ap_in = (const double *) ap_buf.buf;
+
+	for (nacq = 0; nacq < MSIS_NINPUTS - 1; nacq++) {
+		if (get_input_buffer(in_objs[nacq], &in_bufs[nacq], m, &steps[nacq]) != 0)
+			goto cleanup;
+		in[nacq] = (const double *) in_bufs[nacq].buf;
+	}
+	alt = (const double *) alt_buf.buf;
+	zmin = alt[0];
+	for (k = 1; k < nalt; k++)
+		if (alt[k] < zmin)
+			zmin = alt[k];
+
+	msis_input.ap_a = &ap_arr;
+
+	Py_BEGIN_ALLOW_THREADS
+	for (i = 0; i < m; i++) {
+		msis_input.year = (int) in[0][i * steps[0]];
+		msis_input.doy = (int) in[1][i * steps[1]];
+		msis_input.sec = in[2][i * steps[2]];
+		msis_input.g_lat = in[3][i * steps[3]];
+		msis_input.g_long = in[4][i * steps[4]];
+		msis_input.lst = in[5][i * steps[5]];
+		msis_input.f107A = in[6][i * steps[6]];
+		msis_input.f107 = in[7][i * steps[7]];
+		msis_input.ap = in[8][i * steps[8]];
+		if (ap_in)
+			SET_AP(ap_arr, ap_in, ap_step, i);
+		msis_profile_init(&msis_input, &msis_flags, &prof, zmin, mask);
+		for (k = 0; k < nalt; k++) {
+			msis_input.alt = alt[k];
+			msis_profile_eval(&prof, alt[k], &msis_input, &msis_flags,
+					&msis_output, drag);
+			put_outputs(&out, i, k, &msis_output, alt[k], cols, nout);
+		}
+	}
+	Py_END_ALLOW_THREADS
+
+	ret = 0;
+
+cleanup:
+	for (j = 0; j < nacq; j++)
+		PyBuffer_Release(&in_bufs[j]);
+	if (have_alt)
+		PyBuffer_Release(&alt_buf);
+	if (have_ap > 0)
+		PyBuffer_Release(&ap_buf);
+	PyBuffer_Release(&out_buf);
+	if (ret != 0)
+		return NULL;
+	Py_RETURN_NONE;
+}
+
+static PyObject *nrlmsise00_gtd7_profile_array(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+	return msis_profile_array(args, kwargs, 0);
+}
+
+static PyObject *nrlmsise00_gtd7d_profile_array(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+	return msis_profile_array(args, kwargs, 1);
+}
+
+/* Sets the model inputs from the values in the argument order */
+static void set_input(struct nrlmsise_input *input, const double *x)
+{
+	input->year = (int) x[0];
+	input->doy = (int) x[1];
+	input->sec = x[2];
+	input->alt = x[3];
+	input->g_lat = x[4];
+	input->g_long = x[5];
+	input->lst = x[6];
+	input->f107A = x[7];
+	input->f107 = x[8];
+	input->ap = x[9];
+}
+
+/* Gets the input indices `wrt` and their finite difference `steps`.
+ * Returns the number of inputs, or -1 on error. */
+static int get_jacobian_inputs(PyObject *wrt_obj, PyObject *steps_obj,
+		int *wrt, double *steps)
+{
+	PyObject *wrt_seq, *steps_seq;
+	Py_ssize_t k, len;
+	long c;
+	int ret = -1;
+
+	wrt_seq = PySequence_Fast(wrt_obj, "wrt must be a sequence of int.");
+	if (!wrt_seq)
+		return -1;
+	steps_seq = PySequence_Fast(steps_obj, "steps must be a sequence of float.");
+	if (!steps_seq) {
+		Py_DECREF(wrt_seq);
+		return -1;
+	}
+	len = PySequence_Fast_GET_SIZE(wrt_seq);
+	if (len < 1 || len > MSIS_NINPUTS - 3
+			|| PySequence_Fast_GET_SIZE(steps_seq) != len) {
+		PyErr_Format(PyExc_ValueError,
+			"wrt and steps must have the same length between 1 and %d.",
+			MSIS_NINPUTS - 3);
+		goto cleanup;
+	}
+	for (k = 0; k < len; k++) {
+		c = PyLong_AsLong(PySequence_Fast_GET_ITEM(wrt_seq, k));
+		if (c == -1 && PyErr_Occurred())
+			goto cleanup;
+		if (c < 3 || c >= MSIS_NINPUTS) {
+			PyErr_Format(PyExc_ValueError,
+				"wrt inputs must be between 3 and %d.", MSIS_NINPUTS - 1);
+			goto cleanup;
+		}
+		wrt[k] = (int) c;
+		steps[k] = PyFloat_AsDouble(PySequence_Fast_GET_ITEM(steps_seq, k));
+		if (steps[k] == -1. && PyErr_Occurred())
+			goto cleanup;
+		if (!(steps[k] > 0.)) {
+			PyErr_SetString(PyExc_ValueError, "steps must be positive.");
+			goto cleanup;
+		}
+	}
+	ret = (int) len;
+
+cleanup:
+	Py_DECREF(wrt_seq);
+	Py_DECREF(steps_seq);
+	return ret;
+}
+
+/* Evaluates `gtd7()` (`drag` = 0) or `gtd7d()` (`drag` = 1) and the
+ * central difference derivatives with respect to the inputs `wrt`. */
+static PyObject *msis_jacobian_array(PyObject *args, PyObject *kwargs, int drag)
+{
+	struct nrlmsise_flags msis_flags = {
+		{0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1,
+		1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1}};
+	struct nrlmsise_output msis_output;
+	struct nrlmsise_input msis_input;
+	struct ap_array ap_arr;
+	struct msis_profile prof, prof_d;
+
+	PyObject *in_objs[MSIS_NINPUTS];
+	PyObject *out_obj = NULL, *jac_obj = NULL, *wrt_obj = NULL, *steps_obj = NULL;
+	PyObject *ap_obj = NULL, *flags_list = NULL, *config = NULL, *outputs = NULL;
+	Py_buffer in_bufs[MSIS_NINPUTS], out_buf, jac_buf, ap_buf;
+	Py_ssize_t steps[MSIS_NINPUTS], ap_step = 0;
+	const double *in[MSIS_NINPUTS];
+	const double *ap_in = NULL;
+	struct out_array out, jac;
+	double hs[MSIS_NINPUTS - 3];
+	Py_ssize_t i, n;
+	int j, q, nacq = 0, have_jac = 0, have_ap = 0, ret = -1;
+	int cols[MSIS_NOUTPUTS], nout, wrt[MSIS_NINPUTS - 3], nwrt, alt_wrt = -1;
+	unsigned int mask;
+
+	static char *kwlist[] = {"year", "doy", "sec", "alt", "g_lat", "g_long",
+		"lst", "f107A", "f107", "ap", "out", "jac", "wrt", "steps",
+		"ap_a", "flags", "config", "outputs", NULL};
+	if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOOOOOOOOOOOOO|OO!O!O", kwlist,
+				&in_objs[0], &in_objs[1], &in_objs[2], &in_objs[3],
+				&in_objs[4], &in_objs[5], &in_objs[6], &in_objs[7],
+				&in_objs[8], &in_objs[9], &out_obj, &jac_obj,
+				&wrt_obj, &steps_obj,
+				&ap_obj,
+				&PyList_Type, &flags_list,
+				&MsisConfigType, &config,
+				&outputs)) {
+		return NULL;
+	}
+	nout = get_outputs(outputs, MSIS_NOUTPUTS, cols);
+	if (nout < 0)
+		return NULL;
+	nwrt = get_jacobian_inputs(wrt_obj, steps_obj, wrt, hs);
+	if (nwrt < 0)
+		return NULL;
+	for (q = 0; q < nwrt; q++)
+		if (wrt[q] == 3)
+			alt_wrt = q;
+	mask = msis_density_mask(cols, nout, drag);
+	if (get_output_buffer(out_obj, &out_buf, nout, &out) != 0)
+		return NULL;
+	n = out.rows;
+	if (get_output_buffer(jac_obj, &jac_buf, nout * nwrt, &jac) != 0)
+		goto cleanup;
+	have_jac = 1;
+	if (jac.rows != n) {
+		PyErr_SetString(PyExc_ValueError,
+			"jac must have the same number of points as out.");
+		goto cleanup;
+	}
+
+	have_ap = get_ap_input(ap_obj, config, flags_list, &msis_flags, &ap_arr,
+			&ap_buf, n, &ap_step);
+	if (have_ap < 0)
+		goto cleanup;
+	if (have_ap)
+		ap_in = (const double *) ap_buf.buf;
+
+	for (nacq = 0; nacq < MSIS_NINPUTS; nacq++) {
+		if (get_input_buffer(in_objs[nacq], &in_bufs[nacq], n, &steps[nacq]) != 0)
+			goto cleanup;
+		in[nacq] = (const double *) in_bufs[nacq].buf;
+	}
+
+	msis_input.ap_a = &ap_arr;
+
+	Py_BEGIN_ALLOW_THREADS
+	for (i = 0; i < n; i++) {
+		double x[MSIS_NINPUTS], xd[MSIS_NINPUTS];
+		double vp[MSIS_NOUTPUTS + 1], vm[MSIS_NOUTPUTS + 1];
+		double d[MSIS_NOUTPUTS * (MSIS_NINPUTS - 3)];
+		double zmin, h;
+		int s;
+
+		for (j = 0; j < MSIS_NINPUTS; j++)
+			x[j] = in[j][i * steps[j]];
+		if (ap_in)
+			SET_AP(ap_arr, ap_in, ap_step, i);
+		set_input(&msis_input, x);
+		zmin = alt_wrt >= 0 ? x[3] - hs[alt_wrt] : x[3];
+		msis_profile_init(&msis_input, &msis_flags, &prof, zmin, mask);
+		msis_profile_eval(&prof, x[3], &msis_input, &msis_flags,
+				&msis_output, drag);
+		put_outputs(&out, i, 0, &msis_output, x[3], cols, nout);
+
+		for (q = 0; q < nwrt; q++) {
+			h = hs[q];
+			for (s = 0; s < 2; s++) {
+				double *v = s ? vm : vp;
+				double dx = s ? -h : h;
+				if (wrt[q] == 3) {
+					/* same altitude-independent terms */
+					msis_input.alt = x[3] + dx;
+					msis_profile_eval(&prof, x[3] + dx, &msis_input,
+							&msis_flags, &msis_output, drag);
+				} else {
+					for (j = 0; j < MSIS_NINPUTS; j++)
+						xd[j] = x[j];
+					xd[wrt[q]] += dx;
+					/* at fixed universal time */
+					if (wrt[q] == 5)
+						xd[6] += dx / 15.;
+					set_input(&msis_input, xd);
+					msis_profile_init(&msis_input, &msis_flags, &prof_d,
+							x[3], mask);
+					msis_profile_eval(&prof_d, x[3], &msis_input,
+							&msis_flags, &msis_output, drag);
+				}
+				output_values(&msis_output, x[3], v);
+			}
+			for (j = 0; j < nout; j++)
+				d[j * nwrt + q] = (vp[cols[j]] - vm[cols[j]]) / (2. * h);
+		}
+		put_values(&jac, i, d, nout * nwrt);
+	}
+	Py_END_ALLOW_THREADS
+
+	ret = 0;
+
+cleanup:
+	for (j = 0; j < nacq; j++)
+		PyBuffer_Release(&in_bufs[j]);
+	if (have_ap > 0)
+		PyBuffer_Release(&ap_buf);
+	if (have_jac)
+		PyBuffer_Release(&jac_buf);
+	PyBuffer_Release(&out_buf);
+	if (ret != 0)
+		return NULL;
+	Py_RETURN_NONE;
+}
+
+static PyObject *nrlmsise00_gtd7_jacobian_array(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+	return msis_jacobian_array(args, kwargs, 0);
+}
+
+static PyObject *nrlmsise00_gtd7d_jacobian_array(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+	return msis_jacobian_array(args, kwargs, 1);
+}
+
+#define MSIS_TABLE_MAXDIM 10
+#define MSIS_TABLE_MAXOUT 16
+
+static PyObject *nrlmsise00_interp_table_array(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+	PyObject *xs_obj = NULL, *values_obj = NULL, *axes_obj = NULL, *out_obj = NULL;
+	PyObject *xs_seq = NULL, *axes_seq = NULL;
+	Py_buffer x_bufs[MSIS_TABLE_MAXDIM], ax_bufs[MSIS_TABLE_MAXDIM];
+	Py_buffer values_buf, out_buf;
+	const double *xs[MSIS_TABLE_MAXDIM], *axes[MSIS_TABLE_MAXDIM];
+	Py_ssize_t sizes[MSIS_TABLE_MAXDIM], strides[MSIS_TABLE_MAXDIM];
+	Py_ssize_t steps[MSIS_TABLE_MAXDIM];
+	/* interpolated dimensions */
+	int act[MSIS_TABLE_MAXDIM];
+	struct out_array out;
+	Py_ssize_t i, n, npts, ngrid = 1;
+	int d, k, ndim, nact = 0, nx = 0, nax = 0, f32;
+	int have_values = 0, have_out = 0, ret = -1;
+
+	static char *kwlist[] = {"xs", "values", "axes", "out", NULL};
+	if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOOO", kwlist,
+				&xs_obj, &values_obj, &axes_obj, &out_obj))
+		return NULL;
+	xs_seq = PySequence_Fast(xs_obj, "xs must be a sequence of buffers.");
+	if (!xs_seq)
+		return NULL;
+	axes_seq = PySequence_Fast(axes_obj, "axes must be a sequence of buffers.");
+	if (!axes_seq)
+		goto cleanup;
+	ndim = (int) PySequence_Fast_GET_SIZE(axes_seq);
+	if (ndim < 1 || ndim > MSIS_TABLE_MAXDIM
+			|| PySequence_Fast_GET_SIZE(xs_seq) != ndim) {
+		PyErr_Format(PyExc_ValueError,
+			"xs and axes must have the same length between 1 and %d.",
+			MSIS_TABLE_MAXDIM);
+		goto cleanup;
+	}
+	for (nax = 0; nax < ndim; nax++) {
+		if (PyObject_GetBuffer(PySequence_Fast_GET_ITEM(axes_seq, nax),
+				&ax_bufs[nax], PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) != 0)
+			goto cleanup;
+		if (ax_bufs[nax].itemsize != sizeof(double)
+				|| (ax_bufs[nax].format && strcmp(ax_bufs[nax].format, "d") != 0)
+				|| ax_bufs[nax].len == 0) {
+			PyErr_SetString(PyExc_TypeError,
+				"axes must be non-empty float64 buffers.");
+			nax++;
+			goto cleanup;
+		}
+		axes[nax] = (const double *) ax_bufs[nax].buf;
+		sizes[nax] = ax_bufs[nax].len / ax_bufs[nax].itemsize;
+		ngrid *= sizes[nax];
+	}
+
+	if (PyObject_GetBuffer(values_obj, &values_buf,
+				PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) != 0)
+		goto cleanup;
+	have_values = 1;
+	if (!((values_buf.itemsize == sizeof(double)
+				&& (!values_buf.format || strcmp(values_buf.format, "d") == 0))
+			|| (values_buf.itemsize == sizeof(float)
+				&& values_buf.format && strcmp(values_buf.format, "f") == 0))) {
+		PyErr_SetString(PyExc_TypeError,
+			"values must contain float64 or float32 values.");
+		goto cleanup;
+	}
+	f32 = values_buf.itemsize == sizeof(float);
+	n = values_buf.len / values_buf.itemsize;
+	if (n % ngrid != 0 || n / ngrid < 1 || n / ngrid > MSIS_TABLE_MAXOUT) {
+		PyErr_Format(PyExc_ValueError,
+			"values must contain between 1 and %d values per grid point.",
+			MSIS_TABLE_MAXOUT);
+		goto cleanup;
+	}
+	n /= ngrid;
+
+	if (get_output_buffer(out_obj, &out_buf, n, &out) != 0)
+		goto cleanup;
+	have_out = 1;
+	npts = out.rows;
+	for (nx = 0; nx < ndim; nx++) {
+		if (get_input_buffer(PySequence_Fast_GET_ITEM(xs_seq, nx),
+				&x_bufs[nx], npts, &steps[nx]) != 0)
+			goto cleanup;
+		xs[nx] = (const double *) x_bufs[nx].buf;
+	}
+
+	/* strides of the grid dimensions in units of grid points */
+	strides[ndim - 1] = 1;
+	for (d = ndim - 1; d > 0; d--)
+		strides[d - 1] = strides[d] * sizes[d];
+	for (d = 0; d < ndim; d++)
+		if (sizes[d] > 1)
+			act[nact++] = d;
+
+	Py_BEGIN_ALLOW_THREADS
+	for (i = 0; i < npts; i++) {
+		double w[MSIS_TABLE_MAXDIM], acc[MSIS_TABLE_MAXOUT];
+		double cw[1 << MSIS_TABLE_MAXDIM];
+		Py_ssize_t coff[1 << MSIS_TABLE_MAXDIM];
+		Py_ssize_t base = 0, c, nc, off;
+		int outside = 0;
+
+		for (k = 0; k < nact; k++) {
+			const double *ax = axes[act[k]];
+			Py_ssize_t lo = 0, hi = sizes[act[k]] - 1, mid;
+			double x = xs[act[k]][i * steps[act[k]]];
+			/* also true for NaN */
+			if (!(x >= ax[0] && x <= ax[hi])) {
+				outside = 1;
+				break;
+			}
+			/* last interval with ax[lo] <= x */
+			while (hi - lo > 1) {
+				mid = (lo + hi) / 2;
+				if (ax[mid] <= x)
+					lo = mid;
+				else
+					hi = mid;
+			}
+			w[k] = (x - ax[lo]) / (ax[lo + 1] - ax[lo]);
+			base += lo * strides[act[k]];
+		}
+		if (outside) {
+			for (k = 0; k < n; k++)
+				acc[k] = Py_NAN;
+			put_values(&out, i, acc, (int) n);
+			continue;
+		}
+		/* weights and offsets of the corners of the grid cell,
+		 * built up one dimension at a time */
+		nc = 1;
+		cw[0] = 1.;
+		coff[0] = base;
+		for (k = 0; k < nact; k++) {
+			for (c = 0; c < nc; c++) {
+				cw[nc + c] = cw[c] * w[k];
+				cw[c] *= 1. - w[k];
+				coff[nc + c] = coff[c] + strides[act[k]];
+			}
+			nc *= 2;
+		}
+		for (k = 0; k < n; k++)
+			acc[k] = 0.;
+		for (c = 0; c < nc; c++) {
+			off = coff[c] * n;
+			if (f32)
+				for (k = 0; k < n; k++)
+					acc[k] += cw[c] * ((const float *) values_buf.buf)[off + k];
+			else
+				for (k = 0; k < n; k++)
+					acc[k] += cw[c] * ((const double *) values_buf.buf)[off + k];
+		}
+		put_values(&out, i, acc, (int) n);
+	}
+	Py_END_ALLOW_THREADS
+
+	ret = 0;
+
+cleanup:
+	for (d = 0; d < nx; d++)
+		PyBuffer_Release(&x_bufs[d]);
+	for (d = 0; d < nax; d++)
+		PyBuffer_Release(&ax_bufs[d]);
+	if (have_values)
+		PyBuffer_Release(&values_buf);
+	if (have_out)
+		PyBuffer_Release(&out_buf);
+	Py_XDECREF(xs_seq);
+	Py_XDECREF(axes_seq);
+	if (ret != 0)
+		return NULL;
+	Py_RETURN_NONE;
+}
+
 static PyMethodDef nrlmsise00_methods[] = {
 	{"gtd7", (PyCFunction) nrlmsise00_gtd7, METH_VARARGS | METH_KEYWORDS, gtd7_docstring},
 	{"gtd7d", (PyCFunction) nrlmsise00_gtd7d, METH_VARARGS | METH_KEYWORDS, gtd7d_docstring},
+	{"ghp7", (PyCFunction) nrlmsise00_ghp7, METH_VARARGS | METH_KEYWORDS, ghp7_docstring},
+	{"gtd7_array", (PyCFunction) nrlmsise00_gtd7_array, METH_VARARGS | METH_KEYWORDS, gtd7_array_docstring},
+	{"gtd7d_array", (PyCFunction) nrlmsise00_gtd7d_array, METH_VARARGS | METH_KEYWORDS, gtd7d_array_docstring},
+	{"ghp7_array", (PyCFunction) nrlmsise00_ghp7_array, METH_VARARGS | METH_KEYWORDS, ghp7_array_docstring},
+	{"gtd7_profile_array", (PyCFunction) nrlmsise00_gtd7_profile_array, METH_VARARGS | METH_KEYWORDS, gtd7_profile_array_docstring},
+	{"gtd7d_profile_array", (PyCFunction) nrlmsise00_gtd7d_profile_array, METH_VARARGS | METH_KEYWORDS, gtd7d_profile_array_docstring},
+	{"gtd7_jacobian_array", (PyCFunction) nrlmsise00_gtd7_jacobian_array, METH_VARARGS | METH_KEYWORDS, gtd7_jacobian_array_docstring},
+	{"gtd7d_jacobian_array", (PyCFunction) nrlmsise00_gtd7d_jacobian_array, METH_VARARGS | METH_KEYWORDS, gtd7d_jacobian_array_docstring},
+	{"interp_table_array", (PyCFunction) nrlmsise00_interp_table_array, METH_VARARGS | METH_KEYWORDS, interp_table_array_docstring},
 	{NULL, NULL, 0, NULL}
 };
 
+static int init_config_type(void)
+{
+	MsisConfigType.tp_flags = Py_TPFLAGS_DEFAULT;
+	MsisConfigType.tp_doc = msis_config_docstring;
+	MsisConfigType.tp_new = MsisConfig_new;
+	MsisConfigType.tp_getset = MsisConfig_getset;
+	MsisConfigType.tp_methods = MsisConfig_methods;
+	return PyType_Ready(&MsisConfigType);
+}
+
 
 #if PY_MAJOR_VERSION >= 3
 
@@ -302,7 +1630,13 @@ static struct PyModuleDef nrlmsise00_module = {
 
 PyMODINIT_FUNC PyInit__nrlmsise00(void)
 {
+	if (init_config_type() != 0)
+		return NULL;
 	module = PyModule_Create(&nrlmsise00_module);
+	if (!module)
+		return NULL;
+	Py_INCREF(&MsisConfigType);
+	PyModule_AddObject(module, "MsisConfig", (PyObject *) &MsisConfigType);
 	return module;
 }
 
@@ -310,7 +1644,13 @@ PyMODINIT_FUNC PyInit__nrlmsise00(void)
 
 PyMODINIT_FUNC init_nrlmsise00(void)
 {
+	if (init_config_type() != 0)
+		return;
 	module = Py_InitModule("_nrlmsise00", nrlmsise00_methods);
+	if (!module)
+		return;
+	Py_INCREF(&MsisConfigType);
+	PyModule_AddObject(module, "MsisConfig", (PyObject *) &MsisConfigType);
 }
 
 #endif
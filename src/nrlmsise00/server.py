@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8
+#
+# Copyright (c) 2019 Stefan Bender
+#
+# This file is part of pynrlmsise00.
+# pynrlmsise00 is free software: you can redistribute it or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+# See accompanying LICENSE file or http://www.gnu.org/licenses/gpl-2.0.html.
+"""Model server batching concurrent requests (Python 3.7+)
+
+A small asyncio HTTP server, listening on TCP or a Unix socket,
+for several clients sharing one model instance. The points of the
+requests arriving within `max_delay` seconds (or until `max_batch`
+points are collected) are evaluated together with a single call of
+:func:`gtd7_flat()` or :func:`gtd7d_flat()` in a worker thread,
+and the results are sent back to each client.
+
+Endpoints:
+
+``POST /gtd7``, ``POST /gtd7d``
+	JSON object with the arguments of :func:`gtd7()`, "year", "doy", "sec",
+	"alt", "g_lat", "g_long", "f107A", "f107", "ap", and optionally "lst"
+	(default: sec / 3600 + g_long / 15), as numbers or (broadcastable) lists.
+	Returns a JSON object with the densities "d" and temperatures "t",
+	of the shape of the broadcasted inputs.
+``GET /stats``
+	The numbers of requests, points, and batches evaluated so far.
+
+Run ``python -m nrlmsise00.server --help`` for the command line options.
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+import numpy as np
+
+from .core import gtd7_flat, gtd7d_flat
+
+__all__ = ["MsisBatcher", "MsisServer", "main"]
+
+# the request fields, in the order of the `gtd7()` arguments
+INPUT_FIELDS = [
+	"year", "doy", "sec", "alt", "g_lat", "g_long", "lst", "f107A", "f107", "ap",
+]
+
+_REASONS = {
+	200: "OK", 400: "Bad Request", 404: "Not Found",
+	405: "Method Not Allowed", 500: "Internal Server Error",
+}
+
+
+class MsisBatcher(object):
+	"""Collects points from concurrent callers into batched evaluations
+
+	Parameters
+	----------
+	func: callable
+		The batched model function, :func:`gtd7_flat()` or :func:`gtd7d_flat()`.
+	max_batch: int, optional, default 4096
+		The maximum number of points evaluated at once. Requests are not
+		split, a single larger request is evaluated as one batch.
+	max_delay: float, optional, default 0.002
+		The time in seconds to wait for more points after the first point
+		of a batch has arrived. With 0, only the points that arrived while
+		the previous batch was evaluated are batched.
+	flags: list of 24 int, optional
+		The model switches, used for all points.
+	n_threads: int, optional
+		Number of threads for each batch, see :func:`gtd7_flat()`.
+	executor: concurrent.futures.Executor, optional
+		Runs the evaluations, default: the event loop's default executor.
+	"""
+	def __init__(self, func, max_batch=4096, max_delay=0.002,
+			flags=None, n_threads=None, executor=None):
+		if max_batch < 1:
+			raise ValueError("max_batch must be positive.")
+		if max_delay < 0:
+			raise ValueError("max_delay must not be negative.")
+		self.func = func
+		self.max_batch = int(max_batch)
+		self.max_delay = float(max_delay)
+		self.flags = flags
+		self.n_threads = n_threads
+		self.executor = executor
+		self.requests = 0
+		self.points = 0
+		self.batches = 0
+		self._queue = None
+		self._task = None
+
+	async def evaluate(self, x):
+		"""Model outputs (n, 11) for the inputs `x` (n, 10)
+
+		The rows of `x` are the arguments of :func:`gtd7()` as listed
+		in `INPUT_FIELDS`.
+		"""
+		loop = asyncio.get_running_loop()
+		if self._task is None or self._task.done():
+			self._queue = asyncio.Queue()
+			self._task = loop.create_task(self._collect())
+		fut = loop.create_future()
+		self._queue.put_nowait((x, fut))
+		return await fut
+
+	async def _collect(self):
+		loop = asyncio.get_running_loop()
+		queue = self._queue
+		while True:
+			batch = [await queue.get()]
+			n = len(batch[0][0])
+			deadline = loop.time() + self.max_delay
+			while n < self.max_batch:
+				if queue.empty():
+					timeout = deadline - loop.time()
+					if timeout <= 0:
+						break
+					try:
+						item = await asyncio.wait_for(queue.get(), timeout)
+					except asyncio.TimeoutError:
+						break
+				else:
+					item = queue.get_nowait()
+				batch.append(item)
+				n += len(item[0])
+			# callers that gave up in the meantime
+			batch = [(x, fut) for x, fut in batch if not fut.done()]
+			if not batch:
+				continue
+			x = np.concatenate([b[0] for b in batch])
+			try:
+				out = await loop.run_in_executor(self.executor, self._evaluate, x)
+			except Exception as e:
+				for _, fut in batch:
+					if not fut.done():
+						fut.set_exception(e)
+				continue
+			self.requests += len(batch)
+			self.points += len(x)
+			self.batches += 1
+			i0 = 0
+			for _x, fut in batch:
+				if not fut.done():
+					fut.set_result(out[i0:i0 + len(_x)])
+				i0 += len(_x)
+
+	def _evaluate(self, x):
+		return self.func(*x.T, flags=self.flags, n_threads=self.n_threads)
+
+	async def close(self):
+		"""Stops collecting, pending callers are cancelled"""
+		if self._task is not None:
+			self._task.cancel()
+			try:
+				await self._task
+			except asyncio.CancelledError:
+				pass
+			while not self._queue.empty():
+				self._queue.get_nowait()[1].cancel()
+			self._task = None
+
+
+class _BadRequest(ValueError):
+	"""Invalid request from the client, answered with status 400"""
+	pass
+
+
+def _parse_inputs(body):
+	"""Inputs (n, 10) and their broadcasted shape from the JSON `body`
+
+	Raises :class:`_BadRequest` for invalid requests.
+	"""
+	try:
+		req = json.loads(body.decode("utf-8"))
+	except ValueError as e:
+		raise _BadRequest("Invalid JSON: {0}".format(e))
+	if not isinstance(req, dict):
+		raise _BadRequest("The request must be a JSON object.")
+	missing = [f for f in INPUT_FIELDS if f != "lst" and f not in req]
+	if missing:
+		raise _BadRequest("Missing fields {0}.".format(missing))
+	try:
+		args = [
+			np.asarray(req[f], dtype=np.float64)
+			for f in INPUT_FIELDS if f != "lst"
+		]
+		args = list(np.broadcast_arrays(*args))
+		shape = args[0].shape
+		if "lst" in req:
+			lst = np.broadcast_to(np.asarray(req["lst"], dtype=np.float64), shape)
+		else:
+			lst = None
+	except (TypeError, ValueError) as e:
+		raise _BadRequest("Invalid inputs: {0}".format(e))
+	if lst is None:
+		lst = args[2] / 3600. + args[5] / 15.
+	x = np.stack(args[:6] + [lst] + args[6:], axis=-1)
+	return x.reshape(-1, len(INPUT_FIELDS)), shape
+
+
+class MsisServer(object):
+	"""HTTP server batching the requests of concurrent clients
+
+	Parameters
+	----------
+	max_batch, max_delay, flags, n_threads, executor:
+		See :class:`MsisBatcher`, used for each of the methods.
+
+	Examples
+	--------
+	In a coroutine:
+
+	>>> server = MsisServer(max_delay=0.001)  # doctest: +SKIP
+	>>> await server.start(port=8080)  # doctest: +SKIP
+	>>> await server.serve_forever()  # doctest: +SKIP
+	"""
+	def __init__(self, max_batch=4096, max_delay=0.002,
+			flags=None, n_threads=None, executor=None):
+		kwargs = dict(
+			max_batch=max_batch, max_delay=max_delay,
+			flags=flags, n_threads=n_threads, executor=executor,
+		)
+		self.batchers = {
+			"gtd7": MsisBatcher(gtd7_flat, **kwargs),
+			"gtd7d": MsisBatcher(gtd7d_flat, **kwargs),
+		}
+		self.server = None
+
+	async def start(self, host="127.0.0.1", port=8080, path=None):
+		"""Starts listening on `host`:`port`, or on the Unix socket `path`
+
+		Returns
+		-------
+		server: asyncio.AbstractServer
+		"""
+		if path is not None:
+			self.server = await asyncio.start_unix_server(self._handle, path=path)
+		else:
+			self.server = await asyncio.start_server(self._handle, host, port)
+		return self.server
+
+	async def serve_forever(self):
+		await self.server.serve_forever()
+
+	async def close(self):
+		"""Stops the server and the batchers"""
+		if self.server is not None:
+			self.server.close()
+			await self.server.wait_closed()
+		for batcher in self.batchers.values():
+			await batcher.close()
+
+	def stats(self):
+		"""Numbers of requests, points, and batches for each method"""
+		return {
+			name: {"requests": b.requests, "points": b.points, "batches": b.batches}
+			for name, b in self.batchers.items()
+		}
+
+	async def _respond(self, method, target, body):
+		name = target.split("?")[0].strip("/")
+		if name == "stats":
+			if method != "GET":
+				return 405, {"error": "Use GET for /stats."}
+			return 200, self.stats()
+		if name not in self.batchers:
+			return 404, {"error": "Unknown endpoint /{0}.".format(name)}
+		if method != "POST":
+			return 405, {"error": "Use POST for /{0}.".format(name)}
+		try:
+			x, shape = _parse_inputs(body)
+		except _BadRequest as e:
+			return 400, {"error": str(e)}
+		out = await self.batchers[name].evaluate(x)
+		out = out.reshape(shape + (11,))
+		return 200, {"d": out[..., :9].tolist(), "t": out[..., 9:].tolist()}
+
+	async def _handle(self, reader, writer):
+		try:
+			while True:
+				line = await reader.readline()
+				if not line.strip():
+					break
+				try:
+					method, target, version = line.decode("latin-1").split()
+				except ValueError:
+					method, target, version = "", "", "HTTP/1.0"
+				headers = {}
+				while True:
+					h = await reader.readline()
+					if not h.strip():
+						break
+					k, _, v = h.decode("latin-1").partition(":")
+					headers[k.strip().lower()] = v.strip()
+				try:
+					length = int(headers.get("content-length", 0))
+					if length < 0:
+						raise ValueError(length)
+				except ValueError:
+					# the body cannot be skipped, answer and close
+					length = None
+				body = b"" if length is None else await reader.readexactly(length)
+				if not method:
+					status, payload = 400, {"error": "Malformed request line."}
+				elif length is None:
+					status, payload = 400, {"error": "Invalid Content-Length."}
+				else:
+					try:
+						status, payload = await self._respond(method, target, body)
+					except Exception as e:
+						status, payload = 500, {"error": str(e)}
+				keep_alive = (
+					length is not None
+					and version == "HTTP/1.1"
+					and headers.get("connection", "").lower() != "close"
+				)
+				data = json.dumps(payload).encode("utf-8")
+				writer.write((
+					"HTTP/1.1 {0} {1}\r\n"
+					"Content-Type: application/json\r\n"
+					"Content-Length: {2}\r\n"
+					"Connection: {3}\r\n\r\n"
+				).format(
+					status, _REASONS[status], len(data),
+					"keep-alive" if keep_alive else "close",
+				).encode("latin-1") + data)
+				await writer.drain()
+				if not keep_alive:
+					break
+		except (ConnectionError, asyncio.IncompleteReadError):
+			pass
+		finally:
+			writer.close()
+
+
+async def _serve(args):
+	server = MsisServer(
+		max_batch=args.max_batch, max_delay=args.max_delay,
+		n_threads=args.n_threads,
+	)
+	srv = await server.start(host=args.host, port=args.port, path=args.unix)
+	addr = args.unix or "http://{0}:{1}".format(*srv.sockets[0].getsockname()[:2])
+	print("Serving on {0}".format(addr), flush=True)
+	try:
+		await server.serve_forever()
+	finally:
+		await server.close()
+
+
+def main(argv=None):
+	"""Command line interface ``python -m nrlmsise00.server``"""
+	parser = argparse.ArgumentParser(
+		prog="python -m nrlmsise00.server",
+		description="NRLMSISE-00 model server batching concurrent requests.",
+	)
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument(
+		"--port", type=int, default=8080, help="TCP port, 0 for any free port",
+	)
+	parser.add_argument("--unix", help="listen on this Unix socket instead")
+	parser.add_argument(
+		"--max-batch", type=int, default=4096,
+		help="maximum number of points per batch (default: %(default)s)",
+	)
+	parser.add_argument(
+		"--max-delay", type=float, default=0.002,
+		help="seconds to wait for more points (default: %(default)s)",
+	)
+	parser.add_argument(
+		"-j", "--threads", type=int, dest="n_threads",
+		help="number of threads per batch, 0 for all CPUs",
+	)
+	args = parser.parse_args(argv)
+	try:
+		asyncio.run(_serve(args))
+	except KeyboardInterrupt:
+		pass
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
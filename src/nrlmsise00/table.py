@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8
+#
+# Copyright (c) 2019 Stefan Bender
+#
+# This file is part of pynrlmsise00.
+# pynrlmsise00 is free software: you can redistribute it or modify it
+# under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 2.
+# See accompanying LICENSE file or http://www.gnu.org/licenses/gpl-2.0.html.
+"""Pre-calculated NRLMSISE-00 tables for fast approximate evaluation
+
+The model output is calculated once on a grid of altitude, latitude,
+local solar time, day of year, and solar and geomagnetic indices,
+and interpolated (multi-)linearly in between. The densities are
+interpolated logarithmically.
+"""
+from __future__ import absolute_import, division, print_function
+
+from collections import OrderedDict
+import json
+import os
+
+import numpy as np
+
+from ._nrlmsise00 import interp_table_array as _interp_table_array
+from .core import _OUTPUT_NAMES, _check_num_threads, _output_columns, _run_threaded
+from .core import gtd7_flat, gtd7d_flat, gtd7_profile, gtd7d_profile
+
+__all__ = ["MsisTable", "DEFAULT_AXES"]
+
+# grid axes in the order of the table dimensions, except "alt",
+# which is the last dimension (before the outputs)
+AXES = ["lat", "lst", "doy", "f107", "f107a", "ap", "alt"]
+
+DEFAULT_AXES = OrderedDict([
+	("lat", np.linspace(-90., 90., 10)),
+	("lst", np.linspace(0., 24., 9)),
+	("doy", np.linspace(1., 366., 9).round()),
+	("f107", np.linspace(60., 260., 5)),
+	("f107a", np.linspace(60., 260., 5)),
+	("ap", np.array([0., 7., 20., 50., 150., 400.])),
+	("alt", np.arange(100., 1001., 25.)),
+])
+
+_VALUES_FILE = "values.npy"
+_META_FILE = "table.json"
+
+
+class MsisTable(object):
+	"""Interpolation table of the NRLMSISE-00 model
+
+	Created with :meth:`build()` or :meth:`load()`, and evaluated
+	by calling the instance with the grid coordinates, see
+	:meth:`__call__()`.
+
+	The table contains the model output at longitude 0 with the
+	universal time equal to the local solar time, such that the
+	longitude and universal time dependencies that are not resolved
+	by the grid contribute to the interpolation error,
+	see :meth:`error()`.
+
+	Parameters
+	----------
+	axes: dict
+		The grid axes "lat", "lst", "doy", "f107", "f107a", "ap", "alt",
+		increasing 1-D arrays.
+	values: numpy.ndarray
+		The tabulated values with shape (lat, lst, doy, f107, f107a, ap,
+		alt, len(outputs)), the logarithm of the densities and
+		the temperatures.
+	outputs: list of str
+		The names of the tabulated outputs, see :func:`gtd7_flat()`.
+	method: str, optional, default "gtd7"
+		The model function used for the table, "gtd7" or "gtd7d".
+	"""
+	def __init__(self, axes, values, outputs, method="gtd7"):
+		self.axes = OrderedDict(
+			(a, np.asarray(axes[a], dtype=np.float64)) for a in AXES
+		)
+		self.values = values
+		self.outputs = list(outputs)
+		self.method = method
+		shape = tuple(ax.size for ax in self.axes.values()) + (len(self.outputs),)
+		if values.shape != shape:
+			raise ValueError(
+				"values must have the shape {0}, got {1}.".format(shape, values.shape)
+			)
+		self._cols = _output_columns(self.outputs)
+		self._log = np.array([c < 9 for c in self._cols])
+
+	@classmethod
+	def build(
+		cls, outputs=("rho", "Talt"), method="gtd7",
+		dtype=np.float32, n_threads=None, **axes
+	):
+		"""Calculates the table on the given grid
+
+		Parameters
+		----------
+		outputs: list of str, optional
+			Names of the outputs to tabulate, see :func:`gtd7_flat()`,
+			default: ("rho", "Talt").
+		method: str, optional, default "gtd7"
+			Use "gtd7d" to include anomalous oxygen in the total
+			mass density.
+		dtype: numpy.dtype, optional, default numpy.float32
+			The type of the tabulated values.
+		n_threads: int, optional
+			Number of threads, see :func:`gtd7_flat()`.
+		lat, lst, doy, f107, f107a, ap, alt: array_like, optional
+			The grid axes, increasing 1-D arrays, the defaults are in
+			:data:`DEFAULT_AXES`. The days of year are rounded to
+			integers, as used by the model. Axes with a single value
+			are used for all inputs.
+
+		Returns
+		-------
+		table: MsisTable
+		"""
+		unknown = set(axes) - set(AXES)
+		if unknown:
+			raise TypeError("Unknown axes {0}.".format(sorted(unknown)))
+		axs = OrderedDict()
+		for a in AXES:
+			ax = np.atleast_1d(np.asarray(axes.get(a, DEFAULT_AXES[a]), dtype=np.float64))
+			if a == "doy":
+				ax = ax.round()
+			if ax.ndim != 1 or np.any(np.diff(ax) <= 0.):
+				raise ValueError("The {0} axis must be increasing and 1-D.".format(a))
+			axs[a] = ax
+		cols = _output_columns(list(outputs))
+		outputs = [_OUTPUT_NAMES[c] for c in cols]
+
+		# horizontal coordinates broadcast against each other
+		hor = [
+			axs[a].reshape((-1,) + (1,) * (len(AXES) - 2 - i))
+			for i, a in enumerate(AXES[:-1])
+		]
+		lat, lst, doy, f107, f107a, ap = hor
+		profile_func = gtd7d_profile if method == "gtd7d" else gtd7_profile
+		values = profile_func(
+			2009, doy, lst * 3600., lat, 0., lst, f107a, f107, ap, axs["alt"],
+			outputs=cols, n_threads=n_threads,
+		)
+		log = np.array([c < 9 for c in cols])
+		values[..., log] = np.log(
+			np.maximum(values[..., log], np.finfo(np.float32).tiny)
+		)
+		return cls(axs, values.astype(dtype), outputs, method=method)
+
+	@classmethod
+	def load(cls, path, mmap_mode="r"):
+		"""Loads a table saved with :meth:`save()`
+
+		Parameters
+		----------
+		path: str or path-like
+			The directory of the table.
+		mmap_mode: str or None, optional, default "r"
+			Memory-map the values, see :func:`numpy.load()`,
+			set to `None` to load them into memory.
+
+		Returns
+		-------
+		table: MsisTable
+		"""
+		with open(os.path.join(path, _META_FILE)) as f:
+			meta = json.load(f)
+		values = np.load(os.path.join(path, _VALUES_FILE), mmap_mode=mmap_mode)
+		return cls(meta["axes"], values, meta["outputs"], method=meta["method"])
+
+	def save(self, path):
+		"""Saves the table to the directory `path`
+
+		The values are stored as :mod:`numpy` ".npy" file, which can
+		be memory-mapped when loading, the axes and outputs in a
+		JSON file.
+		"""
+		if not os.path.isdir(path):
+			os.makedirs(path)
+		np.save(os.path.join(path, _VALUES_FILE), np.asarray(self.values))
+		meta = {
+			"axes": OrderedDict((a, ax.tolist()) for a, ax in self.axes.items()),
+			"outputs": self.outputs,
+			"method": self.method,
+		}
+		with open(os.path.join(path, _META_FILE), "w") as f:
+			json.dump(meta, f)
+
+	@property
+	def nbytes(self):
+		"""Size of the tabulated values in bytes"""
+		return self.values.nbytes
+
+	def __call__(self, alt, lat, lst, doy, f107, f107a, ap, n_threads=None):
+		"""Interpolates the tabulated outputs
+
+		The inputs are broadcast against each other, the local solar
+		time is taken modulo 24 h. Points outside of the grid are `nan`.
+
+		Parameters
+		----------
+		alt, lat, lst, doy, f107, f107a, ap: float or array_like
+			Altitude in [km], latitude in [°N], local solar time in [h],
+			day of year, the f10.7 flux of the previous day,
+			the 81-day average f10.7 flux, and the daily Ap index.
+		n_threads: int, optional
+			Number of threads, see :func:`gtd7_flat()`.
+
+		Returns
+		-------
+		output: numpy.ndarray (..., len(outputs))
+			The interpolated outputs as float64, in the order of
+			`outputs`, with the same units as :func:`gtd7_flat()`.
+		"""
+		inputs = dict(
+			alt=alt, lat=lat, lst=np.mod(lst, 24.), doy=doy,
+			f107=f107, f107a=f107a, ap=ap,
+		)
+		xs = [np.asarray(inputs[a], dtype=np.float64) for a in AXES]
+		shape = np.broadcast(*xs).shape
+		# single values are used for all points
+		xs = [
+			x.reshape(1) if x.size == 1
+			else np.ascontiguousarray(np.broadcast_to(x, shape).reshape(-1))
+			for x in xs
+		]
+		values = self.values
+		if values.dtype not in (np.float32, np.float64):
+			values = values.astype(np.float64)
+		axes = list(self.axes.values())
+
+		def _interp(*xs, **kwargs):
+			_interp_table_array(xs, values, axes, **kwargs)
+
+		out = np.empty((int(np.prod(shape)), len(self.outputs)))
+		_run_threaded(
+			_interp, xs, out, _check_num_threads(n_threads),
+		)
+		out[:, self._log] = np.exp(out[:, self._log])
+		return out.reshape(shape + (len(self.outputs),))
+
+	def error(self, n=10000, seed=None, n_threads=None):
+		"""Interpolation error compared to the model
+
+		Evaluates the table and the model at `n` random points
+		uniformly distributed within the grid, with random longitudes
+		and universal times.
+
+		Parameters
+		----------
+		n: int, optional, default 10000
+			The number of points.
+		seed: int, optional
+			Seed for the random number generator.
+		n_threads: int, optional
+			Number of threads for the model, see :func:`gtd7_flat()`.
+
+		Returns
+		-------
+		errors: dict
+			The maximum and root-mean-square relative errors
+			of each output as ``{output: {"max": ..., "rms": ...}}``,
+			excluding points where the model output is invalid.
+		"""
+		rng = np.random.RandomState(seed)
+		x = OrderedDict(
+			(a, rng.uniform(ax[0], ax[-1], size=n)) for a, ax in self.axes.items()
+		)
+		x["doy"] = x["doy"].round()
+		sec = rng.uniform(0., 86400., size=n)
+		# longitudes matching the local solar times
+		lon = np.mod((x["lst"] - sec / 3600.) * 15. + 180., 360.) - 180.
+
+		flat_func = gtd7d_flat if self.method == "gtd7d" else gtd7_flat
+		exact = flat_func(
+			2009, x["doy"], sec, x["alt"], x["lat"], lon, x["lst"],
+			x["f107a"], x["f107"], x["ap"],
+			outputs=self._cols, n_threads=n_threads,
+		)
+		approx = self(**x)
+		with np.errstate(divide="ignore", invalid="ignore"):
+			rel = np.abs(approx / exact - 1.)
+		# the model itself fails in some cases, e.g. for very large Ap
+		# around 110 km, these points are ignored
+		rel[~np.isfinite(exact) | (exact <= 0.)] = np.nan
+		return OrderedDict(
+			(o, {
+				"max": float(np.nanmax(rel[:, i])),
+				"rms": float(np.sqrt(np.nanmean(rel[:, i]**2))),
+			})
+			for i, o in enumerate(self.outputs)
+		)
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8
+import sys
+
+# the coroutine modules are Python 3.7+ syntax
+collect_ignore = []
+if sys.version_info < (3, 7):
+	collect_ignore += ["test_aio.py", "test_server.py"]
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import numpy as np
+import pytest
+
+from nrlmsise00 import msise_flat
+from nrlmsise00.aio import amsise_4d, amsise_flat
+
+TIMES = (
+	np.datetime64("2009-06-21T08:03:20")
+	+ np.arange(20) * np.timedelta64(1, "h")
+)
+ALTS = np.linspace(100., 800., 30)[:, None]
+
+
+@pytest.mark.parametrize(
+	"args, kwargs", [
+		((TIMES, ALTS, 60., -70.), {}),
+		((TIMES, ALTS, 60., -70.), {"outputs": ["rho", "Talt"], "method": "gtd7d"}),
+		((TIMES[0], 400., 60., -70.), {"lst": 16.}),
+		((TIMES, ALTS, 60., -70.), {
+			"ap_a": np.linspace(1., 20., 30 * 7).reshape(30, 1, 7),
+			"flags": [0] + [1] * 8 + [-1] + [1] * 14,
+			"dtype": np.float32,
+		}),
+	]
+)
+def test_amsise_flat(args, kwargs):
+	expected = msise_flat(*(args + (150., 150., 4.)), **kwargs)
+	output = asyncio.run(
+		amsise_flat(*(args + (150., 150., 4.)), chunk_size=50, **kwargs)
+	)
+	assert output.dtype == expected.dtype
+	np.testing.assert_equal(output, expected)
+
+
+def test_amsise_flat_cancel():
+	started = threading.Event()
+	release = threading.Event()
+	calls = []
+
+	class _Executor(ThreadPoolExecutor):
+		def submit(self, fn, *args, **kwargs):
+			def _blocked():
+				calls.append(fn)
+				started.set()
+				release.wait()
+				return fn(*args, **kwargs)
+			return super(_Executor, self).submit(_blocked)
+
+	async def _run(executor):
+		task = asyncio.ensure_future(amsise_flat(
+			TIMES, ALTS, 60., -70., 150., 150., 4.,
+			chunk_size=20, executor=executor,
+		))
+		# the other tasks keep running
+		await asyncio.get_running_loop().run_in_executor(None, started.wait)
+		assert not task.done()
+		task.cancel()
+		release.set()
+		with pytest.raises(asyncio.CancelledError):
+			await task
+
+	with _Executor(1) as executor:
+		asyncio.run(_run(executor))
+	# only the time conversion was started
+	assert len(calls) == 1
+
+
+def test_amsise_4d():
+	pytest.importorskip("xarray")
+	from nrlmsise00.dataset import msise_4d
+
+	args = (
+		[np.datetime64("2009-06-21T08:03:20"), np.datetime64("2009-12-21T16:03:20")],
+		[400., 200., 100.], [60., 30., 0., -30., -60.], [-70., 0., 70.],
+		150., 150., 4.,
+	)
+	expected = msise_4d(*args)
+	output = asyncio.run(amsise_4d(*args, chunk_size=10))
+	assert output.identical(expected)
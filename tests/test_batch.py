@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8
+import numpy as np
+import pytest
+
+from nrlmsise00 import msise_flat
+from nrlmsise00.batch import main, msise_file
+
+N = 25
+
+
+@pytest.fixture(scope="module")
+def records():
+	rng = np.random.RandomState(0)
+	times = (
+		np.datetime64("2009-06-21T08:03:20")
+		+ rng.randint(0, 86400 * 30, N).astype("timedelta64[s]")
+	)
+	return dict(
+		time=times,
+		alt=rng.uniform(100., 800., N),
+		lat=rng.uniform(-90., 90., N),
+		lon=rng.uniform(-180., 180., N),
+		f107a=rng.uniform(70., 200., N),
+		f107=rng.uniform(70., 200., N),
+		ap=rng.uniform(0., 100., N),
+	)
+
+
+def _expected(records, outputs=None):
+	return msise_flat(
+		records["time"], records["alt"], records["lat"], records["lon"],
+		records["f107a"], records["f107"], records["ap"], outputs=outputs,
+	)
+
+
+def test_csv(records, tmp_path):
+	pd = pytest.importorskip("pandas")
+	infile = str(tmp_path / "in.csv")
+	outfile = str(tmp_path / "out.csv")
+	df = pd.DataFrame(records)
+	df["time"] = df["time"].dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+	df.to_csv(infile, index=False)
+	nrows = msise_file(infile, outfile, chunksize=7, keep=["time", "alt"])
+	assert nrows == N
+	out = pd.read_csv(outfile)
+	assert list(out.columns[:3]) == ["time", "alt", "He"]
+	np.testing.assert_allclose(out.iloc[:, 2:].to_numpy(), _expected(records))
+	# command line, constant indices
+	assert main([
+		infile, outfile, "--chunksize", "10", "--outputs", "rho,Talt",
+		"--f107a", "150", "--f107", "150", "--ap", "4",
+	]) == 0
+	out = pd.read_csv(outfile)
+	assert list(out.columns) == ["rho", "Talt"]
+
+
+def test_npy(records, tmp_path):
+	infile = str(tmp_path / "in.npy")
+	outfile = str(tmp_path / "out.npy")
+	secs = (records["time"] - np.datetime64("1970-01-01")) / np.timedelta64(1, "s")
+	np.save(infile, np.stack(
+		[secs] + [records[c] for c in ["alt", "lat", "lon", "f107a", "f107", "ap"]],
+		axis=-1,
+	))
+	assert msise_file(infile, outfile, chunksize=10, outputs=["O", "rho"]) == N
+	out = np.load(outfile)
+	assert out.dtype.names == ("O", "rho")
+	np.testing.assert_allclose(
+		np.stack([out["O"], out["rho"]], axis=-1),
+		_expected(records, outputs=["O", "rho"]),
+	)
+
+
+def test_parquet(records, tmp_path):
+	pytest.importorskip("pyarrow")
+	pd = pytest.importorskip("pandas")
+	infile = str(tmp_path / "in.parquet")
+	outfile = str(tmp_path / "out.parquet")
+	pd.DataFrame(records).to_parquet(infile)
+	assert msise_file(infile, outfile, chunksize=8, keep=["time"]) == N
+	out = pd.read_parquet(outfile)
+	assert out.shape == (N, 12)
+	np.testing.assert_allclose(out.iloc[:, 1:].to_numpy(), _expected(records))
+
+
+def test_invalid(tmp_path):
+	infile = str(tmp_path / "in.npy")
+	np.save(infile, np.zeros((3, 2)))
+	with pytest.raises(ValueError):
+		msise_file(infile, str(tmp_path / "out.txt.xyz"))
+	with pytest.raises(ValueError):
+		msise_file(infile, str(tmp_path / "out.npy"))
+	with pytest.raises(SystemExit):
+		main([infile, str(tmp_path / "out.npy")])
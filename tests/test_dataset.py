@@ -2,6 +2,7 @@
 # vim:fileencoding=utf-8
 import datetime as dt
 import numpy as np
+import pandas as pd
 import pytest
 
 try:
@@ -87,6 +88,27 @@ def test_lst(lon, lst, lst_expected):
 	np.testing.assert_allclose(ds.lst.values, lst_expected)
 
 
+def test_lst_apparent():
+	times = [dt.datetime(2009, 2, 11, 8, 0, 0, 500000), dt.datetime(2009, 11, 3, 16)]
+	args = (times, [400, 200], [60, -60], [-70., 0., 70.], 150, 150, 4)
+	ds = msise_4d(*args)
+	# mean local solar time, including the microseconds
+	np.testing.assert_allclose(
+		ds.lst.values,
+		np.array([8. + 0.5 / 3600., 16.])[:, None] + np.array([-70., 0., 70.]) / 15.,
+	)
+	ds_app = msise_4d(*args, lst="apparent")
+	assert ds_app.lst.attrs["long_name"] == "Apparent Local Solar Time"
+	# equation of time, about -14 min and +16 min
+	np.testing.assert_allclose(
+		(ds_app.lst - ds.lst).values * 60.,
+		np.array([[-14.2] * 3, [16.4] * 3]), atol=0.5,
+	)
+	expected = msise_4d(*args, lst=ds_app.lst.values)
+	np.testing.assert_allclose(ds_app.Talt.values, expected.Talt.values)
+	assert np.any(ds_app.Talt.values != ds.Talt.values)
+
+
 def test_nd_raise():
 	with pytest.raises(ValueError, match=r"Only scalars and up to 1-D .*"):
 		msise_4d(
@@ -99,3 +121,238 @@ def test_nd_raise():
 			150,  # f107
 			4,    # ap
 		)
+
+
+def test_pressure():
+	press = [100., 1., 1e-3]
+	ds = msise_4d(
+		dt.datetime(2009, 6, 21, 8, 3, 20),
+		press,
+		[60, 0, -60],  # g_lat
+		[-70, 0., 70.],  # g_long
+		150,    # f107A
+		150,    # f107
+		4,      # ap
+		pressure=True,
+	)
+	assert ds.Talt.dims == ("time", "press", "lat", "lon")
+	assert ds.alt.dims == ("time", "press", "lat", "lon")
+	np.testing.assert_allclose(ds.press.values, press)
+	# altitudes increase with decreasing pressure
+	assert np.all(ds.alt.diff("press") > 0.)
+	with pytest.raises(ValueError):
+		msise_4d(
+			dt.datetime(2009, 6, 21, 8, 3, 20), press, 60, -70,
+			150, 150, 4,
+			method="gtd7d", pressure=True,
+		)
+
+
+@pytest.mark.parametrize("pressure", [False, True])
+def test_outputs(pressure):
+	args = (
+		dt.datetime(2009, 6, 21, 8, 3, 20),
+		[100., 1e-3] if pressure else [50., 100., 400.],
+		[60, 0, -60],  # g_lat
+		[-70, 0., 70.],  # g_long
+		150, 150, 4,
+	)
+	ds = msise_4d(*args, pressure=pressure, outputs=["rho", "Talt"])
+	assert set(ds.data_vars) == set(
+		["rho", "Talt", "lst", "Ap", "f107", "f107a"] + (["alt"] if pressure else [])
+	)
+	ds_all = msise_4d(*args, pressure=pressure)
+	assert ds.identical(ds_all[list(ds.data_vars)])
+	ds32 = msise_4d(*args, pressure=pressure, outputs=["rho"], dtype=np.float32)
+	assert ds32.rho.dtype == np.float32
+	np.testing.assert_equal(ds32.rho.values, ds.rho.values.astype(np.float32))
+	with pytest.raises(ValueError):
+		msise_4d(*args, outputs=["rho", "T"])
+
+
+def test_sw_indices(monkeypatch):
+	from nrlmsise00.dataset import core
+	from spaceweather import sw_daily
+
+	times = [dt.datetime(2009, 6, 21, 8, 3, 20), dt.datetime(2015, 3, 17, 23)]
+	ds = msise_4d(times, 400, 60, -70)
+	# the same values as from the data frame
+	sw = sw_daily()
+	days = [pd.Timestamp(t).floor("D") for t in times]
+	np.testing.assert_equal(ds.Ap.values, sw.loc[days, "Apavg"].values)
+	np.testing.assert_equal(ds.f107a.values, sw.loc[days, "f107_81ctr_obs"].values)
+	np.testing.assert_equal(
+		ds.f107.values,
+		sw.loc[[d - pd.Timedelta("1d") for d in days], "f107_obs"].values,
+	)
+	# the cached table is used as long as the files are unchanged
+	def _fail():
+		raise AssertionError("sw_daily() should not be called")
+	monkeypatch.setattr(core, "sw_daily", _fail)
+	msise_4d(times, 400, 60, -70)
+	with pytest.raises(KeyError):
+		msise_4d(dt.datetime(1900, 1, 1), 400, 60, -70)
+
+
+def test_ap_a():
+	from nrlmsise00 import ap_a_3h
+	from spaceweather import ap_kp_3h
+
+	times = [dt.datetime(2003, 10, 29, 12), dt.datetime(2003, 10, 30, 21)]
+	flags = [0] + [1] * 23
+	flags[9] = -1
+	# assembled from the 3-hourly indices
+	ds = msise_4d(times, [200, 400], 60, -70, flags=flags)
+	sw3h = ap_kp_3h()
+	ap_a = ap_a_3h(np.array(times, dtype="datetime64[s]"), sw3h.index, sw3h.Ap)
+	ds2 = msise_4d(times, [200, 400], 60, -70, ap_a=ap_a, flags=flags)
+	np.testing.assert_equal(ds.rho.values, ds2.rho.values)
+	# differs from using the same ap for both times
+	ds3 = msise_4d(times, [200, 400], 60, -70, ap_a=ap_a[0], flags=flags)
+	np.testing.assert_equal(ds.rho.values[0], ds3.rho.values[0])
+	assert np.all(ds.rho.values[1] != ds3.rho.values[1])
+	with pytest.raises(ValueError):
+		msise_4d(times, [200, 400], 60, -70, ap_a=np.ones((3, 7)), flags=flags)
+
+
+@pytest.mark.parametrize(
+	"alt, kwargs", [
+		([400, 200, 100, 50, 0], {}),
+		([400, 200, 100], {"method": "gtd7d"}),
+		([100., 1., 1e-3], {"pressure": True}),
+	]
+)
+@pytest.mark.parametrize("chunks", [{"time": 2, "lat": 2, "lon": 3}, (1, 2, 3, 2)])
+def test_chunks(alt, kwargs, chunks):
+	pytest.importorskip("dask")
+	args = (
+		[dt.datetime(2009, 6, 21, 8), dt.datetime(2009, 12, 21, 16)] * 2,
+		alt,
+		[60, 30, 0, -30, -60],  # g_lat
+		[-70, 0., 70., 140.],  # g_long
+	)
+	ds = msise_4d(*args, **kwargs)
+	ds_lazy = msise_4d(*args, chunks=chunks, **kwargs)
+	assert ds_lazy.rho.chunks is not None
+	assert ds_lazy.rho.attrs == ds.rho.attrs
+	assert ds_lazy.compute().identical(ds)
+
+
+@pytest.mark.parametrize("pressure", [False, True])
+def test_contiguous(pressure):
+	from nrlmsise00 import ghp7_flat, msise_flat
+
+	times = pd.date_range("2009-06-21", periods=3, freq="5h")
+	alts = [100., 1e-3] if pressure else [100., 200., 400.]
+	lats = [-30., 0., 30., 60.]
+	lons = [0., 90., 180., 270., 300.]
+	ds = msise_4d(times, alts, lats, lons, pressure=pressure, dtype=np.float32)
+	# each variable is a contiguous part of a single output array
+	base = ds.Talt.values.base
+	assert base is not None and base.flags.c_contiguous
+	for v in ["He", "rho", "Talt"] + (["alt"] if pressure else []):
+		assert ds[v].values.flags.c_contiguous
+		assert ds[v].values.base is base
+		assert ds[v].dtype == np.float32
+	tt = times.to_numpy()[:, None, None, None]
+	aa = np.array(alts)[None, :, None, None]
+	la = np.array(lats)[None, None, :, None]
+	lo = np.array(lons)[None, None, None, :]
+	if pressure:
+		from nrlmsise00.core import _time_inputs
+		year, doy, sec, lst = _time_inputs(tt, lo)
+		expected = ghp7_flat(
+			year, doy, sec, aa, la, lo, lst,
+			ds.f107a.values[:, None, None, None], ds.f107.values[:, None, None, None],
+			ds.Ap.values[:, None, None, None],
+		)
+		np.testing.assert_allclose(ds.alt.values, expected[..., 11], rtol=1e-6)
+	else:
+		expected = msise_flat(
+			tt, aa, la, lo,
+			ds.f107a.values[:, None, None, None], ds.f107.values[:, None, None, None],
+			ds.Ap.values[:, None, None, None],
+		)
+	np.testing.assert_allclose(ds.rho.values, expected[..., 5], rtol=1e-6)
+	np.testing.assert_allclose(ds.Talt.values, expected[..., 10], rtol=1e-6)
+
+
+@pytest.mark.parametrize(
+	"name, module", [("msis.zarr", "zarr"), ("msis.nc", "netCDF4")]
+)
+@pytest.mark.parametrize("pressure", [False, True])
+def test_to_store(tmp_path, name, module, pressure):
+	pytest.importorskip(module)
+	import xarray as xr
+	from nrlmsise00.dataset import msise_4d_to_store
+
+	args = (
+		pd.date_range("2009-06-21", periods=7, freq="37min"),
+		[100., 1e-3] if pressure else [100., 300.],
+		[-30., 0., 30.],  # g_lat
+		[0., 90., 180., 270.],  # g_long
+	)
+	path = str(tmp_path / name)
+	msise_4d_to_store(path, *args, pressure=pressure, time_block=3)
+	if module == "zarr":
+		ds = xr.open_zarr(path).load()
+	else:
+		ds = xr.load_dataset(path)
+	assert ds.identical(msise_4d(*args, pressure=pressure))
+
+
+@pytest.mark.parametrize("method", ["gtd7", "gtd7d"])
+def test_track(method):
+	from nrlmsise00.dataset import msise_track
+
+	times = pd.date_range("2009-06-21", periods=5, freq="7h")
+	alts = [100., 200., 300., 400., 500.]
+	lats = [-60., -30., 0., 30., 60.]
+	lons = [-120., -60., 0., 60., 120.]
+	ds = msise_track(times, alts, lats, lons, method=method)
+	assert ds.rho.dims == ("time",)
+	np.testing.assert_equal(ds.alt.values, alts)
+	for i in range(5):
+		ds4 = msise_4d(times[i], alts[i], lats[i], lons[i], method=method)
+		for v in ["rho", "Talt", "lst", "Ap", "f107", "f107a"]:
+			np.testing.assert_allclose(ds[v][i], ds4[v].squeeze(), rtol=1e-12)
+	ds = msise_track(
+		times, 400., 60., lons, 150., 150., 4., lst=16., outputs=["Talt"],
+	)
+	assert list(ds.data_vars) == ["Talt", "lst", "Ap", "f107", "f107a"]
+	np.testing.assert_equal(ds.lst.values, 16.)
+	with pytest.raises(ValueError):
+		msise_track(times, alts[:3], lats, lons)
+
+
+
+@pytest.mark.parametrize("pressure", [False, True])
+def test_processes(pressure):
+	args = (
+		["2009-06-21 08:03:20", "2009-12-21 16:03:20"],
+		[1e-3, 1e-5] if pressure else [100., 200., 400.],
+		np.linspace(-80., 80., 5),
+		np.linspace(-180., 150., 12),
+	)
+	ds = msise_4d(*args, pressure=pressure, outputs=["rho", "Talt"], n_jobs=3)
+	assert ds.identical(
+		msise_4d(*args, pressure=pressure, outputs=["rho", "Talt"])
+	)
+	with pytest.raises(ValueError):
+		msise_4d(*args, chunks={"time": 1}, n_jobs=2)
+
+
+def test_instrument():
+	from nrlmsise00.instrument import record
+
+	with record() as rec:
+		msise_4d(
+			"2009-06-21 08:03:20", [200., 400.], [-30., 30.], [0., 90., 180.],
+			outputs=["rho", "Talt"],
+		)
+	assert list(rec.stages) == [
+		"msise_4d.time", "msise_4d.indices", "msise_4d.lst",
+		"gtd7_profile_array", "msise_4d.model", "msise_4d.dataset",
+	]
+	assert rec.stages["msise_4d.model"]["evaluations"] == 12
+	assert rec.stages["msise_4d.model"]["nbytes"] == 12 * 2 * 8
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 # vim:fileencoding=utf-8
 import os
+import pickle
+import threading
 
 import datetime as dt
 import numpy as np
@@ -225,3 +227,614 @@ def test_py_invalid_types():
 		ds, ts = msise.msise_model(*STD_INPUT_PY, ap_a=list(range(6)) + ["6"])
 	with pytest.raises(ValueError):
 		ds, ts = msise.msise_model(*STD_INPUT_PY, flags=list(range(23)) + [24.])
+
+
+def test_py_gtd7_flat():
+	# standard flags
+	flags = [0] + [1] * 23
+	inputs = np.array([STD_INPUT_C[:] for _ in range(15)], dtype=float)
+	# update input arrays with values to test
+	inputs[1][1] = 81  # doy
+	inputs[2][2] = 75000  # sec
+	inputs[2][3] = 1000  # alt
+	inputs[3][3] = 100  # alt
+	inputs[10][3] = 0  # alt
+	inputs[11][3] = 10  # alt
+	inputs[12][3] = 30  # alt
+	inputs[13][3] = 50  # alt
+	inputs[14][3] = 70  # alt
+	inputs[4][4] = 0  # g_lat
+	inputs[5][5] = 0  # g_long
+	inputs[6][6] = 4  # lst
+	inputs[7][7] = 70  # f107A
+	inputs[8][8] = 180  # f107
+	inputs[9][9] = 40  # ap
+	# MSIS test outputs from the documentation
+	test_file = os.path.join(
+			os.path.realpath(os.path.dirname(__file__)),
+			"msis_testoutput.txt")
+	test_output = np.genfromtxt(test_file)
+
+	output = msise.gtd7_flat(*inputs.T, flags=flags)
+	np.testing.assert_allclose(output, test_output[:15], rtol=1e-6)
+	# the high ap tests
+	flags[9] = -1
+	inp = STD_INPUT_C[:]
+	inp[3] = [400, 100]  # alt
+	output = msise.gtd7_flat(*inp, ap_a=[100.] * 7, flags=flags)
+	np.testing.assert_allclose(output, test_output[15:], rtol=1e-6)
+
+
+def test_py_gtd7_flat_broadcast():
+	alts = np.array([100., 200., 400.])
+	lats = np.array([-60., 0., 60.])
+	inp = STD_INPUT_C[:]
+	inp[3] = alts[:, None]
+	inp[4] = lats[None, :]
+	output = msise.gtd7d_flat(*inp)
+	assert output.shape == (3, 3, 11)
+	for i, alt in enumerate(alts):
+		for j, lat in enumerate(lats):
+			inp[3] = alt
+			inp[4] = lat
+			ds, ts = msise._nrlmsise00.gtd7d(*inp)
+			np.testing.assert_equal(output[i, j], ds + ts)
+
+
+def test_c_array_invalid():
+	ins = [np.array([v], dtype=float) for v in STD_INPUT_C]
+	# wrong output length
+	with pytest.raises(ValueError):
+		msise._nrlmsise00.gtd7_array(*ins, out=np.empty(12))
+	# wrong input length
+	ins[3] = np.array([100., 200.])
+	with pytest.raises(ValueError):
+		msise._nrlmsise00.gtd7_array(*ins, out=np.empty(33))
+	# wrong input type
+	ins[3] = np.array([100], dtype=np.int32)
+	with pytest.raises(TypeError):
+		msise._nrlmsise00.gtd7_array(*ins, out=np.empty(11))
+
+
+def test_c_threads():
+	# compares many concurrent evaluations to the serial results
+	n_threads = 16
+	rng = np.random.RandomState(42)
+	alts = [rng.uniform(0., 1000., 2000) for _ in range(n_threads)]
+	lats = [rng.uniform(-90., 90., 2000) for _ in range(n_threads)]
+	inp = STD_INPUT_C[:]
+	expected = []
+	for alt, lat in zip(alts, lats):
+		inp[3] = alt
+		inp[4] = lat
+		expected.append(msise.gtd7_flat(*inp))
+
+	results = [None] * n_threads
+
+	def _run(i):
+		_inp = STD_INPUT_C[:]
+		_inp[3] = alts[i]
+		_inp[4] = lats[i]
+		results[i] = [msise.gtd7_flat(*_inp) for _ in range(5)]
+
+	threads = [threading.Thread(target=_run, args=(i,)) for i in range(n_threads)]
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	for res, exp in zip(results, expected):
+		for r in res:
+			np.testing.assert_array_equal(r, exp)
+
+
+def test_env_num_threads(monkeypatch):
+	from multiprocessing import cpu_count
+	from nrlmsise00.core import _env_num_threads
+
+	monkeypatch.delenv("NRLMSISE00_NUM_THREADS", raising=False)
+	assert _env_num_threads() == 1
+	monkeypatch.setenv("NRLMSISE00_NUM_THREADS", "3")
+	assert _env_num_threads() == 3
+	monkeypatch.setenv("NRLMSISE00_NUM_THREADS", "-1")
+	assert _env_num_threads() == cpu_count()
+	for value in ["", "auto"]:
+		monkeypatch.setenv("NRLMSISE00_NUM_THREADS", value)
+		with pytest.warns(RuntimeWarning):
+			assert _env_num_threads() == 1
+
+
+@pytest.mark.parametrize("n_threads", [1, 3, 0])
+def test_py_gtd7_flat_threads(n_threads):
+	alts = np.linspace(0., 1000., 5001)
+	inp = STD_INPUT_C[:]
+	inp[3] = alts
+	expected = msise.gtd7_flat(*inp, n_threads=1)
+	output = msise.gtd7_flat(*inp, n_threads=n_threads)
+	np.testing.assert_array_equal(output, expected)
+	# global default
+	old = msise.set_num_threads(n_threads)
+	try:
+		assert msise.get_num_threads() == n_threads
+		output = msise.gtd7_flat(*inp)
+	finally:
+		msise.set_num_threads(old)
+	np.testing.assert_array_equal(output, expected)
+
+
+def test_py_ghp7_flat():
+	press = np.array([1000., 100., 1., 1e-3, 1e-6])  # [mbar]
+	inp = STD_INPUT_C[:]
+	inp[3] = press
+	output = msise.ghp7_flat(*inp)
+	assert output.shape == (5, 12)
+	# the same as calling `gtd7()` at the altitudes of the levels
+	for out, p in zip(output, press):
+		inp[3] = p
+		ds, ts, alt = msise._nrlmsise00.ghp7(*inp)
+		np.testing.assert_equal(out, ds + ts + [alt])
+		inp[3] = alt
+		ds, ts = msise._nrlmsise00.gtd7(*inp)
+		np.testing.assert_allclose(out[:11], ds + ts)
+		# pressure from the ideal gas law, n * k_B * T, in [mbar]
+		n = np.sum(ds[:5] + ds[6:8])
+		np.testing.assert_allclose(n * 1.3806e-19 * ts[1], p, rtol=1e-3)
+
+
+def test_py_msise_flat_times():
+	times = [
+		dt.datetime(2009, 6, 21, 8, 3, 20),
+		dt.datetime(2009, 3, 22, 8, 3, 20),
+		dt.datetime(2009, 6, 21, 20, 50, 0, 500000),
+		dt.datetime(1969, 12, 31, 23, 0, 0),
+	]
+	expected = msise.msise_flat(times, *STD_INPUT_PY[1:])
+	# numpy datetime64
+	times64 = np.array(times, dtype="datetime64[ns]")
+	output = msise.msise_flat(times64, *STD_INPUT_PY[1:])
+	np.testing.assert_allclose(output, expected, rtol=1e-12)
+	# seconds since 1970-01-01
+	epochs = (times64 - np.datetime64("1970-01-01")) / np.timedelta64(1, "s")
+	output = msise.msise_flat(epochs, *STD_INPUT_PY[1:])
+	np.testing.assert_allclose(output, expected, rtol=1e-12)
+
+
+def test_py_msise_flat_processes():
+	from concurrent.futures import ThreadPoolExecutor
+
+	times = (
+		np.datetime64("2009-06-21T08:03:20")
+		+ np.arange(20) * np.timedelta64(1, "h")
+	)
+	alts = np.linspace(100., 800., 30)[:, None]
+	expected = msise.msise_flat(times, alts, *STD_INPUT_PY[2:])
+	output = msise.msise_flat(times, alts, *STD_INPUT_PY[2:], n_jobs=2)
+	np.testing.assert_equal(output, expected)
+	# separate Ap arrays, selected outputs, and single precision
+	flags = [0] + [1] * 23
+	flags[9] = -1
+	ap_a = np.linspace(1., 20., 30 * 7).reshape(30, 1, 7)
+	kwargs = dict(ap_a=ap_a, flags=flags, outputs=["rho", "Talt"], dtype=np.float32)
+	expected = msise.msise_flat(times, alts, *STD_INPUT_PY[2:], **kwargs)
+	with ThreadPoolExecutor(2) as executor:
+		output = msise.msise_flat(
+			times, alts, *STD_INPUT_PY[2:], executor=executor, n_jobs=3, **kwargs
+		)
+	assert output.dtype == np.float32
+	np.testing.assert_equal(output, expected)
+
+
+@pytest.mark.parametrize(
+	"profile_func, flat_func",
+	[
+		(msise.gtd7_profile, msise.gtd7_flat),
+		(msise.gtd7d_profile, msise.gtd7d_flat),
+	]
+)
+def test_py_gtd7_profile(profile_func, flat_func):
+	# covering all model regions and the boundaries between them
+	alts = np.array([-5., 0., 32.5, 50., 72.5, 100., 120., 300., 400., 1000.])
+	lats = np.array([-60., 0., 60.])[:, None]
+	lsts = np.array([4., 16.])[None, :]
+	inp = STD_INPUT_C[:]
+	inp[4] = lats
+	inp[6] = lsts
+	output = profile_func(*(inp[:3] + inp[4:]), alt=alts)
+	assert output.shape == (3, 2, 10, 11)
+	inp[3] = alts
+	inp[4] = lats[..., None]
+	inp[6] = lsts[..., None]
+	np.testing.assert_equal(output, flat_func(*inp))
+	# with Ap array and the switches that use it
+	flags = [0] + [1] * 23
+	flags[9] = -1
+	ap_a = [4, 3, 5, 6, 7, 8, 9]
+	inp[4] = lats
+	inp[6] = lsts
+	output = profile_func(
+		*(inp[:3] + inp[4:]), alt=alts, ap_a=ap_a, flags=flags, n_threads=2
+	)
+	inp[4] = lats[..., None]
+	inp[6] = lsts[..., None]
+	np.testing.assert_equal(
+		output, flat_func(*inp, ap_a=ap_a, flags=flags)
+	)
+
+
+@pytest.mark.parametrize(
+	"outputs",
+	[["rho", "Talt"], ["Talt"], ["Texo", "Talt"], ["He"], ["AnomO", "rho", 2], [6, 7]],
+)
+def test_py_outputs(outputs):
+	alts = np.array([-5., 0., 50., 72.5, 100., 200., 300., 400., 1000.])
+	lats = np.array([-60., 0., 60.])[:, None]
+	inp = STD_INPUT_C[:]
+	inp[3] = alts
+	inp[4] = lats
+	cols = [
+		msise.core._OUTPUT_NAMES.index(o) if isinstance(o, str) else o
+		for o in outputs
+	]
+	flags = [0] + [1] * 23
+	flags[9] = -1
+	for kwargs in [{}, {"ap_a": [4, 3, 5, 6, 7, 8, 9], "flags": flags}]:
+		for func in (msise.gtd7_flat, msise.gtd7d_flat):
+			output = func(*inp, outputs=outputs, **kwargs)
+			assert output.shape == (3, 9, len(outputs))
+			np.testing.assert_equal(output, func(*inp, **kwargs)[..., cols])
+		for func in (msise.gtd7_profile, msise.gtd7d_profile):
+			output = func(*(inp[:3] + inp[4:]), alt=alts, outputs=outputs, **kwargs)
+			np.testing.assert_equal(
+				output, func(*(inp[:3] + inp[4:]), alt=alts, **kwargs)[..., cols]
+			)
+	inp[3] = np.array([100., 1., 1e-3])
+	np.testing.assert_equal(
+		msise.ghp7_flat(*inp, outputs=outputs + ["alt"]),
+		msise.ghp7_flat(*inp)[..., cols + [11]],
+	)
+	np.testing.assert_equal(
+		msise.msise_flat(*STD_INPUT_PY, outputs=outputs),
+		msise.msise_flat(*STD_INPUT_PY)[..., cols],
+	)
+
+
+def test_py_outputs_invalid():
+	for outputs in [["rho", "T"], ["alt"], [11], []]:
+		with pytest.raises(ValueError):
+			msise.gtd7_flat(*STD_INPUT_C, outputs=outputs)
+	with pytest.raises(ValueError):
+		msise._nrlmsise00.gtd7_array(
+			*[np.atleast_1d(np.float64(i)) for i in STD_INPUT_C],
+			out=np.empty(2), outputs=[-1, 5]
+		)
+
+
+@pytest.mark.parametrize("n_threads", [1, 3])
+def test_py_out(n_threads):
+	inp = STD_INPUT_C[:]
+	inp[3] = np.linspace(0., 1000., 4000).reshape(4, 1000)
+	expected = msise.gtd7_flat(*inp)
+	# reused buffer, strided slices of a larger array
+	buf = np.full((2, 4, 1000, 22), np.nan)
+	for k in range(2):
+		out = msise.gtd7_flat(*inp, out=buf[k, ..., ::2], n_threads=n_threads)
+		assert out is not None and np.shares_memory(out, buf)
+	np.testing.assert_equal(buf[..., ::2], np.broadcast_to(expected, (2, 4, 1000, 11)))
+	assert np.isnan(buf[..., 1::2]).all()
+	# float32 output
+	out32 = msise.gtd7_flat(*inp, dtype=np.float32, n_threads=n_threads)
+	assert out32.dtype == np.float32
+	np.testing.assert_equal(out32, expected.astype(np.float32))
+	out = np.empty((4, 1000, 2), dtype=np.float32)
+	msise.gtd7_flat(*inp, out=out, outputs=["rho", "Talt"], n_threads=n_threads)
+	np.testing.assert_equal(out, expected[..., [5, 10]].astype(np.float32))
+	# not viewable as (points, columns), copied back
+	out = np.empty((11, 1000, 4)).transpose(2, 1, 0)
+	msise.gtd7_flat(*inp, out=out, n_threads=n_threads)
+	np.testing.assert_equal(out, expected)
+	# invalid
+	with pytest.raises(ValueError):
+		msise.gtd7_flat(*inp, out=np.empty((4, 1000, 10)))
+	with pytest.raises(ValueError):
+		msise.gtd7_flat(*inp, out=np.empty((4, 1000, 11)), dtype=np.float32)
+	with pytest.raises(TypeError):
+		msise.gtd7_flat(*inp, dtype=np.int32)
+	# profiles
+	alts = np.linspace(100., 1000., 10)
+	inp[4] = np.linspace(-90., 90., 10)
+	prof = np.empty((20, 10, 11), dtype=np.float32)[::2]
+	msise.gtd7_profile(
+		*(inp[:3] + inp[4:]), alt=alts, out=prof, n_threads=n_threads
+	)
+	np.testing.assert_equal(
+		prof,
+		msise.gtd7_profile(*(inp[:3] + inp[4:]), alt=alts).astype(np.float32),
+	)
+	# outputs first, (output, lat, alt, lon), written without copies,
+	# with fewer latitudes than threads split along the longitudes
+	for nlat, nlon in [(4, 600), (2, 3000)]:
+		inp[4] = np.linspace(-60., 60., nlat)[:, None]
+		inp[5] = np.linspace(-180., 180., nlon)
+		data = np.empty((11, nlat, 10, nlon))
+		out = np.moveaxis(np.moveaxis(data, 0, -1), 1, 2)
+		msise.gtd7_profile(*(inp[:3] + inp[4:]), alt=alts, out=out, n_threads=n_threads)
+		np.testing.assert_equal(
+			np.moveaxis(data, 0, -1),
+			np.moveaxis(msise.gtd7_profile(*(inp[:3] + inp[4:]), alt=alts), 2, 1),
+		)
+
+
+def test_config():
+	flags = [0] + [1] * 23
+	flags[9] = -1
+	ap_a = [4, 3, 5, 6, 7, 8, 9]
+	config = msise.MsisConfig(ap_a=ap_a, flags=flags)
+	assert config.flags == flags
+	assert config.ap_a == ap_a
+	assert msise.MsisConfig().ap_a is None
+	assert msise.MsisConfig().flags == [0] + [1] * 23
+	config2 = pickle.loads(pickle.dumps(config))
+	assert config2.flags == flags
+	assert config2.ap_a == ap_a
+	# the same results as with the lists
+	for func in (
+		msise._nrlmsise00.gtd7, msise._nrlmsise00.gtd7d, msise._nrlmsise00.ghp7,
+	):
+		assert (
+			func(*STD_INPUT_C, config=config)
+			== func(*STD_INPUT_C, ap_a=ap_a, flags=flags)
+		)
+	inp = STD_INPUT_C[:]
+	inp[3] = np.linspace(0., 1000., 21)
+	np.testing.assert_equal(
+		msise.gtd7d_flat(*inp, config=config),
+		msise.gtd7d_flat(*inp, ap_a=ap_a, flags=flags),
+	)
+	np.testing.assert_equal(
+		msise.msise_flat(*STD_INPUT_PY, config=config),
+		msise.msise_flat(*STD_INPUT_PY, ap_a=ap_a, flags=flags),
+	)
+	# invalid
+	with pytest.raises(ValueError):
+		msise.gtd7_flat(*inp, flags=flags, config=config)
+	with pytest.raises(ValueError):
+		msise.MsisConfig(flags=flags[:-1])
+	with pytest.raises(TypeError):
+		msise._nrlmsise00.gtd7(*STD_INPUT_C, config=flags)
+
+
+def test_py_gtd7_flat_ap_a():
+	flags = [0] + [1] * 23
+	flags[9] = -1
+	rng = np.random.RandomState(0)
+	# separate Ap arrays, broadcast against the altitudes
+	ap_a = rng.uniform(0., 300., size=(3, 1, 7))
+	inp = STD_INPUT_C[:]
+	inp[3] = np.array([100., 200., 400., 800.])
+	output = msise.gtd7_flat(*inp, ap_a=ap_a, flags=flags)
+	assert output.shape == (3, 4, 11)
+	for i in range(3):
+		np.testing.assert_equal(
+			output[i], msise.gtd7_flat(*inp, ap_a=ap_a[i, 0], flags=flags)
+		)
+	# the same with a config, profiles, and split between threads
+	config = msise.MsisConfig(flags=flags)
+	ap_a = rng.uniform(0., 300., size=(3000, 7))
+	inp[5] = np.linspace(-180., 180., 3000)[:, None]
+	output = msise.gtd7_flat(*inp, ap_a=ap_a[:, None], config=config, n_threads=3)
+	# per-element object array of lists
+	aphs = np.empty((3000,), dtype=object)
+	for i, a in enumerate(ap_a):
+		aphs[i] = list(a)
+	np.testing.assert_equal(
+		output[:, 2],
+		msise.msise_flat(
+			np.datetime64("2009-06-21T08:03:20"), 400., 60., inp[5][:, 0],
+			150., 150., 4., lst=16., ap_a=aphs, flags=flags,
+		)
+	)
+	profiles = msise.gtd7_profile(
+		*(inp[:3] + inp[4:]), alt=[100., 200., 400., 800.],
+		ap_a=ap_a[:, None], config=config, n_threads=3
+	)
+	np.testing.assert_equal(profiles[:, 0], output)
+	with pytest.raises(ValueError):
+		msise.gtd7_flat(*STD_INPUT_C, ap_a=np.ones((3, 6)), flags=flags)
+
+
+def test_ap_a_3h():
+	# 3-hourly values starting on 2009-06-18, centred in the intervals
+	ap_time = (
+		np.datetime64("2009-06-18T01:30")
+		+ np.arange(40) * np.timedelta64(3, "h")
+	)
+	ap = np.arange(40.)
+	times = np.array(
+		["2009-06-21T08:03:20", "2009-06-22T23:59:59"], dtype="datetime64[s]"
+	)
+	ap_a = msise.ap_a_3h(times, ap_time, ap)
+	# current interval 24 + 2 = 26 (06-09 UT)
+	np.testing.assert_allclose(
+		ap_a[0],
+		[27.5, 26., 25., 24., 23., np.mean(ap[15:23]), np.mean(ap[7:15])],
+	)
+	np.testing.assert_allclose(ap_a[1], [35.5, 39., 38., 37., 36., 31.5, 23.5])
+	# the same from seconds since 1970
+	epochs = (times - np.datetime64("1970-01-01")) / np.timedelta64(1, "s")
+	np.testing.assert_equal(msise.ap_a_3h(epochs, ap_time, ap), ap_a)
+	# not enough previous values
+	with pytest.raises(ValueError):
+		msise.ap_a_3h(np.datetime64("2009-06-19T12:00"), ap_time, ap)
+
+
+@pytest.mark.parametrize("method", ["gtd7", "gtd7d"])
+def test_cache(method):
+	cache = msise.MsisCache(maxsize=2)
+	expected = msise.msise_model(*STD_INPUT_PY, method=method, **STD_KW_PY)
+	for _ in range(3):
+		output = cache.msise_model(*STD_INPUT_PY, method=method, **STD_KW_PY)
+		assert output == expected
+	assert cache.cache_info() == (2, 1, 2, 1)
+	# the returned lists are copies
+	output[0][0] = 0.
+	assert cache.msise_model(*STD_INPUT_PY, method=method, **STD_KW_PY) == expected
+	# different settings are different entries
+	flags = [0] + [1] * 23
+	flags[9] = -1
+	ds, ts = cache.msise_model(
+		*STD_INPUT_PY, method=method, ap_a=[4.] * 7, flags=flags, **STD_KW_PY
+	)
+	config = msise.MsisConfig(ap_a=[4.] * 7, flags=flags)
+	assert cache.msise_model(
+		*STD_INPUT_PY, method=method, config=config, **STD_KW_PY
+	) == (ds, ts)
+	assert cache.cache_info() == (4, 2, 2, 2)
+	# the least recently used entry is discarded
+	cache.msise_model(*STD_INPUT_PY, method=method, lst=15)
+	assert cache.cache_info().currsize == 2
+	cache.msise_model(
+		*STD_INPUT_PY, method=method, ap_a=[4.] * 7, flags=flags, **STD_KW_PY
+	)
+	assert cache.cache_info().misses == 3
+	cache.msise_model(*STD_INPUT_PY, method=method, **STD_KW_PY)
+	assert cache.cache_info().misses == 4
+	cache.cache_clear()
+	assert cache.cache_info() == (0, 0, 2, 0)
+
+
+def test_cache_decimals():
+	cache = msise.MsisCache(decimals=3)
+	inp = STD_INPUT_C[:]
+	inp[3] = 400.0001
+	expected = msise._nrlmsise00.gtd7(*STD_INPUT_C)
+	assert cache.gtd7(*inp) == expected
+	assert cache.gtd7(*STD_INPUT_C) == expected
+	assert cache.cache_info().hits == 1
+
+
+def test_cache_threads():
+	cache = msise.MsisCache(maxsize=50)
+	inputs = [STD_INPUT_C[:3] + [a] + STD_INPUT_C[4:] for a in range(100, 200)]
+	expected = [msise._nrlmsise00.gtd7(*inp) for inp in inputs]
+	errors = []
+
+	def _run(i):
+		# two threads for each quarter of the inputs
+		for _ in range(3):
+			for inp, exp in zip(inputs[i % 4::4], expected[i % 4::4]):
+				if cache.gtd7(*inp) != exp:
+					errors.append(inp)
+
+	threads = [threading.Thread(target=_run, args=(i,)) for i in range(8)]
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	assert not errors
+	info = cache.cache_info()
+	assert info.hits + info.misses == 8 * 3 * 25
+	assert info.currsize == 50
+
+
+@pytest.mark.parametrize(
+	"jac_func, flat_func", [
+		(msise.gtd7_jacobian, msise.gtd7_flat),
+		(msise.gtd7d_jacobian, msise.gtd7d_flat),
+	]
+)
+def test_py_jacobian(jac_func, flat_func):
+	rng = np.random.RandomState(7)
+	alt = rng.uniform(20., 900., 100)
+	lat = rng.uniform(-89., 89., 100)
+	lon = rng.uniform(-180., 180., 100)
+	sec = 29000.
+	lst = sec / 3600. + lon / 15.
+	inp = [2009, 172, sec, alt, lat, lon, lst, 150., 150., 4.]
+	wrt = ["alt", "lat", "lon", "f107", "ap"]
+	output, jac = jac_func(*inp, wrt=wrt, steps={"lat": 1e-2})
+	assert jac.shape == (100, 11, 5)
+	np.testing.assert_equal(output, flat_func(*inp))
+
+	def _diff(i, h, dlst=0.):
+		inp_p, inp_m = inp[:], inp[:]
+		inp_p[i] = inp[i] + h
+		inp_m[i] = inp[i] - h
+		inp_p[6] = lst + dlst
+		inp_m[6] = lst - dlst
+		return (flat_func(*inp_p) - flat_func(*inp_m)) / (2. * h)
+
+	np.testing.assert_allclose(jac[..., 0], _diff(3, 1e-3))
+	np.testing.assert_allclose(jac[..., 1], _diff(4, 1e-2))
+	# longitude at constant universal time
+	np.testing.assert_allclose(jac[..., 2], _diff(5, 1e-3, 1e-3 / 15.))
+	np.testing.assert_allclose(jac[..., 3], _diff(8, 1e-2))
+	np.testing.assert_allclose(jac[..., 4], _diff(9, 1e-2))
+	# selected outputs and threads
+	output3, jac3 = jac_func(
+		*inp, wrt=wrt, steps={"lat": 1e-2}, outputs=["rho", "Talt"], n_threads=3
+	)
+	np.testing.assert_equal(output3, output[:, [5, 10]])
+	np.testing.assert_equal(jac3, jac[:, [5, 10]])
+	with pytest.raises(ValueError):
+		jac_func(*inp, wrt=["sec"])
+	with pytest.raises(ValueError):
+		jac_func(*inp, wrt=["alt"], steps={"alt": 0.})
+
+
+def test_instrument():
+	from nrlmsise00.instrument import add_hook, record, remove_hook
+
+	calls = []
+
+	def _hook(*args):
+		calls.append(args)
+
+	add_hook(_hook)
+	try:
+		with record() as rec:
+			msise.gtd7_flat(*(STD_INPUT_C[:3] + [[200., 400.]] + STD_INPUT_C[4:]))
+			msise.gtd7d_profile(
+				*(STD_INPUT_C[:3] + STD_INPUT_C[4:] + [[200., 300., 400.]])
+			)
+			msise.msise_flat([STD_INPUT_PY[0]] * 4, *STD_INPUT_PY[1:])
+	finally:
+		remove_hook(_hook)
+	msise.gtd7_flat(*STD_INPUT_C)
+	assert list(rec.stages) == [
+		"gtd7_array", "gtd7d_profile_array", "msise_flat.time",
+	]
+	assert rec.stages["gtd7_array"]["calls"] == 2
+	assert rec.stages["gtd7_array"]["evaluations"] == 6
+	assert rec.stages["gtd7_array"]["nbytes"] == 6 * 11 * 8
+	assert rec.stages["gtd7d_profile_array"]["evaluations"] == 3
+	assert all(st["seconds"] >= 0. for st in rec.stages.values())
+	assert len(calls) == 4
+	assert calls[0][0] == "gtd7_array"
+	assert "gtd7d_profile_array" in str(rec)
+
+
+def test_local_solar_time():
+	times = np.array(
+		["2009-02-11T12:00", "2009-11-03T12:00", "2008-12-31T00:00:00.5"],
+		dtype="datetime64[ms]",
+	)
+	lmst = msise.local_solar_time(times, [[0.], [-90.]])
+	np.testing.assert_allclose(
+		lmst, [[12., 12., 0.5 / 3600.], [6., 6., 0.5 / 3600. - 6.]],
+	)
+	last = msise.local_solar_time(times, 0., apparent=True)
+	np.testing.assert_allclose(
+		(last - lmst[0]) * 60., [-14.2, 16.4, -2.2], atol=0.5,
+	)
+	# the same for datetime objects, and in the model functions
+	time = dt.datetime(2009, 11, 3, 12)
+	assert msise.local_solar_time(time, 0., apparent=True) == pytest.approx(last[1])
+	output = msise.msise_flat(time, *STD_INPUT_PY[1:], lst="apparent")
+	expected = msise.msise_flat(
+		time, *STD_INPUT_PY[1:],
+		lst=msise.local_solar_time(time, STD_INPUT_PY[3], apparent=True)
+	)
+	np.testing.assert_equal(output, expected)
+	ds, ts = msise.msise_model(time, *STD_INPUT_PY[1:], lst="apparent")
+	np.testing.assert_allclose(ds + ts, output, rtol=1e-12)
+	with pytest.raises(ValueError):
+		msise.msise_flat(time, *STD_INPUT_PY[1:], lst="true")
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8
+import asyncio
+import json
+
+import numpy as np
+
+from nrlmsise00 import gtd7_flat, gtd7d_flat
+from nrlmsise00.server import MsisBatcher, MsisServer
+
+INPUTS = dict(
+	year=2009, doy=172, sec=29000., alt=[200., 400.], g_lat=60., g_long=-70.,
+	f107A=150., f107=150., ap=4.,
+)
+
+
+def _x(alt):
+	return np.array([[0, 172, 29000, alt, 60, -70, 16, 150, 150, 4]], dtype=float)
+
+
+def test_batcher():
+	async def _run():
+		batcher = MsisBatcher(gtd7_flat, max_batch=8, max_delay=0.05)
+		try:
+			res = await asyncio.gather(*[
+				batcher.evaluate(_x(alt)) for alt in range(100, 1000, 50)
+			])
+		finally:
+			await batcher.close()
+		return batcher, res
+
+	batcher, res = asyncio.run(_run())
+	assert batcher.requests == 18
+	assert batcher.points == 18
+	assert batcher.batches == 3
+	for alt, out in zip(range(100, 1000, 50), res):
+		np.testing.assert_equal(out, gtd7_flat(*_x(alt).T))
+
+
+async def _request(port, method, target, body=None, length=None):
+	reader, writer = await asyncio.open_connection("127.0.0.1", port)
+	data = json.dumps(body).encode("utf-8") if body is not None else b""
+	writer.write((
+		"{0} {1} HTTP/1.0\r\nContent-Length: {2}\r\n\r\n"
+	).format(
+		method, target, len(data) if length is None else length,
+	).encode("latin-1") + data)
+	resp = await reader.read()
+	writer.close()
+	head, _, payload = resp.partition(b"\r\n\r\n")
+	return int(head.split()[1]), json.loads(payload.decode("utf-8"))
+
+
+def test_server():
+	async def _run():
+		server = MsisServer(max_delay=0.05)
+		srv = await server.start(port=0)
+		port = srv.sockets[0].getsockname()[1]
+		try:
+			res = await asyncio.gather(
+				_request(port, "POST", "/gtd7", INPUTS),
+				_request(port, "POST", "/gtd7", dict(INPUTS, lst=12.)),
+				_request(port, "POST", "/gtd7d", INPUTS),
+			)
+			res += [
+				await _request(port, "GET", "/stats"),
+				await _request(port, "POST", "/gtd7", dict(year=2009)),
+				await _request(port, "POST", "/gtd7", dict(INPUTS, g_lat=[1., 2., 3.])),
+				await _request(port, "POST", "/ghp7", INPUTS),
+				await _request(port, "GET", "/gtd7"),
+				await _request(port, "POST", "/gtd7", INPUTS, length="x"),
+				await _request(port, "POST", "/gtd7", INPUTS, length=-1),
+			]
+		finally:
+			await server.close()
+		return res
+
+	res = asyncio.run(_run())
+	args = [2009, 172, 29000., [200., 400.], 60., -70.]
+	lst = 29000. / 3600. - 70. / 15.
+	for (status, out), func, _lst in zip(
+		res[:3], [gtd7_flat, gtd7_flat, gtd7d_flat], [lst, 12., lst],
+	):
+		assert status == 200
+		expected = func(*(args + [_lst, 150., 150., 4.]))
+		np.testing.assert_allclose(out["d"], expected[:, :9], rtol=1e-12)
+		np.testing.assert_allclose(out["t"], expected[:, 9:], rtol=1e-12)
+	status, stats = res[3]
+	assert status == 200
+	assert stats["gtd7"]["requests"] == 2
+	assert stats["gtd7"]["points"] == 4
+	assert stats["gtd7"]["batches"] == 1
+	assert [r[0] for r in res[4:]] == [400, 400, 404, 405, 400, 400]
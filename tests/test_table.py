@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# vim:fileencoding=utf-8
+import numpy as np
+import pytest
+
+from nrlmsise00 import gtd7_flat, gtd7d_flat
+from nrlmsise00.table import MsisTable
+
+AXES = dict(
+	lat=[-60., 0., 60.],
+	lst=[0., 8., 16., 24.],
+	doy=[172.],
+	f107=[80., 150.],
+	f107a=[80., 150.],
+	ap=[4., 50.],
+	alt=[150., 300., 450.],
+)
+
+
+@pytest.fixture(scope="module", params=["gtd7", "gtd7d"])
+def table(request):
+	return MsisTable.build(
+		outputs=["O", "rho", "Talt"], method=request.param,
+		dtype=np.float64, **AXES
+	)
+
+
+def test_nodes(table):
+	# 24 h is evaluated as 0 h
+	x = np.meshgrid(
+		AXES["alt"], AXES["lat"], AXES["lst"][:-1], AXES["f107"], AXES["ap"]
+	)
+	alt, lat, lst, f107, ap = [_x.ravel() for _x in x]
+	func = gtd7d_flat if table.method == "gtd7d" else gtd7_flat
+	# longitude 0, universal time equal to the local solar time
+	exact = func(
+		2009, 172, lst * 3600., alt, lat, 0., lst, 80., f107, ap,
+		outputs=table.outputs,
+	)
+	approx = table(alt, lat, lst, 172, f107, 80., ap)
+	np.testing.assert_allclose(approx, exact, rtol=1e-12)
+	# interpolation within the grid, local solar time wrapped
+	approx = table(
+		[200., 200.], 30., [4., 28.], 172., 100., 120., 10., n_threads=2,
+	)
+	assert np.all(np.isfinite(approx))
+	np.testing.assert_allclose(approx[0], approx[1])
+
+
+def test_outside(table):
+	approx = table([100., 200., np.nan], 0., 12., 172., 100., 100., 10.)
+	assert approx.shape == (3, 3)
+	assert np.all(np.isnan(approx[[0, 2]]))
+	assert np.all(np.isfinite(approx[1]))
+
+
+def test_save_load(table, tmp_path):
+	path = str(tmp_path / "table")
+	table.save(path)
+	loaded = MsisTable.load(path)
+	assert isinstance(loaded.values, np.memmap)
+	assert loaded.outputs == table.outputs
+	assert loaded.method == table.method
+	assert loaded.nbytes == table.nbytes
+	x = (np.linspace(160., 440., 5), 10., 5., 172., 90., 140., 20.)
+	np.testing.assert_allclose(loaded(*x), table(*x))
+
+
+def test_error(table):
+	err = table.error(n=500, seed=0)
+	assert list(err) == table.outputs
+	for e in err.values():
+		assert 0. < e["rms"] <= e["max"]
+	# temperatures are smooth
+	assert err["Talt"]["rms"] < 0.1
+
+
+def test_invalid():
+	with pytest.raises(TypeError):
+		MsisTable.build(lon=[0., 10.])
+	with pytest.raises(ValueError):
+		MsisTable.build(alt=[200., 100.])